@@ -0,0 +1,193 @@
+# ==============================================================================
+# Caché de resultados de detect_product_with_ai
+# Los clientes repiten mucho las mismas frases ("tenés coca?", "precio de la
+# leche"). Si el texto normalizado y el contexto de la sesión son iguales,
+# se reutiliza la detección anterior en vez de volver a llamar a la IA.
+# ==============================================================================
+
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from app.catalogo import normalizar_texto
+from app.logs import obtener_logger
+
+log = obtener_logger("cache_deteccion")
+
+CACHE_DETECCION_MAX = int(os.getenv("CACHE_DETECCION_MAX", "5000"))
+CACHE_DETECCION_TTL = int(os.getenv("CACHE_DETECCION_TTL", "3600"))   # segundos
+# Archivo SQLite para el segundo nivel en disco (vacío = solo memoria)
+CACHE_DETECCION_ARCHIVO = os.getenv("CACHE_DETECCION_ARCHIVO", "")
+
+
+def normalizar_frase(texto: str) -> str:
+    return normalizar_texto(re.sub(r"[¿?¡!.,;:\"']+", " ", texto))
+
+
+def clave_deteccion(user_input: str, contexto: str = "") -> str:
+    """Clave = frase normalizada + hash del contexto del que depende la detección."""
+    huella = hashlib.blake2b(contexto.encode("utf-8"), digest_size=8).hexdigest() if contexto else "-"
+    return f"{huella}:{normalizar_frase(user_input)}"
+
+
+_FIN = object()
+
+
+class CacheDeteccion:
+    """
+    LRU con vencimiento (TTL) en memoria y, opcionalmente, un segundo nivel en
+    SQLite que sobrevive a los reinicios. Lo que se lee del disco se vuelve a
+    subir a memoria. Las escrituras al disco las hace un hilo aparte, en lotes.
+    """
+
+    def __init__(self, max_entradas=CACHE_DETECCION_MAX, ttl=CACHE_DETECCION_TTL, archivo=CACHE_DETECCION_ARCHIVO):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._memoria = OrderedDict()    # clave → (vence, valor)
+        self._lock = threading.Lock()
+        self._disco = None
+        self._lock_disco = threading.Lock()
+        self._pendientes = queue.Queue()
+        self._escritor = None
+        self.metricas = {"aciertos_memoria": 0, "aciertos_disco": 0, "fallos": 0, "vencidos": 0, "desalojados": 0}
+        if archivo:
+            self._disco = sqlite3.connect(archivo, check_same_thread=False)
+            self._disco.execute(
+                "CREATE TABLE IF NOT EXISTS deteccion (clave TEXT PRIMARY KEY, vence REAL, valor TEXT)"
+            )
+            self._disco.commit()
+
+    def obtener(self, clave: str):
+        ahora = time.time()
+        valor = self._de_memoria(clave, ahora)
+        return valor if valor is not None else self._de_disco(clave, ahora)
+
+    async def aobtener(self, clave: str):
+        """Como obtener, pero si hay que ir al disco la lectura corre fuera del event loop."""
+        ahora = time.time()
+        valor = self._de_memoria(clave, ahora)
+        if valor is not None:
+            return valor
+        if self._disco is None:
+            return self._de_disco(clave, ahora)
+        return await asyncio.to_thread(self._de_disco, clave, ahora)
+
+    def _de_memoria(self, clave: str, ahora: float):
+        with self._lock:
+            entrada = self._memoria.get(clave)
+            if entrada is None:
+                return None
+            vence, valor = entrada
+            if vence > ahora:
+                self._memoria.move_to_end(clave)
+                self.metricas["aciertos_memoria"] += 1
+                return _copiar(valor)
+            del self._memoria[clave]
+            self.metricas["vencidos"] += 1
+            return None
+
+    def _de_disco(self, clave: str, ahora: float):
+        if self._disco is not None:
+            with self._lock_disco:
+                fila = self._disco.execute(
+                    "SELECT vence, valor FROM deteccion WHERE clave = ?", (clave,)
+                ).fetchone()
+            if fila and fila[0] > ahora:
+                valor = json.loads(fila[1])
+                with self._lock:
+                    self._guardar_en_memoria(clave, fila[0], valor)
+                    self.metricas["aciertos_disco"] += 1
+                return _copiar(valor)
+
+        with self._lock:
+            self.metricas["fallos"] += 1
+        return None
+
+    def guardar(self, clave: str, valor: dict):
+        vence = time.time() + self.ttl
+        valor = _copiar(valor)
+        with self._lock:
+            self._guardar_en_memoria(clave, vence, valor)
+        if self._disco is not None:
+            self._iniciar_escritor()
+            self._pendientes.put((clave, vence, json.dumps(valor, ensure_ascii=False)))
+
+    # -------------------------------------------------------------------------
+    # Escritura al disco en segundo plano
+    # -------------------------------------------------------------------------
+
+    def _iniciar_escritor(self):
+        with self._lock:
+            if self._escritor is None or not self._escritor.is_alive():
+                self._escritor = threading.Thread(target=self._escribir, name="cache-deteccion", daemon=True)
+                self._escritor.start()
+
+    def _escribir(self):
+        """Junta lo que haya en la cola y lo escribe con un solo commit."""
+        while True:
+            lote = [self._pendientes.get()]
+            while True:
+                try:
+                    lote.append(self._pendientes.get_nowait())
+                except queue.Empty:
+                    break
+            filas = [f for f in lote if f is not _FIN]
+            if filas:
+                try:
+                    with self._lock_disco:
+                        self._disco.executemany(
+                            "INSERT OR REPLACE INTO deteccion (clave, vence, valor) VALUES (?, ?, ?)", filas
+                        )
+                        self._disco.commit()
+                except sqlite3.Error as e:
+                    log.warning("⚠️ No se pudieron guardar %s detecciones en disco: %s", len(filas), e)
+            if len(filas) < len(lote):
+                return
+
+    def cerrar(self):
+        """Escribe lo pendiente en el disco (al apagar el servidor)."""
+        if self._escritor is not None and self._escritor.is_alive():
+            self._pendientes.put(_FIN)
+            self._escritor.join()
+
+    def _guardar_en_memoria(self, clave, vence, valor):
+        self._memoria[clave] = (vence, valor)
+        self._memoria.move_to_end(clave)
+        while len(self._memoria) > self.max_entradas:
+            self._memoria.popitem(last=False)
+            self.metricas["desalojados"] += 1
+
+    def purgar_vencidos(self):
+        ahora = time.time()
+        with self._lock:
+            for clave in [c for c, (vence, _) in self._memoria.items() if vence <= ahora]:
+                del self._memoria[clave]
+        if self._disco is not None:
+            with self._lock_disco:
+                self._disco.execute("DELETE FROM deteccion WHERE vence <= ?", (ahora,))
+                self._disco.commit()
+
+    def estadisticas(self) -> dict:
+        consultas = self.metricas["aciertos_memoria"] + self.metricas["aciertos_disco"] + self.metricas["fallos"]
+        aciertos = consultas - self.metricas["fallos"]
+        return {
+            **self.metricas,
+            "entradas_memoria": len(self._memoria),
+            "tasa_aciertos": round(aciertos / consultas, 4) if consultas else 0.0,
+        }
+
+
+def _copiar(valor: dict) -> dict:
+    # Quien recibe el resultado puede modificar productos, cantidades o los platos anidados
+    return copy.deepcopy(valor)
+
+
+cache_deteccion = CacheDeteccion()
@@ -0,0 +1,339 @@
+# ==============================================================================
+# Índice en memoria del catálogo de productos
+# Carga productos, marcas y categorías una sola vez y responde las mismas
+# búsquedas que hacía get_product_info (prefijo, contiene, categoría y marca)
+# sin volver a consultar la base de datos en cada mensaje.
+# ==============================================================================
+
+import bisect
+import os
+import threading
+import time
+import unicodedata
+from app.logs import obtener_logger
+
+log = obtener_logger("catalogo")
+
+# Cada cuántos segundos se refresca el índice (0 = solo bajo demanda)
+CATALOGO_REFRESCO_SEGUNDOS = int(os.getenv("CATALOGO_REFRESCO_SEGUNDOS", "300"))
+
+QUERY_PRODUCTOS = """SELECT
+    p.id,
+    p.nombre AS producto,
+    p.descripcion,
+    p.precio_costo,
+    p.precio_venta,
+    p.stock,
+    m.nombre AS marca,
+    c.nombre AS categoria,
+    p.categoria_id
+    FROM productos p
+    INNER JOIN marcas m ON p.marca_id = m.id
+    INNER JOIN categorias c ON p.categoria_id = c.id;"""
+
+QUERY_CATEGORIAS = "SELECT id, nombre FROM categorias;"
+
+# =============================================================================
+# NORMALIZACIÓN DE TEXTO (minúsculas y sin acentos, igual que la collation _ci)
+# =============================================================================
+
+def normalizar_texto(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", str(texto).lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.split())
+
+
+def _trigramas(texto: str) -> set:
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def _rango_prefijo(claves: list, prefijo: str):
+    """Devuelve las posiciones [inicio, fin) de las claves que empiezan con el prefijo."""
+    inicio = bisect.bisect_left(claves, prefijo)
+    fin = bisect.bisect_left(claves, prefijo + "\uffff")
+    return inicio, fin
+
+# =============================================================================
+# INSTANTÁNEA INMUTABLE DEL ÍNDICE
+# =============================================================================
+
+class _Instantanea:
+    """
+    Una versión completa del índice. Nunca se modifica después de publicarse:
+    cada refresco arma una nueva y la reemplaza de una sola vez.
+    """
+
+    def __init__(self):
+        self.filas = {}              # id → fila (mismas columnas que la consulta original)
+        self.nombres = {}            # id → nombre normalizado
+        self.firmas = {}             # id → tupla para detectar cambios en el refresco
+        self.trigramas = {}          # trigrama → set de ids
+        self.por_marca = {}          # marca normalizada → set de ids
+        self.por_categoria = {}      # categoria_id → set de ids
+        self.categorias = {}         # nombre normalizado → {"id", "nombre"}
+        self.claves_nombre = []      # [nombre normalizado] ordenado, para prefijos
+        self.ids_nombre = []         # ids alineados con claves_nombre
+        self.claves_marca = []       # marcas normalizadas ordenadas
+        self.claves_categoria = []   # categorías normalizadas ordenadas
+        self.orden = {}              # id → posición según ORDER BY p.nombre
+        self.difuso = None           # IndiceDifuso, se arma junto con la instantánea
+        self.diccionarios = None     # CategoriasYMarcas (app/diccionarios.py), ídem
+
+    def ordenar(self, ids) -> list:
+        return [self.filas[i] for i in sorted(ids, key=self.orden.__getitem__)]
+
+
+def _firma(fila: dict) -> tuple:
+    return (
+        fila["producto"], fila.get("descripcion"), fila.get("precio_costo"),
+        fila["precio_venta"], fila.get("stock"), fila["marca"],
+        fila["categoria"], fila.get("categoria_id"),
+    )
+
+
+def _construir(anterior: _Instantanea, productos: list, categorias: list) -> _Instantanea:
+    """
+    Arma una nueva instantánea a partir de la anterior, re-indexando solo los
+    productos que se agregaron, cambiaron o desaparecieron.
+    Los sets de los índices se copian solo cuando hay que tocarlos.
+    """
+    nueva = _Instantanea()
+    nueva.filas = dict(anterior.filas)
+    nueva.nombres = dict(anterior.nombres)
+    nueva.firmas = dict(anterior.firmas)
+    nueva.trigramas = dict(anterior.trigramas)
+    nueva.por_marca = dict(anterior.por_marca)
+    nueva.por_categoria = dict(anterior.por_categoria)
+    copiados = set()
+
+    def _set_editable(indice: dict, clave, nombre_indice: str) -> set:
+        marca = (nombre_indice, clave)
+        if marca not in copiados:
+            indice[clave] = set(indice.get(clave, ()))
+            copiados.add(marca)
+        return indice[clave]
+
+    def _quitar(pid):
+        fila = nueva.filas.pop(pid)
+        nombre = nueva.nombres.pop(pid)
+        nueva.firmas.pop(pid, None)
+        for t in _trigramas(nombre):
+            _set_editable(nueva.trigramas, t, "tri").discard(pid)
+        _set_editable(nueva.por_marca, normalizar_texto(fila["marca"]), "marca").discard(pid)
+        _set_editable(nueva.por_categoria, fila.get("categoria_id"), "cat").discard(pid)
+
+    def _agregar(fila):
+        pid = fila["id"]
+        nombre = normalizar_texto(fila["producto"])
+        nueva.filas[pid] = fila
+        nueva.nombres[pid] = nombre
+        nueva.firmas[pid] = _firma(fila)
+        for t in _trigramas(nombre):
+            _set_editable(nueva.trigramas, t, "tri").add(pid)
+        _set_editable(nueva.por_marca, normalizar_texto(fila["marca"]), "marca").add(pid)
+        _set_editable(nueva.por_categoria, fila.get("categoria_id"), "cat").add(pid)
+
+    vistos = set()
+    for fila in productos:
+        pid = fila["id"]
+        vistos.add(pid)
+        if pid in nueva.firmas:
+            if nueva.firmas[pid] == _firma(fila):
+                continue
+            _quitar(pid)
+        _agregar(fila)
+
+    for pid in [pid for pid in nueva.filas if pid not in vistos]:
+        _quitar(pid)
+
+    # Limpiar entradas que quedaron vacías
+    for indice in (nueva.trigramas, nueva.por_marca, nueva.por_categoria):
+        for clave in [c for c, ids in indice.items() if not ids]:
+            del indice[clave]
+
+    # Las estructuras ordenadas son chicas comparadas con los postings; se rearman
+    pares = sorted((nombre, pid) for pid, nombre in nueva.nombres.items())
+    nueva.claves_nombre = [nombre for nombre, _ in pares]
+    nueva.ids_nombre = [pid for _, pid in pares]
+    nueva.orden = {pid: i for i, pid in enumerate(nueva.ids_nombre)}
+    nueva.claves_marca = sorted(nueva.por_marca)
+
+    nueva.categorias = {
+        normalizar_texto(c["nombre"]): {"id": c["id"], "nombre": c["nombre"]}
+        for c in categorias
+    }
+    nueva.claves_categoria = sorted(nueva.categorias)
+
+    # El vocabulario para corregir errores de tipeo solo cambia si cambian nombres, marcas o categorías.
+    # Se arma acá (en el hilo del refresco) y se publica con la instantánea: armarlo
+    # en la primera búsqueda frenaba el event loop casi 2 s con 50.000 productos.
+    if (anterior.difuso is not None and nueva.claves_nombre == anterior.claves_nombre
+            and nueva.claves_marca == anterior.claves_marca
+            and nueva.claves_categoria == anterior.claves_categoria):
+        nueva.difuso = anterior.difuso
+    else:
+        from app.difuso import IndiceDifuso
+
+        nueva.difuso = IndiceDifuso(nueva.claves_nombre + nueva.claves_marca + nueva.claves_categoria)
+
+    # Categorías y marcas para detectarlas en los mensajes; se reusan si no cambiaron
+    marcas = {clave: {"nombre": nueva.filas[next(iter(ids))]["marca"]} for clave, ids in nueva.por_marca.items()}
+    if (anterior.diccionarios is not None and anterior.diccionarios.categorias == nueva.categorias
+            and anterior.diccionarios.marcas == marcas):
+        nueva.diccionarios = anterior.diccionarios
+    else:
+        from app.diccionarios import CategoriasYMarcas
+
+        nueva.diccionarios = CategoriasYMarcas(nueva.categorias, marcas)
+    return nueva
+
+# =============================================================================
+# CARGA DESDE LA BASE DE DATOS
+# =============================================================================
+
+def cargar_desde_bd():
+    from app.database import ejecutar_consulta
+
+    return ejecutar_consulta(QUERY_PRODUCTOS), ejecutar_consulta(QUERY_CATEGORIAS)
+
+# =============================================================================
+# ÍNDICE DEL CATÁLOGO
+# =============================================================================
+
+class IndiceCatalogo:
+    """
+    Índice de prefijos y de trigramas sobre productos, marcas y categorías.
+    Las búsquedas leen siempre una instantánea completa, así que un refresco
+    en paralelo nunca deja ver un índice a medio armar.
+    """
+
+    def __init__(self, cargador=cargar_desde_bd):
+        self._cargador = cargador
+        self._actual = None
+        self._lock_refresco = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+        self.ultimo_refresco = None
+
+    def listo(self) -> bool:
+        return self._actual is not None
+
+    def refrescar(self) -> int:
+        """Recarga el catálogo; devuelve la cantidad de productos indexados."""
+        productos, categorias = self._cargador()
+        with self._lock_refresco:
+            anterior = self._actual or _Instantanea()
+            self._actual = _construir(anterior, productos, categorias)
+            self.ultimo_refresco = time.time()
+        return len(self._actual.filas)
+
+    def iniciar_refresco_periodico(self, segundos: int = CATALOGO_REFRESCO_SEGUNDOS):
+        if segundos <= 0 or (self._hilo and self._hilo.is_alive()):
+            return
+        self._detener.clear()
+
+        def _loop():
+            while not self._detener.wait(segundos):
+                try:
+                    total = self.refrescar()
+                    log.info("🔄 Catálogo refrescado (%s productos)", total)
+                except Exception as e:
+                    log.warning("⚠️ Error al refrescar el catálogo: %s", e)
+
+        self._hilo = threading.Thread(target=_loop, name="refresco-catalogo", daemon=True)
+        self._hilo.start()
+
+    def detener_refresco_periodico(self):
+        self._detener.set()
+
+    # -------------------------------------------------------------------------
+    # Búsquedas (misma semántica que las consultas SQL originales)
+    # -------------------------------------------------------------------------
+
+    def buscar_categoria(self, nombre: str):
+        """Equivale a: categorias WHERE LOWER(nombre) = x, más sus productos."""
+        inst = self._actual
+        categoria = inst.categorias.get(normalizar_texto(nombre))
+        if not categoria:
+            return None, []
+        return categoria, inst.ordenar(inst.por_categoria.get(categoria["id"], ()))
+
+    def buscar_por_prefijo(self, palabra: str) -> list:
+        """Equivale a QUERY_START: nombre, marca o categoría LIKE 'palabra%'."""
+        inst = self._actual
+        prefijo = normalizar_texto(palabra)
+        inicio, fin = _rango_prefijo(inst.claves_nombre, prefijo)
+        ids = set(inst.ids_nombre[inicio:fin])
+
+        inicio, fin = _rango_prefijo(inst.claves_marca, prefijo)
+        for marca in inst.claves_marca[inicio:fin]:
+            ids |= inst.por_marca[marca]
+
+        inicio, fin = _rango_prefijo(inst.claves_categoria, prefijo)
+        for clave in inst.claves_categoria[inicio:fin]:
+            ids |= inst.por_categoria.get(inst.categorias[clave]["id"], set())
+
+        return inst.ordenar(ids)
+
+    def buscar_contiene(self, texto: str) -> list:
+        """Equivale a QUERY_CONTAINS: nombre LIKE '%texto%' y NOT LIKE 'texto%'."""
+        inst = self._actual
+        texto = normalizar_texto(texto)
+        return inst.ordenar(
+            pid for pid in self._candidatos(inst, texto)
+            if texto in inst.nombres[pid] and not inst.nombres[pid].startswith(texto)
+        )
+
+    def buscar_por_palabra(self, texto: str) -> list:
+        """Equivale a la búsqueda solo_nombre: el texto aparece como palabra(s) completas."""
+        inst = self._actual
+        texto = normalizar_texto(texto)
+        con_espacios = f" {texto} "
+        return inst.ordenar(
+            pid for pid in self._candidatos(inst, texto)
+            if con_espacios in f" {inst.nombres[pid]} "
+        )
+
+    def buscar_varios_por_palabra(self, textos: list) -> dict:
+        """
+        Resuelve varios nombres contra la misma instantánea (por ejemplo, todos
+        los ingredientes de un plato): primero por palabra completa y, si no hay
+        resultados, por "contiene". Devuelve {texto: [filas]}.
+        """
+        inst = self._actual
+        resultados = {}
+        for texto in textos:
+            normalizado = normalizar_texto(texto)
+            candidatos = self._candidatos(inst, normalizado)
+            con_espacios = f" {normalizado} "
+            ids = [pid for pid in candidatos if con_espacios in f" {inst.nombres[pid]} "]
+            if not ids:
+                ids = [
+                    pid for pid in candidatos
+                    if normalizado in inst.nombres[pid] and not inst.nombres[pid].startswith(normalizado)
+                ]
+            resultados[texto] = inst.ordenar(ids)
+        return resultados
+
+    def corregir(self, texto: str):
+        """
+        Texto con los errores de tipeo corregidos contra el vocabulario del
+        catálogo ("yerva" → "yerba"), o None si no hay nada que corregir.
+        """
+        return self._actual.difuso.corregir(texto)
+
+    def _candidatos(self, inst: _Instantanea, texto: str):
+        if len(texto) < 3:
+            return inst.filas.keys()
+        ids = None
+        for t in sorted(_trigramas(texto), key=lambda t: len(inst.trigramas.get(t, ()))):
+            posting = inst.trigramas.get(t)
+            if not posting:
+                return set()
+            ids = set(posting) if ids is None else ids & posting
+            if not ids:
+                break
+        return ids
+
+
+catalogo = IndiceCatalogo()
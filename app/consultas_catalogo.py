@@ -0,0 +1,102 @@
+# ==============================================================================
+# Consultas de búsqueda de productos contra MySQL
+# Escritas para los índices de script/migraciones/001_indices_busqueda.sql:
+# sin LOWER() sobre columnas (la collation _ci ya ignora mayúsculas y acentos),
+# prefijos contra columnas indexadas, un UNION en lugar del OR entre tres tablas
+# y FULLTEXT en lugar de LIKE '%texto%'. Solo se traen las columnas que usa el
+# bot (id, nombre, descripción y precio de venta).
+# ==============================================================================
+
+import re
+
+from app.catalogo import normalizar_texto
+
+COLUMNAS = "p.id, p.nombre AS producto, p.descripcion, p.precio_venta"
+
+QUERY_CATEGORIA = "SELECT id, nombre FROM categorias WHERE nombre = %s;"
+
+QUERY_PRODUCTOS_CATEGORIA = f"""SELECT {COLUMNAS}
+    FROM productos p
+    WHERE p.categoria_id = %s
+    ORDER BY p.nombre ASC;"""
+
+# Nombre, marca o categoría que empiezan con la palabra: cada rama usa su índice
+QUERY_PREFIJO = f"""SELECT {COLUMNAS}
+    FROM (
+        SELECT id FROM productos WHERE nombre_busqueda LIKE %s
+        UNION
+        SELECT pm.id FROM marcas m INNER JOIN productos pm ON pm.marca_id = m.id WHERE m.nombre LIKE %s
+        UNION
+        SELECT pc.id FROM categorias c INNER JOIN productos pc ON pc.categoria_id = c.id WHERE c.nombre LIKE %s
+    ) ids
+    INNER JOIN productos p ON p.id = ids.id
+    ORDER BY p.nombre ASC;"""
+
+# Candidatos por palabras (índice FULLTEXT); el filtro exacto se hace en Python
+QUERY_PALABRAS = f"""SELECT {COLUMNAS}
+    FROM productos p
+    WHERE MATCH(p.nombre, p.descripcion) AGAINST (%s IN BOOLEAN MODE)
+    ORDER BY p.nombre ASC;"""
+
+# Para textos sin ninguna palabra indexable ("xl", "5") y, si FULLTEXT no encontró nada,
+# para el texto dentro de una palabra ("cola" en "Cocacola"): recorre el índice del nombre
+QUERY_CONTIENE = f"""SELECT {COLUMNAS}
+    FROM productos p
+    WHERE p.nombre_busqueda LIKE %s
+    ORDER BY p.nombre ASC;"""
+
+# Palabras que InnoDB no indexa (lista por defecto de innodb_ft_default_stopword)
+# y que en modo booleano harían que no se encuentre nada
+PALABRAS_VACIAS_FULLTEXT = {
+    "a", "about", "an", "are", "as", "at", "be", "by", "com", "de", "en", "for", "from",
+    "how", "i", "in", "is", "it", "la", "of", "on", "or", "that", "the", "this", "to",
+    "was", "what", "when", "where", "who", "will", "with", "und", "www",
+}
+# innodb_ft_min_token_size
+LARGO_MINIMO_FULLTEXT = 3
+
+
+def escapar_like(texto: str) -> str:
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def texto_fulltext(texto: str):
+    """
+    Consulta booleana que exige todas las palabras indexables como prefijo:
+    "Aceite de Oliva" → "+aceite* +oliva*". None si no queda ninguna palabra.
+    """
+    palabras = re.findall(r"\w+", normalizar_texto(texto))
+    palabras = [
+        p for p in palabras
+        if len(p) >= LARGO_MINIMO_FULLTEXT and p not in PALABRAS_VACIAS_FULLTEXT
+    ]
+    if not palabras:
+        return None
+    return " ".join(f"+{p}*" for p in palabras)
+
+
+def texto_fulltext_varios(textos: list):
+    """Una sola consulta booleana para varios nombres: "(+harina*) (+aceite* +oliva*)"."""
+    grupos = [g for g in map(texto_fulltext, textos) if g]
+    if not grupos:
+        return None
+    return " ".join(f"({g})" for g in grupos)
+
+
+def filtrar_contiene(filas: list, texto: str) -> list:
+    """
+    Misma regla que QUERY_CONTAINS original: el nombre contiene el texto pero no
+    empieza con él, también dentro de una palabra. Los candidatos de FULLTEXT solo
+    traen prefijos de palabras; buscar_en_bd completa con QUERY_CONTIENE si no alcanzan.
+    """
+    texto = normalizar_texto(texto)
+    return [
+        f for f in filas
+        if texto in normalizar_texto(f["producto"]) and not normalizar_texto(f["producto"]).startswith(texto)
+    ]
+
+
+def filtrar_por_palabra(filas: list, texto: str) -> list:
+    """Misma regla que la búsqueda solo_nombre original: el texto aparece como palabra(s) completas."""
+    con_espacios = f" {normalizar_texto(texto)} "
+    return [f for f in filas if con_espacios in f" {normalizar_texto(f['producto'])} "]
@@ -6,16 +6,38 @@
 
 import os
 import re
+import asyncio
+import threading
 from text_to_num import text2num
 from word2number import w2n
 from fastapi import HTTPException
-from langchain_ollama import OllamaLLM, ChatOllama
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_core.chat_history import InMemoryChatMessageHistory
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from app.pedidos import agregar_a_pedido, mostrar_pedido, finalizar_pedido
-from app.database import connect_to_db
+from app.pedidos import agregar_a_pedido, agregar_varios_a_pedido, mostrar_pedido, finalizar_pedido
+from app.database import ejecutar_consulta_async
+from app.catalogo import catalogo, normalizar_texto
+from app.diccionarios import diccionarios
+from app.consultas_catalogo import (
+    QUERY_CATEGORIA, QUERY_PRODUCTOS_CATEGORIA, QUERY_PREFIJO, QUERY_PALABRAS, QUERY_CONTIENE,
+    escapar_like, texto_fulltext, texto_fulltext_varios, filtrar_contiene, filtrar_por_palabra,
+)
+from app.recetas import base_recetas
+from app.listas import renderizar_lista, prompt_cierre, formatear_lista, formatear_grupos
+from app.intenciones import clasificar_con_reglas
+from app.referencias import NORMALIZACIONES, resolver_referencia
+from app.cache_deteccion import cache_deteccion, clave_deteccion
+from app.gestor_sesiones import gestor_sesiones
+from app.historial import crear_historial
 from app.info_super import leer_info_supermercado
+from app.modelos import crear_modelo_input, crear_modelo_output
+from app.grafo import Grafo, en_paralelo
+from app.deteccion import DETECCION_ESTRUCTURADA, ESQUEMA_DETECCION, INSTRUCCIONES_JSON, interpretar, se_puede_guardar
+from app.mostrados import ProductosMostrados, productos_mostrados_de
+from app.logs import obtener_logger
+from app.metricas import ModeloMedido, medir_mensaje, anotar_mensaje
+
+log = obtener_logger("crud")
 
 info_supermercado = leer_info_supermercado()
 
@@ -34,8 +56,11 @@ info_supermercado = leer_info_supermercado()
 # MODELOS DE IA
 # =============================================================================
 
-modelo_input = OllamaLLM(model="gemma3_input:latest")
-modelo_output = ChatOllama(model="gemma3_output:latest")
+# URL, keep_alive y pool de conexiones en app/modelos.py.
+# ModeloMedido registra la duración de cada llamada para /metrics.
+_modelo_output = crear_modelo_output()
+modelo_input = ModeloMedido(crear_modelo_input(), "input")
+modelo_output = ModeloMedido(_modelo_output, "output")
 
 # =============================================================================
 # CONFIGURACIÓN DEL PROMPT Y DEL HISTORIAL
@@ -46,24 +71,38 @@ prompt = ChatPromptTemplate.from_messages([
     ("human", "{input}")
 ])
 
-chain = prompt | modelo_output
+chain = prompt | _modelo_output
 
 # =============================================================================
 # HISTORIAL EN MEMORIA
 # =============================================================================
 
-store = {}
+# Lo administra el gestor de sesiones (desalojo por inactividad y por cantidad)
+store = gestor_sesiones.historiales
+
+# Protege la creación de sesiones cuando get_response corre en varios hilos
+lock_sesiones = threading.Lock()
+
+def nuevo_historial():
+    # 🧠 El mensaje inicial con la información del supermercado queda fijo;
+    # de la conversación solo se envía lo que entra en el presupuesto de tokens
+    return crear_historial(
+        f"Contexto inicial: esta conversación es con el asistente del supermercado. "
+        f"Usá esta información solo como referencia general:\n\n{info_supermercado}"
+    )
+
+# El gestor la usa para reconstruir historiales guardados en un backend compartido
+gestor_sesiones.fabrica_historial = nuevo_historial
 
 def get_session_history(session_id: str):
-    if session_id not in store:
-        store[session_id] = InMemoryChatMessageHistory()
-        # 🧠 Agregamos el mensaje inicial con la información del supermercado
-        store[session_id].add_user_message(
-            f"Contexto inicial: esta conversación es con el asistente del supermercado. "
-            f"Usá esta información solo como referencia general:\n\n{info_supermercado}"
-        )
-        print(f"🆕 Nueva sesión creada para {session_id} con contexto del supermercado cargado.")
-    return store[session_id]
+    historial = store.get(session_id)
+    if historial is not None:
+        return historial
+    with lock_sesiones:
+        if session_id not in store:
+            store[session_id] = nuevo_historial()
+            log.debug("🆕 Nueva sesión creada para %s con contexto del supermercado cargado.", session_id)
+        return store[session_id]
 
 # store = {}
 
@@ -83,12 +122,12 @@ def get_session_history(session_id: str):
 
 #     return store[session_id]
 
-with_message_history = RunnableWithMessageHistory(
+with_message_history = ModeloMedido(RunnableWithMessageHistory(
     chain,
     get_session_history,
     input_messages_key="input",
     history_messages_key="history"
-)
+), "output")
 
 # ===========================================================================================
 # LECTURA DE HISTORIAL DESDE ARCHIVO (desactivado hasta que se guarden los pedidos en disco)
@@ -139,16 +178,19 @@ with_message_history = RunnableWithMessageHistory(
 # DATOS TRAÍDOS DESDE BD (guarda los productos ya consultados y mostrados al cliente)
 # ====================================================================================
 
-datos_traidos_desde_bd = {}
+datos_traidos_desde_bd = gestor_sesiones.datos
 
 def get_datos_traidos_desde_bd(session_id: str):
-    if session_id not in datos_traidos_desde_bd:
-        datos_traidos_desde_bd[session_id] = {
-            "productos_mostrados": {},               # los productos que ya se consultaron
+    session_data = datos_traidos_desde_bd.get(session_id)
+    if session_data is not None:
+        productos_mostrados_de(session_data)
+        return session_data
+    with lock_sesiones:
+        return datos_traidos_desde_bd.setdefault(session_id, {
+            "productos_mostrados": ProductosMostrados(),   # los productos que ya se consultaron
             #"ultimo_producto_agregado": None,        # el último producto confirmado
             #"producto_pendiente_confirmacion": None  # si está esperando confirmación
-        }
-    return datos_traidos_desde_bd[session_id]
+        })
 
 # =======================================================================================
 # FUNCIÓN AUXILIAR PARA REGENERAR LA LISTA TEXTUAL DE PRODUCTOS MOSTRADOS
@@ -157,14 +199,13 @@ def get_datos_traidos_desde_bd(session_id: str):
 
 def regenerar_productos_textuales(session_id: str):
     session_data = get_datos_traidos_desde_bd(session_id)
-    productos_textuales = "Estos son los productos que se le mostraron hasta ahora al cliente:\n"
-    for lista in session_data["productos_mostrados"].values():
-        for p in lista:
-            productos_textuales += f"- {p['producto']}\n"
+    productos_textuales = productos_mostrados_de(session_data).texto(
+        "Estos son los productos que se le mostraron hasta ahora al cliente:\n"
+    )
     session_data["productos_textuales"] = productos_textuales
 
-    print("\n📦 Productos textuales actualizados:")
-    print(productos_textuales)
+    log.debug("📦 Productos textuales actualizados:")
+    log.debug("%s", productos_textuales)
 
 # =============================================================================
 # FUNCIÓN AUXILIAR: mostrar los productos guardados en memoria
@@ -174,20 +215,27 @@ def mostrar_productos_en_memoria(session_id: str):
     session_data = get_datos_traidos_desde_bd(session_id)
     productos_previos = session_data.get("productos_mostrados", {})
 
-    print("📌 Productos actualmente guardados en memoria:")
+    log.debug("📌 Productos actualmente guardados en memoria:")
     if productos_previos:
         for clave, lista in productos_previos.items():
-            print(f"  🔹 '{clave}' → {len(lista)} producto(s):")
+            log.debug("  🔹 '%s' → %s producto(s):", clave, len(lista))
             for p in lista:
-                print(f"     • {p['producto']}")
+                log.debug("     • %s", p['producto'])
 
     else:
-        print("  (vacío)")
+        log.debug("  (vacío)")
+
+# =============================================================================
+# FUNCIÓN AUXILIAR: lista de productos con viñetas (para armar los prompts)
+# =============================================================================
+
+def listar_con_vinetas(productos) -> str:
+    return "".join(f"• {p['producto']} — ${p['precio_venta']}\n" for p in productos)
 
 # =====================================================================================
 # FUNCIÓN AUXILIAR: Generar respuesta con lista de productos usando IA
 # =====================================================================================
-def generar_lista_productos_con_ia(modelo_output, user_input, productos, session_id):
+async def generar_lista_productos_con_ia(modelo_output, user_input, productos, session_id):
     """
     Usa la IA para generar una respuesta natural con los productos encontrados.
     Si la IA falla, devuelve una lista simple sin texto prearmado.
@@ -200,17 +248,24 @@ Mostrá los productos relacionados con su consulta.
 Si hay varios, mostralos todos con viñetas (•).
 Si hay solo uno, igual mostralo con una viñeta (•), manteniendo el mismo formato.
 
-{''.join([f"• {p['producto']} — ${p['precio_venta']}\n" for p in productos])}
+{listar_con_vinetas(productos)}
 
 Mostrá la lista con viñetas (•) de forma amable y natural,
 con un tono cálido y simpático, sin hacer preguntas ni ofrecer acciones.
 Cerrá con un comentario corto y natural sobre los productos (por ejemplo, sobre que hay variedad o que se ven buenos),
 pero sin invitar a comprar ni agregar al pedido, ni a realizar ninguna otra accion.
 """
-        result_lista = modelo_output.invoke(prompt_lista)
-        respuesta = result_lista.content if hasattr(result_lista, "content") else str(result_lista)
+        respuesta = await renderizar_lista(
+            modelo_output, productos,
+            encabezado="Estos son los productos que tenemos 😊",
+            prompt_ia=prompt_lista,
+            prompt_de_cierre=prompt_cierre(
+                user_input, productos,
+                "Escribí un comentario corto, cálido y natural sobre los productos (por ejemplo, que hay variedad o que se ven buenos)."
+            ),
+        )
     except Exception as e:
-        print(f"⚠️ Error al generar respuesta con IA: {e}")
+        log.warning("⚠️ Error al generar respuesta con IA: %s", e)
         respuesta = (
             "Estos son los productos disponibles:\n\n" +
             "\n".join([f"• {p['producto']} — ${p['precio_venta']}" for p in productos])
@@ -221,40 +276,33 @@ pero sin invitar a comprar ni agregar al pedido, ni a realizar ninguna otra acci
 # COMPARACIÓN CON PRODUCTOS MOSTRADOS (MISMO TEXTO DEL PROMPT ORIGINAL)
 # =============================================================================
 
-def comparar_con_producto_mostrado(user_input: str, session_id: str) -> str:
+async def comparar_con_producto_mostrado(user_input: str, session_id: str) -> str:
     try:
         # Normalización previa de unidades comunes (para mejorar coincidencias)
-        normalizaciones = {
-            r"\bmedio litro\b": "500ml",
-            r"\bmedio kilo\b": "500g",
-            r"\bmedia docena\b": "6 unidades",
-            r"\bun litro\b": "1l",
-            r"\bdos litros\b": "2l",
-            r"\btres litros\b": "3l",
-            r"\bcuatro litros\b": "4l",
-            r"\bquinientos gramos\b": "500g",
-            r"\bun kilo\b": "1kg",
-            r"\bdos kilos\b": "2kg",
-            r"\btres kilos\b": "3kg",
-            r"\bcuatro kilos\b": "4kg",
-            r"\bmedio paquete\b": "1/2 paquete",
-        }
-
-        for patron, reemplazo in normalizaciones.items():
-            user_input = re.sub(patron, reemplazo, user_input.lower())
+        for patron, reemplazo in NORMALIZACIONES:
+            user_input = patron.sub(reemplazo, user_input.lower())
 
         session_data = get_datos_traidos_desde_bd(session_id)
         productos_mostrados = session_data.get("productos_mostrados", {})
 
         if not productos_mostrados:
-            print("⚠️  No hay productos mostrados en esta sesión, no se puede comparar.")
+            log.warning("⚠️  No hay productos mostrados en esta sesión, no se puede comparar.")
             return None
 
-        # Armamos lista textual con los productos mostrados hasta el momento
+        # Primero sin IA: ordinales, más barato/caro/grande/chico, tamaño o nombre
+        fila, estado, candidatos = resolver_referencia(user_input, list(productos_mostrados.values()))
+        if estado == "resuelto":
+            log.debug("🎯 Referencia resuelta sin IA → %s", fila['producto'])
+            return fila["producto"]
+        if estado == "sin_referencia":
+            log.debug("🎯 La frase no se refiere a ningún producto mostrado.")
+            return None
+        log.debug("🤔 Referencia ambigua entre %s productos; se consulta a la IA.", len(candidatos))
+
+        # Armamos lista textual con los productos entre los que hay que decidir
         productos_previos_texto = "Estos son los productos que ya se le mostraron al cliente:\n"
-        for lista in productos_mostrados.values():
-            for p in lista:
-                productos_previos_texto += f"- {p['producto']}\n"
+        for p in candidatos:
+            productos_previos_texto += f"- {p['producto']}\n"
 
         # Le pasamos todo el contexto a la IA, pero usando la función estructurada
         contexto = f"""
@@ -288,21 +336,21 @@ buscá el nombre más parecido entre los productos mostrados y devolvelo como pr
 No inventes nombres nuevos.
 """
 
-        detected = detect_product_with_ai(contexto, session_id)
+        detected = await detect_product_with_ai(contexto, session_id)
         productos = detected.get("productos", [])
         intencion = detected.get("intencion")
 
         if not productos:
-            print("🤖 IA: no se encontró coincidencia con los productos mostrados.")
+            log.debug("🤖 IA: no se encontró coincidencia con los productos mostrados.")
             return None
 
         producto_detectado = productos[0]
-        print(f"🤖 IA: coincidencia encontrada → Intención: {intencion} | Producto: {producto_detectado}")
+        log.debug("🤖 IA: coincidencia encontrada → Intención: %s | Producto: %s", intencion, producto_detectado)
         
         return producto_detectado
 
     except Exception as e:
-        print(f"⚠️ Error en comparar_con_producto_mostrado: {e}")
+        log.warning("⚠️ Error en comparar_con_producto_mostrado: %s", e)
         return None
 
 # =============================================================================
@@ -347,46 +395,69 @@ def convertir_a_numero_es(user_input: str) -> int:
 # BÚSQUEDA DE PRODUCTOS EN LA BASE DE DATOS
 # =============================================================================
 
-#def get_product_info(product_name: str):
-def get_product_info(product_name: str, session_id: str, solo_nombre=False):
-    connection = connect_to_db()
-    if not connection:
-        return print("no se conecto a la bd")
+def buscar_en_catalogo(product_name: str, session_id: str, solo_nombre=False, corregir=True):
+    """
+    Misma búsqueda que get_product_info pero resuelta con el índice en memoria
+    (app/catalogo.py), sin conexiones ni consultas a la base. Si no hay
+    resultados se reintenta una vez con los errores de tipeo corregidos.
+    """
+    product_name_lower = product_name.strip().lower()
+    words = product_name_lower.split()
+    first_word = words[0] if words else product_name_lower
+
+    categoria_row, productos_categoria = catalogo.buscar_categoria(product_name_lower)
+    if categoria_row:
+        log.debug("📂 Coincidencia con categoría detectada: %s", categoria_row['nombre'])
+        session_data = get_datos_traidos_desde_bd(session_id)
+        session_data["productos_mostrados"][product_name.lower()] = productos_categoria
+        regenerar_productos_textuales(session_id)
+        return productos_categoria
+
+    if solo_nombre:
+        start_results = catalogo.buscar_por_palabra(product_name_lower)
     else:
-        print(f"🗃️  Se conectó a la BD (buscando: '{product_name}')")
-
-    cursor = connection.cursor(dictionary=True)
-
-    QUERY_START = """SELECT 
-    p.id, 
-    p.nombre AS producto, 
-    p.descripcion, 
-    p.precio_costo, 
-    p.precio_venta, 
-    p.stock, 
-    m.nombre AS marca, 
-    c.nombre AS categoria
-    FROM productos p 
-    INNER JOIN marcas m ON p.marca_id = m.id 
-    INNER JOIN categorias c ON p.categoria_id = c.id
-    WHERE LOWER(p.nombre) LIKE %s or LOWER(m.nombre) LIKE %s or LOWER(c.nombre) LIKE %s
-    ORDER BY p.nombre ASC; """
-
-    QUERY_CONTAINS = """SELECT 
-    p.id, 
-    p.nombre AS producto, 
-    p.descripcion, 
-    p.precio_costo, 
-    p.precio_venta, 
-    p.stock, 
-    m.nombre AS marca, 
-    c.nombre AS categoria
-    FROM productos p 
-    INNER JOIN marcas m ON p.marca_id = m.id 
-    INNER JOIN categorias c ON p.categoria_id = c.id
-    WHERE LOWER(p.nombre) LIKE %s
-    AND NOT LOWER(p.nombre) LIKE %s
-    ORDER BY p.nombre ASC;"""
+        start_results = catalogo.buscar_por_prefijo(first_word)
+    if start_results:
+        return start_results
+
+    contain_results = catalogo.buscar_contiene(product_name_lower)
+    if contain_results:
+        return contain_results
+
+    # "yerva", "cocacola": se corrige antes de caer en la consulta de "¿es una comida?".
+    # Los platos ya conocidos no se corrigen ("pizza" no tiene que volverse otro producto);
+    # lo guardado como "no es comida" sí, porque puede ser justamente un error de tipeo.
+    receta = base_recetas.obtener(product_name)
+    if corregir and not (receta and receta["es_comida"]):
+        corregido = catalogo.corregir(product_name)
+        if corregido:
+            log.debug("🔤 '%s' corregido a '%s'", product_name, corregido)
+            resultado = buscar_en_catalogo(corregido, session_id, solo_nombre, corregir=False)
+            if isinstance(resultado, list):
+                return resultado
+
+    return f"No se encontró ningún producto relacionado con '{product_name}'."
+
+
+#def get_product_info(product_name: str):
+async def get_product_info(product_name: str, session_id: str, solo_nombre=False):
+    # Si el índice en memoria ya está cargado, se evita ir a la base
+    if catalogo.listo():
+        return buscar_en_catalogo(product_name, session_id, solo_nombre)
+
+    try:
+        return await buscar_en_bd(product_name, session_id, solo_nombre)
+    except Exception as e:
+        log.debug("no se conecto a la bd: %s", e)
+        return None
+
+
+async def buscar_en_bd(product_name: str, session_id: str, solo_nombre=False):
+    """
+    Misma búsqueda que buscar_en_catalogo contra MySQL, con las consultas de
+    app/consultas_catalogo.py (requieren script/migraciones/001_indices_busqueda.sql).
+    """
+    log.debug("🗃️  Buscando en la BD: '%s'", product_name)
 
     product_name_lower = product_name.strip().lower()
     words = product_name_lower.split()
@@ -395,29 +466,15 @@ def get_product_info(product_name: str, session_id: str, solo_nombre=False):
     # =====================================================
     # Verificar si el texto coincide con una categoría
     # =====================================================
-    cursor.execute("SELECT id, nombre FROM categorias WHERE LOWER(nombre) = %s;", (product_name_lower,))
-    categoria_row = cursor.fetchone()
+    if diccionarios.listo():
+        categoria_row = diccionarios.categoria(product_name_lower)
+    else:
+        categorias = await ejecutar_consulta_async(QUERY_CATEGORIA, (product_name_lower,))
+        categoria_row = categorias[0] if categorias else None
 
     if categoria_row:
-        print(f"📂 Coincidencia con categoría detectada: {categoria_row['nombre']}")
-        categoria_id = categoria_row["id"]
-
-        cursor.execute("""
-            SELECT 
-                p.id,
-                p.nombre AS producto,
-                p.descripcion,
-                p.precio_venta,
-                m.nombre AS marca,
-                c.nombre AS categoria
-            FROM productos p
-            INNER JOIN marcas m ON p.marca_id = m.id
-            INNER JOIN categorias c ON p.categoria_id = c.id
-            WHERE p.categoria_id = %s
-            ORDER BY p.nombre ASC;
-        """, (categoria_id,))
-
-        productos_categoria = cursor.fetchall()
+        log.debug("📂 Coincidencia con categoría detectada: %s", categoria_row['nombre'])
+        productos_categoria = await ejecutar_consulta_async(QUERY_PRODUCTOS_CATEGORIA, (categoria_row["id"],))
 
         # Guardar en memoria los productos de la categoría mostrados al cliente
         session_data = get_datos_traidos_desde_bd(session_id)
@@ -425,73 +482,130 @@ def get_product_info(product_name: str, session_id: str, solo_nombre=False):
         # Actualizar texto de productos mostrados para IA input
         regenerar_productos_textuales(session_id)
 
-        cursor.close()
-        connection.close()
-
         return productos_categoria
 
     # =====================================================
     # Si no es categoría, buscar por nombre o marca
     # =====================================================
 
-    if solo_nombre:
-        # 🔍 Búsqueda restringida: solo por nombre exacto o coincidencia cercana (para ingredientes)
-        cursor.execute("""
-            SELECT 
-                p.id, 
-                p.nombre AS producto, 
-                p.descripcion, 
-                p.precio_venta,
-                m.nombre AS marca, 
-                c.nombre AS categoria
-            FROM productos p
-            INNER JOIN marcas m ON p.marca_id = m.id
-            INNER JOIN categorias c ON p.categoria_id = c.id
-            WHERE LOWER(p.nombre) = %s
-            OR LOWER(p.nombre) LIKE %s
-            OR LOWER(p.nombre) LIKE %s
-            OR LOWER(p.nombre) LIKE %s
-            ORDER BY p.nombre ASC;
-        """, (
-            product_name_lower,
-            f"{product_name_lower} %",
-            f"% {product_name_lower}",
-            f"% {product_name_lower} %"
-        ))
+    # Candidatos por palabras (FULLTEXT) o, si el texto no tiene ninguna indexable, por LIKE
+    candidatos = None
 
+    async def _candidatos():
+        nonlocal candidatos
+        if candidatos is None:
+            consulta = texto_fulltext(product_name_lower)
+            if consulta:
+                candidatos = await ejecutar_consulta_async(QUERY_PALABRAS, (consulta,))
+            else:
+                candidatos = await ejecutar_consulta_async(QUERY_CONTIENE, (f"%{escapar_like(product_name_lower)}%",))
+        return candidatos
 
+    if solo_nombre:
+        # 🔍 Búsqueda restringida: solo por nombre exacto o como palabra completa (para ingredientes)
+        start_results = filtrar_por_palabra(await _candidatos(), product_name_lower)
     else:
         # 🔍 Búsqueda general (nombre, marca o categoría)
-        cursor.execute(QUERY_START, (f"{first_word}%", f"{first_word}%", f"{first_word}%"))
+        prefijo = f"{escapar_like(first_word)}%"
+        start_results = await ejecutar_consulta_async(QUERY_PREFIJO, (prefijo, prefijo, prefijo))
 
-    start_results = cursor.fetchall()
     if start_results:
-        cursor.close()
-        connection.close()
         return start_results
 
-    cursor.execute(QUERY_CONTAINS, (f"%{product_name_lower}%", f"{product_name_lower}%"))
-    contain_results = cursor.fetchall()
-    cursor.close()
-    connection.close()
+    contain_results = filtrar_contiene(await _candidatos(), product_name_lower)
+    if not contain_results and texto_fulltext(product_name_lower):
+        # FULLTEXT solo encuentra palabras que empiezan con el texto; "cola" dentro
+        # de "Cocacola" se busca como antes, con LIKE sobre el nombre
+        contain_results = filtrar_contiene(
+            await ejecutar_consulta_async(QUERY_CONTIENE, (f"%{escapar_like(product_name_lower)}%",)),
+            product_name_lower,
+        )
 
     if contain_results:
         return contain_results
 
     return f"No se encontró ningún producto relacionado con '{product_name}'."
 
+async def buscar_varios_por_nombre(nombres: list) -> list:
+    """
+    Busca varios productos por nombre en una sola pasada: con el índice en memoria
+    si está cargado, o con una única consulta a la base. Devuelve las filas sin
+    repetir, en el orden de los nombres pedidos.
+    """
+    if catalogo.listo():
+        por_nombre = catalogo.buscar_varios_por_palabra(nombres)
+    else:
+        por_nombre = await buscar_varios_en_bd(nombres)
+
+    encontrados, vistos = [], set()
+    for nombre in nombres:
+        for p in por_nombre.get(nombre, []):
+            if p["id"] not in vistos:
+                vistos.add(p["id"])
+                encontrados.append(p)
+    return encontrados
+
+
+async def buscar_varios_en_bd(nombres: list) -> dict:
+    if not nombres:
+        return {}
+    # Una sola consulta FULLTEXT para todos los nombres; los que no tienen
+    # palabras indexables van por LIKE sobre el nombre normalizado
+    filas = []
+    consulta = texto_fulltext_varios(nombres)
+    if consulta:
+        filas += await ejecutar_consulta_async(QUERY_PALABRAS, (consulta,))
+    for nombre in nombres:
+        if texto_fulltext(nombre) is None:
+            filas += await ejecutar_consulta_async(QUERY_CONTIENE, (f"%{escapar_like(nombre.strip().lower())}%",))
+
+    # Misma prioridad que la búsqueda solo_nombre: palabra completa y, si no, "contiene"
+    resultados = {}
+    nombres_filas = [(f, normalizar_texto(f["producto"])) for f in filas]
+    for nombre in nombres:
+        buscado = normalizar_texto(nombre)
+        por_palabra = [f for f, n in nombres_filas if f" {buscado} " in f" {n} "]
+        resultados[nombre] = por_palabra or [
+            f for f, n in nombres_filas if buscado in n and not n.startswith(buscado)
+        ]
+        if not resultados[nombre] and texto_fulltext(nombre) is not None:
+            # Dentro de una palabra ("late" en "Chocolate") FULLTEXT no encuentra nada
+            resultados[nombre] = filtrar_contiene(
+                await ejecutar_consulta_async(QUERY_CONTIENE, (f"%{escapar_like(nombre.strip().lower())}%",)),
+                nombre,
+            )
+    return resultados
+
 # =============================================================================
 # DETECCIÓN DE COMIDAS COMPUESTAS Y BÚSQUEDA DE SUS INGREDIENTES
 # =============================================================================
 
-def buscar_ingredientes_para_comida(nombre_plato: str, session_id: str):
+def interpretar_si_no(respuesta: str):
+    """True/False según la primera palabra ("Sí.", "**no**", "si, es un plato"); None si no se entiende."""
+    respuesta = re.sub(r"<think>.*?</think>", "", respuesta, flags=re.DOTALL)
+    palabras = re.findall(r"\w+", normalizar_texto(respuesta))
+    primera = palabras[0] if palabras else ""
+    return {"si": True, "no": False}.get(primera)
+
+
+async def preguntar_si_es_comida(nombre_plato: str) -> bool:
+    prompt_comida = f"Decime solo 'sí' o 'no': ¿'{nombre_plato}' es una comida o plato preparado?"
+    respuesta = await modelo_input.ainvoke(prompt_comida, proposito="es_comida")
+    es_comida = interpretar_si_no(respuesta)
+    if es_comida is None:
+        # Sin una respuesta clara no se guarda nada: la próxima vez se vuelve a preguntar
+        log.warning("⚠️ Respuesta no reconocida sobre si '%s' es comida: %r", nombre_plato, respuesta)
+        return False
+    if not es_comida:
+        base_recetas.registrar_no_comida(nombre_plato)
+    return es_comida
+
+
+async def pedir_ingredientes(nombre_plato: str):
     """
-    Si un producto no se encuentra en la base, esta función intenta detectar
-    si el nombre corresponde a una comida compuesta (ej: pizza, ensalada, torta, empanada, hamburguesa)
-    y busca los ingredientes en la base de datos.
+    Ingredientes del plato según la IA, o None si no es una comida.
+    No guarda nada: puede correr antes de saber si hace falta.
     """
-
-    # 1️⃣ Pedimos a la IA que identifique los ingredientes
     prompt_ingredientes = f"""
     Tu tarea es detectar los ingredientes principales necesarios para preparar "{nombre_plato}".
 
@@ -516,69 +630,130 @@ def buscar_ingredientes_para_comida(nombre_plato: str, session_id: str):
     Ejemplo de salida válida para hamburguesa: carne, pan, lechuga, tomate, queso, mayonesa  
 
     """
-    try:
-        respuesta_ia = modelo_input.invoke(prompt_ingredientes).strip()
-        respuesta_ia = re.sub(r"<think>.*?</think>", "", respuesta_ia, flags=re.DOTALL).strip()
-        print(f"🤖 Ingredientes detectados por IA: {respuesta_ia}")
 
-        if respuesta_ia.upper() == "NINGUNO":
-            return None
+    respuesta_ia = (await modelo_input.ainvoke(prompt_ingredientes, proposito="ingredientes")).strip()
+    respuesta_ia = re.sub(r"<think>.*?</think>", "", respuesta_ia, flags=re.DOTALL).strip()
+    log.debug("🤖 Ingredientes detectados por IA: %s", respuesta_ia)
 
-        ingredientes = [i.strip().lower() for i in re.split(r",|\n|y", respuesta_ia) if i.strip()]
-        encontrados = []
+    if respuesta_ia.upper() == "NINGUNO":
+        return None
+    return list(dict.fromkeys(
+        i.strip().lower() for i in re.split(r",|\n|\s+y\s+", respuesta_ia) if i.strip()
+    ))
 
-        # 2️⃣ Buscamos los ingredientes reales en la base usando la sesión actual
-        for ingrediente in ingredientes:
-            # 🔍 Para ingredientes, buscamos solo por nombre (sin categoría ni marca)
-            resultados = get_product_info(ingrediente, session_id, solo_nombre=True)
-            if isinstance(resultados, list) and len(resultados) > 0:
-                encontrados.extend(resultados)
 
-        if not encontrados:
-            return None
+async def _valor(valor):
+    return valor
+
+
+async def _no_comida(nombre_plato: str) -> bool:
+    base_recetas.registrar_no_comida(nombre_plato)
+    return False
 
-        # =====================================================
-        # Guardar los ingredientes encontrados en memoria
-        # igual que se hace con los productos mostrados comunes.
-        # Pero sin actualizar producto_actual todavía.
-        # =====================================================
-        session_data = get_datos_traidos_desde_bd(session_id)
-        nombre_comida = nombre_plato.lower().strip()
 
-        # ⚙️ Evitar duplicados si ya existen
-        if nombre_comida not in session_data["productos_mostrados"]:
-            session_data["productos_mostrados"][nombre_comida] = encontrados
-            datos_traidos_desde_bd[session_id] = session_data
-            print(f"📦 Ingredientes guardados en memoria bajo '{nombre_comida}' ({len(encontrados)} productos)")
+def agregar_pasos_de_plato(grafo: Grafo, nombre_plato: str, plato: dict = None):
+    """
+    Agrega al grafo "es_comida", "ingredientes" y "productos" (los del catálogo).
+    Si el plato no está en la base de recetas, se usa lo que ya dijo la detección
+    (`plato`: {"es_comida", "ingredientes"}); lo que falte, la pregunta
+    "¿es comida?" y el pedido de ingredientes, va a la IA a la vez.
+    """
+    receta = base_recetas.obtener(nombre_plato)
+    if receta is not None:
+        log.debug("📖 '%s' encontrado en la base de recetas (comida: %s)", nombre_plato, 'sí' if receta['es_comida'] else 'no')
+        grafo.agregar("es_comida", lambda: _valor(receta["es_comida"]))
+        grafo.agregar("ingredientes", lambda: _valor(receta["ingredientes"] if receta["es_comida"] else None))
+    elif plato is not None and not plato["es_comida"]:
+        log.debug("🧩 Según la detección, '%s' no es una comida", nombre_plato)
+        grafo.agregar("es_comida", lambda: _no_comida(nombre_plato))
+        grafo.agregar("ingredientes", lambda: _valor(None))
+    elif plato is not None:
+        log.debug("🧩 Según la detección, '%s' es una comida", nombre_plato)
+        grafo.agregar("es_comida", lambda: _valor(True))
+        if plato["ingredientes"]:
+            grafo.agregar("ingredientes", lambda: _valor(plato["ingredientes"]))
         else:
-            print(f"⚠️ Ingredientes para '{nombre_comida}' ya estaban guardados, se evita duplicar")
+            grafo.agregar("ingredientes", lambda: pedir_ingredientes(nombre_plato))
+    else:
+        grafo.agregar("es_comida", lambda: preguntar_si_es_comida(nombre_plato))
+        grafo.agregar("ingredientes", lambda: pedir_ingredientes(nombre_plato))
 
-        # No actualizamos producto_actual aquí.
-        # Se definirá más adelante, cuando el cliente confirme cuál quiere.
-        return encontrados
+    async def _productos(ingredientes):
+        # Todos los ingredientes juntos, en una sola pasada por el catálogo
+        return await buscar_varios_por_nombre(ingredientes) if ingredientes else []
 
+    grafo.agregar("productos", _productos, "ingredientes")
+    return receta
+
+
+async def buscar_ingredientes_para_comida(nombre_plato: str, session_id: str, grafo: Grafo = None, plato: dict = None):
+    """
+    Si un producto no se encuentra en la base, esta función intenta detectar
+    si el nombre corresponde a una comida compuesta (ej: pizza, ensalada, torta, empanada, hamburguesa)
+    y busca los ingredientes en la base de datos.
+    Con `grafo`, usa los pasos que ya están corriendo (ver agregar_pasos_de_plato).
+    """
+    try:
+        if grafo is None:
+            async with Grafo() as propio:
+                receta = agregar_pasos_de_plato(propio, nombre_plato, plato)
+                return await _ingredientes_encontrados(propio, nombre_plato, session_id, receta)
+        return await _ingredientes_encontrados(grafo, nombre_plato, session_id, base_recetas.obtener(nombre_plato))
     except Exception as e:
-        print(f"⚠️ Error en buscar_ingredientes_para_comida: {e}")
+        log.warning("⚠️ Error en buscar_ingredientes_para_comida: %s", e)
+        return None
+
+
+async def _ingredientes_encontrados(grafo: Grafo, nombre_plato: str, session_id: str, receta):
+    # Si ya sabemos que no es una comida, no hay nada que buscar
+    if receta is not None and not receta["es_comida"]:
+        log.debug("📖 '%s' figura en la base de recetas como no comida.", nombre_plato)
         return None
 
+    ingredientes = await grafo.resultado("ingredientes")
+    if receta is None:
+        if ingredientes is None:
+            base_recetas.registrar_no_comida(nombre_plato)
+            return None
+        base_recetas.registrar(nombre_plato, ingredientes)
+    else:
+        log.debug("📖 Ingredientes de '%s' tomados de la base de recetas: %s", nombre_plato, ', '.join(ingredientes))
+
+    encontrados = await grafo.resultado("productos")
+    if not encontrados:
+        return None
+
+    # =====================================================
+    # Guardar los ingredientes encontrados en memoria
+    # igual que se hace con los productos mostrados comunes.
+    # Pero sin actualizar producto_actual todavía.
+    # =====================================================
+    session_data = get_datos_traidos_desde_bd(session_id)
+    nombre_comida = nombre_plato.lower().strip()
+
+    # ⚙️ Evitar duplicados si ya existen
+    if nombre_comida not in session_data["productos_mostrados"]:
+        session_data["productos_mostrados"][nombre_comida] = encontrados
+        datos_traidos_desde_bd[session_id] = session_data
+        log.debug("📦 Ingredientes guardados en memoria bajo '%s' (%s productos)", nombre_comida, len(encontrados))
+    else:
+        log.warning("⚠️ Ingredientes para '%s' ya estaban guardados, se evita duplicar", nombre_comida)
+
+    # No actualizamos producto_actual aquí.
+    # Se definirá más adelante, cuando el cliente confirme cuál quiere.
+    return encontrados
+
 # =============================================================================
 # DETECCIÓN DE INTENCIÓN Y PRODUCTOS CON IA
 # =============================================================================
 
-def detect_product_with_ai(user_input, session_id="main"):
+async def detect_product_with_ai(user_input, session_id="main"):
     try:
         session_data = get_datos_traidos_desde_bd(session_id)
         #resumen_input = session_data.get("resumen_input", "").strip()
-        productos_mostrados = session_data.get("productos_mostrados", {})
-
-        # Construir lista textual con los productos ya mostrados
-        productos_previos_texto = ""
-        if productos_mostrados:
-            productos_previos_texto = "Estos son los productos que ya se le mostraron al cliente:\n"
-            for lista in productos_mostrados.values():
-                for p in lista:
-                    productos_previos_texto += f"- {p['producto']}\n"
 
+        # Lista textual con los productos ya mostrados (sin repetidos, acotada, ya armada)
+        productos_previos_texto = productos_mostrados_de(session_data).texto()
 
         # Prompt base
         prompt = f"""
@@ -592,12 +767,20 @@ Frase del cliente: "{user_input}"
         # Si hay contexto, productos mostrados o producto_actual, incluirlos en el prompt
         producto_actual = session_data.get("producto_actual", None)
 
+        # Convertir lista de productos a texto si es necesario
+        if isinstance(producto_actual, list):
+            producto_texto = ", ".join(producto_actual)
+        else:
+            producto_texto = producto_actual
+
+        # Si ya se detectó la misma frase con el mismo contexto, no se llama a la IA
+        clave = clave_deteccion(user_input, f"{productos_previos_texto}|{producto_texto or ''}")
+        guardado = await cache_deteccion.aobtener(clave)
+        if guardado:
+            log.debug("⚡ Detección tomada de la caché: %s %s", guardado['intencion'], guardado['productos'])
+            return guardado
+
         if productos_previos_texto or producto_actual:
-            # Convertir lista de productos a texto si es necesario
-            if isinstance(producto_actual, list):
-                producto_texto = ", ".join(producto_actual)
-            else:
-                producto_texto = producto_actual
 
             prompt = f"""
         Considerá este contexto previo:
@@ -611,60 +794,173 @@ Frase del cliente: "{user_input}"
                 "{user_input}"
         """
 
-        # Llamada a la IA input
-        raw_response = modelo_input.invoke(prompt).strip()
-        cleaned = re.sub(r"<think>.*?</think>", "", raw_response, flags=re.DOTALL | re.IGNORECASE)
-
-        # Extraer intención y productos
-        intent_match = re.search(r"intenci[oó]n\s*(detectada|:)?\s*[:\-]?\s*([A-Z_]+)", cleaned, re.IGNORECASE)
-        prod_match = re.search(r"productos\s*(mencionados|:)?\s*[:\-]?\s*([^\n\r]+)", cleaned, re.IGNORECASE)
-
-        intent = intent_match.group(2).upper() if intent_match else None
-        products_text = prod_match.group(2).strip() if prod_match else ""
-
-        if not products_text or products_text.lower().startswith("ninguno"):
-            products = []
+        # Llamada a la IA input (con esquema JSON, la salida viene restringida a ese formato)
+        if DETECCION_ESTRUCTURADA:
+            raw_response = await modelo_input.ainvoke(prompt + INSTRUCCIONES_JSON, format=ESQUEMA_DETECCION, proposito="deteccion")
         else:
-            products = [p.strip() for p in re.split(r",|\s+y\s+|\n", products_text) if p.strip()]
+            raw_response = await modelo_input.ainvoke(prompt, proposito="deteccion")
+        resultado = interpretar(raw_response.strip())
 
-        print("🧩 Resultado de la detección de input:")
-        print(f"  🔹 Intención: {intent or 'No detectada'}")
-        print(f"  🔹 Productos: {products or 'Ninguno'}")
+        log.debug("🧩 Resultado de la detección de input:")
+        log.debug("  🔹 Intención: %s", resultado['intencion'] or 'No detectada')
+        log.debug("  🔹 Productos: %s", resultado['productos'] or 'Ninguno')
+        if resultado["confianza"] is not None:
+            log.debug("  🔹 Confianza: %s", resultado['confianza'])
 
-        return {
-            "intencion": intent,
-            "productos": products
-        }
+        # Solo se guardan las detecciones válidas (si falló, conviene reintentar)
+        if se_puede_guardar(resultado):
+            cache_deteccion.guardar(clave, resultado)
+        return resultado
 
     except Exception as e:
-        print(f"Error en detect_product_with_ai: {e}")
+        log.error("Error en detect_product_with_ai: %s", e)
         return {
             "intencion": None,
             "productos": []
         }
 
+# =============================================================================
+# VARIOS PRODUCTOS EN UN MISMO MENSAJE ("coca, galletitas y yerba")
+# =============================================================================
+
+NO_PRODUCTOS = ["ninguno", "ninguna", "nada", "ninguno detectado"]
+
+_SEPARADOR_ITEMS = re.compile(r",|;|\n|\s+y\s+|\s+e\s+")
+
+def cantidades_por_producto(user_input: str, productos: list) -> dict:
+    """
+    Cantidad pedida para cada producto ("agregame 2 coca, 3 galletitas y una yerba").
+    Cada producto toma la cantidad del tramo del mensaje que más palabras comparte con él.
+    """
+    tramos = [t for t in _SEPARADOR_ITEMS.split(user_input.lower()) if t.strip()]
+    cantidades = {}
+    for producto in productos:
+        palabras = set(normalizar_texto(producto).split())
+        coincidencias = [(len(palabras & set(normalizar_texto(t).split())), t) for t in tramos]
+        comunes, tramo = max(coincidencias, key=lambda c: c[0], default=(0, ""))
+        cantidades[producto] = convertir_a_numero_es(tramo) if comunes else 1
+    return cantidades
+
+
+def buscar_en_mostrados(session_id: str, producto: str):
+    """Primer producto ya mostrado cuyo nombre contiene el texto (mismo criterio que AGREGAR)."""
+    for lista in get_datos_traidos_desde_bd(session_id)["productos_mostrados"].values():
+        for p in lista:
+            if producto.lower() in p["producto"].lower():
+                return p
+    return None
+
+
+async def resolver_varios_productos(productos: list, session_id: str) -> dict:
+    """producto → filas encontradas (lista vacía si no hay). Las búsquedas corren juntas."""
+    resultados = await en_paralelo({p: (lambda p=p: get_product_info(p, session_id)) for p in productos})
+    return {p: (r if isinstance(r, list) else []) for p, r in resultados.items()}
+
+
+async def consultar_varios_productos(user_input: str, productos: list, session_id: str):
+    """
+    Una sola respuesta con los resultados de todos los productos consultados.
+    Devuelve None si no se encontró ninguno (sigue el flujo de un solo producto).
+    """
+    encontrados = await resolver_varios_productos(productos, session_id)
+    grupos = {nombre: filas for nombre, filas in encontrados.items() if filas}
+    if not grupos:
+        return None
+
+    session_data = get_datos_traidos_desde_bd(session_id)
+    for nombre, filas in grupos.items():
+        session_data["productos_mostrados"][nombre.lower()] = filas
+    mostrar_productos_en_memoria(session_id)
+    regenerar_productos_textuales(session_id)
+
+    todos = [p for filas in grupos.values() for p in filas]
+    faltantes = [nombre for nombre, filas in encontrados.items() if not filas]
+    pie = f"\n\nNo encontré {', '.join(faltantes)} 😕" if faltantes else ""
+
+    try:
+        prompt_lista = f"""
+El cliente preguntó o mencionó: "{user_input}"
+
+Mostrá los productos encontrados para cada cosa que pidió, agrupados por lo que pidió,
+con viñetas (•), de forma amable y natural, sin hacer preguntas ni ofrecer acciones.
+
+{formatear_grupos(grupos)}
+{f"No tenemos: {', '.join(faltantes)}." if faltantes else ""}
+
+Cerrá con un comentario corto y natural sobre los productos,
+pero sin invitar a comprar ni agregar al pedido, ni a realizar ninguna otra accion.
+"""
+        respuesta = await renderizar_lista(
+            modelo_output, todos,
+            encabezado="Esto es lo que tenemos de lo que pediste 😊",
+            prompt_ia=prompt_lista,
+            prompt_de_cierre=prompt_cierre(
+                user_input, todos,
+                "Escribí un comentario corto, cálido y natural sobre los productos."
+            ),
+            cuerpo=formatear_grupos(grupos) + pie,
+        )
+    except Exception as e:
+        log.warning("⚠️ Error al generar respuesta con IA para varios productos: %s", e)
+        respuesta = "Estos son los productos disponibles:\n\n" + formatear_grupos(grupos) + pie
+    return respuesta.strip()
+
+
+async def agregar_varios_productos(user_input: str, productos: list, session_id: str, cantidades: dict = None) -> str:
+    """
+    Agrega todos los productos del mensaje, cada uno con su cantidad, en una sola
+    operación sobre el carrito. Sin llamadas a la IA: los que tienen varias
+    opciones se listan para que el cliente elija. `cantidades` son las que ya
+    devolvió la detección; las que falten se leen del mensaje.
+    """
+    cantidades = {**cantidades_por_producto(user_input, productos), **(cantidades or {})}
+    items, pendientes = [], []
+    for producto in productos:
+        p = buscar_en_mostrados(session_id, producto)
+        if p:
+            items.append((p["producto"], cantidades[producto], p["precio_venta"], p.get("id")))
+        else:
+            pendientes.append(producto)
+
+    opciones, faltantes = {}, []
+    for producto, filas in (await resolver_varios_productos(pendientes, session_id)).items():
+        if len(filas) == 1:
+            p = filas[0]
+            items.append((p["producto"], cantidades[producto], p["precio_venta"], p.get("id")))
+        elif filas:
+            opciones[producto] = filas
+        else:
+            faltantes.append(producto)
+
+    partes = []
+    if items:
+        partes.append(agregar_varios_a_pedido(session_id, items))
+    if opciones:
+        session_data = get_datos_traidos_desde_bd(session_id)
+        for producto, filas in opciones.items():
+            session_data["productos_mostrados"][producto.lower()] = filas
+            partes.append(f"De {producto} tenemos varias opciones, decime cuál te agrego:\n{formatear_lista(filas)}")
+        regenerar_productos_textuales(session_id)
+    if faltantes:
+        partes.append(f"No encontré {', '.join(faltantes)} 😕")
+    return "\n\n".join(partes)
+
 # ==============================================================================
 # CIERRE COMÚN A TODOS LOS CAMINOS DEL GET_RESPONSE
 # ==============================================================================
-def finalizar_respuesta(session_id: str, respuesta: str) -> str:
+def finalizar_respuesta(session_id: str, respuesta: str, rama: str = None) -> str:
+    # La rama identifica el camino de get_response en las métricas
+    anotar_mensaje(rama=rama)
     try:
-        session_data = get_datos_traidos_desde_bd(session_id)
-        if session_data.get("finalizando", False):
-            print("⚠️ finalizar_respuesta() omitido: se detectó doble ejecución.")
-            return respuesta.strip()
-        session_data["finalizando"] = True
-
-        if session_id not in store:
-            store[session_id] = InMemoryChatMessageHistory()
-
-        store[session_id].add_ai_message(respuesta)
+        # Cada sesión se procesa de a un mensaje por vez (app/sesiones.py),
+        # así que acá no hace falta ningún guardia contra doble ejecución.
+        get_session_history(session_id).add_ai_message(respuesta)
 
         #historial = log_historial_archivo(session_id)
         historial = []
         ultimos_mensajes = historial[-12:] if len(historial) > 12 else historial
 
         if not ultimos_mensajes:
-            session_data["finalizando"] = False
             return respuesta.strip()
 
         #print("\n====================== 📜 CONTEXTO ACTUAL IA ======================")
@@ -762,24 +1058,31 @@ En esos casos, siempre debés usar las funciones del sistema para conocer o modi
         # print()
 
     except Exception as e:
-        print(f"⚠️ Error al generar o guardar resumen automático: {e}")
+        log.warning("⚠️ Error al generar o guardar resumen automático: %s", e)
 
-    session_data["finalizando"] = False
     return respuesta.strip()
 
 # =============================================================================
 # GENERACIÓN DE LA RESPUESTA DEL BOT
 # =============================================================================
 
-def get_response(user_input: str, session_id: str, nombre_cliente: str = "Cliente sin nombre") -> str:
+async def get_response(user_input: str, session_id: str, nombre_cliente: str = "Cliente sin nombre") -> str:
+    # Mientras se responde, la sesión no se puede desalojar; si su carrito
+    # estaba guardado en disco, se recupera antes de empezar
+    with medir_mensaje():
+        async with gestor_sesiones.en_uso(session_id):
+            return await _generar_respuesta(user_input, session_id, nombre_cliente)
+
+
+async def _generar_respuesta(user_input: str, session_id: str, nombre_cliente: str) -> str:
 
     user_input_lower = user_input.lower().strip()
 
     # ==========================
     # DETECCIÓN DE INTENCIÓN Y PRODUCTOS (solo mensaje actual)
     # ==========================
-    print("===================================================================================")
-    print(f"\n🧑 Mensaje real del usuario: {user_input}")
+    log.debug("===================================================================================")
+    log.debug("🧑 Mensaje real del usuario: %s", user_input)
 
     # Mostrar producto_actual actual de la sesión
     session_data = get_datos_traidos_desde_bd(session_id)
@@ -787,17 +1090,24 @@ def get_response(user_input: str, session_id: str, nombre_cliente: str = "Client
 
     if producto_actual:
         if isinstance(producto_actual, list):
-            print("📌 Productos actuales:", ", ".join(producto_actual))
+            log.debug("📌 Productos actuales: %s", ', '.join(producto_actual))
         else:
-            print(f"📌 Producto actual: {producto_actual}")
+            log.debug("📌 Producto actual: %s", producto_actual)
     else:
-        print("📌 Producto actual: (ninguno asignado todavía)")
+        log.debug("📌 Producto actual: (ninguno asignado todavía)")
 
     #detected = detect_product_with_ai(user_input)
-    detected = detect_product_with_ai(user_input, session_id)
+    # Primero las reglas fijas; la IA solo se consulta si ninguna está segura
+    detected = clasificar_con_reglas(user_input)
+    if detected:
+        log.debug("⚡ Intención resuelta por reglas (%s): %s %s", detected['regla'], detected['intencion'], detected['productos'])
+    else:
+        detected = await detect_product_with_ai(user_input, session_id)
 
     intencion = detected.get("intencion")
     productos_detectados = detected.get("productos", [])
+    anotar_mensaje(intencion=intencion)
+    cantidades_detectadas = detected.get("cantidades") or {}
 
     # ================================================================
     # CORRECCIÓN AUTOMÁTICA DE INTENCIÓN SEGÚN CONTEXTO PREVIO
@@ -817,24 +1127,21 @@ def get_response(user_input: str, session_id: str, nombre_cliente: str = "Client
         session_data["ultima_intencion_detectada"] = intencion
 
         # Verificamos si hay productos detectados válidos
-        productos_validos = [
-            p for p in productos_detectados
-            if p.lower() not in ["ninguno", "ninguna", "nada", "ninguno detectado"]
-        ]
+        productos_validos = [p for p in productos_detectados if p.lower() not in NO_PRODUCTOS]
 
         if productos_validos:
             # Si hay más de uno, guardamos la lista completa
             if len(productos_validos) > 1:
                 session_data["producto_actual"] = productos_validos
-                print(f"🧭 Productos actuales actualizados a lista: {productos_validos}")
+                log.debug("🧭 Productos actuales actualizados a lista: %s", productos_validos)
             else:
                 session_data["producto_actual"] = productos_validos[0]
-                print(f"🧭 Producto actual actualizado a: {session_data['producto_actual']}")
+                log.debug("🧭 Producto actual actualizado a: %s", session_data['producto_actual'])
         elif session_data.get("producto_actual"):
             # Si no se detectó nada, mantenemos el último producto conocido
-            print(f"♻️  Manteniendo producto_actual previo: {session_data['producto_actual']}")
+            log.debug("♻️  Manteniendo producto_actual previo: %s", session_data['producto_actual'])
         else:
-            print("🕐 No se actualizó producto_actual)")
+            log.debug("🕐 No se actualizó producto_actual)")
 
     # ==========================
     # DECISIÓN SEGÚN INTENCIÓN
@@ -849,52 +1156,61 @@ def get_response(user_input: str, session_id: str, nombre_cliente: str = "Client
 
     # Si la intención no es una acción directa ni una consulta o charla, usar la IA para responder
     if not requiere_accion_directa and intencion not in ["CONSULTAR_INFO", "CHARLAR"]:
-        print(f"🧠 Intención '{intencion}'")
-        result = with_message_history.invoke(
+        log.debug("🧠 Intención '%s'", intencion)
+        result = await with_message_history.ainvoke(
             {"input": user_input},
-            config={"configurable": {"session_id": session_id}}
+            config={"configurable": {"session_id": session_id}},
+            proposito="intencion_desconocida"
         )
         bot_response = result.content if hasattr(result, "content") else str(result)
-        return finalizar_respuesta(session_id, bot_response)
+        return finalizar_respuesta(session_id, bot_response, "intencion_desconocida")
     
     # ==========================
     # CONSULTAR_INFO — BÚSQUEDA DE PRODUCTOS O INGREDIENTES
     # ==========================
     if intencion == "CONSULTAR_INFO":
-        print("🔍 Intención de consulta detectada. Buscando productos o posibles ingredientes...")
+        log.debug("🔍 Intención de consulta detectada. Buscando productos o posibles ingredientes...")
 
         session_data = get_datos_traidos_desde_bd(session_id)
         all_products = []
 
         # 🧠 Si no hay productos detectados, intentar detectar si es una categoría
         if not productos_detectados:
-            product_name_lower = user_input_lower.strip()
-            connection = connect_to_db()
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute("SELECT id, nombre FROM categorias WHERE LOWER(nombre) LIKE %s;", (f"%{product_name_lower}%",))
-            categoria_row = cursor.fetchone()
-            cursor.close()
-            connection.close()
+            # Categoría nombrada en cualquier parte del mensaje, sin ir a la BD
+            categoria_row = None
+            try:
+                if not diccionarios.listo():
+                    await asyncio.to_thread(catalogo.refrescar)
+                categoria_row = diccionarios.primera_categoria(user_input_lower)
+            except Exception as e:
+                log.warning("⚠️ No se pudieron cargar las categorías: %s", e)
 
             if categoria_row:
-                print(f"📂 Coincidencia con categoría detectada (sin producto detectado por IA): {categoria_row['nombre']}")
-                productos_categoria = get_product_info(categoria_row['nombre'], session_id)
+                log.debug("📂 Coincidencia con categoría detectada (sin producto detectado por IA): %s", categoria_row['nombre'])
+                productos_categoria = await get_product_info(categoria_row['nombre'], session_id)
                 if productos_categoria:
-                    respuesta = generar_lista_productos_con_ia(modelo_output, user_input, productos_categoria, session_id)
-                    return finalizar_respuesta(session_id, respuesta)
+                    respuesta = await generar_lista_productos_con_ia(modelo_output, user_input, productos_categoria, session_id)
+                    return finalizar_respuesta(session_id, respuesta, "categoria")
+
+        # 🧠 Varios productos en el mismo mensaje: se buscan todos y se responde una sola vez
+        productos_consultados = [p for p in productos_detectados if p.lower() not in NO_PRODUCTOS]
+        if len(productos_consultados) > 1:
+            respuesta = await consultar_varios_productos(user_input, productos_consultados, session_id)
+            if respuesta:
+                return finalizar_respuesta(session_id, respuesta, "consulta_varios")
 
         # 🧠 Recorremos todos los productos detectados (por ejemplo: "coca" y "sprite")
         for product_name in productos_detectados:
-            products = get_product_info(product_name, session_id)
+            products = await get_product_info(product_name, session_id)
 
             # Si la BD devuelve un solo producto, lo fijamos como producto_actual
             if isinstance(products, list) and len(products) == 1:
                 producto_encontrado = products[0]["producto"]
                 session_data["producto_actual"] = producto_encontrado
-                print(f"🧭 Producto actual fijado automáticamente: {producto_encontrado}")
+                log.debug("🧭 Producto actual fijado automáticamente: %s", producto_encontrado)
 
             elif isinstance(products, list) and len(products) > 1:
-                print(f"🧭 Se mostraron {len(products)} productos para '{product_name}', pero no se actualiza producto_actual hasta que el cliente confirme uno.")
+                log.debug("🧭 Se mostraron %s productos para '%s', pero no se actualiza producto_actual hasta que el cliente confirme uno.", len(products), product_name)
 
             # Mostrar los productos encontrados (sean 1 o varios)
             if isinstance(products, list) and len(products) > 0:
@@ -904,29 +1220,39 @@ def get_response(user_input: str, session_id: str, nombre_cliente: str = "Client
             
             # Mostrar la lista incluso si hay un solo producto
             if isinstance(products, list) and len(products) >= 1:
-                respuesta = generar_lista_productos_con_ia(modelo_output, user_input, products, session_id)
-                return finalizar_respuesta(session_id, respuesta)
-
-            # ================================================================
-            # COMPARACIÓN POST-BD (una vez mostrados los productos)
-            # ================================================================
-            if productos_detectados:
-                coincidencia = comparar_con_producto_mostrado(productos_detectados[0], session_id)
-                if coincidencia:
-                    session_data["producto_actual"] = coincidencia
-                    print(f"📌 Producto actual actualizado tras búsqueda en BD: {coincidencia}")
-                else:
-                    print("📌 No se encontró coincidencia tras BD; se mantiene el producto_actual previo.")
+                respuesta = await generar_lista_productos_con_ia(modelo_output, user_input, products, session_id)
+                return finalizar_respuesta(session_id, respuesta, "consulta_lista")
 
             # Si no se encontró el producto, intentar buscar ingredientes
             if (not products) or (isinstance(products, str) and "no se encontró" in products.lower()):
-                print(f"❌ No se encontró '{product_name}' en la base. Verificando si es un alimento compuesto...")
-
-                prompt_comida = f"Decime solo 'sí' o 'no': ¿'{product_name}' es una comida o plato preparado?"
-                es_comida = modelo_input.invoke(prompt_comida).strip().lower()
+                log.debug("❌ No se encontró '%s' en la base. Verificando si es un alimento compuesto...", product_name)
+
+                # La comparación con lo ya mostrado, "¿es una comida?" y los ingredientes
+                # no dependen entre sí: corren a la vez y solo se espera lo que hace falta
+                async with Grafo() as grafo:
+                    if productos_detectados:
+                        grafo.agregar("coincidencia", lambda: comparar_con_producto_mostrado(productos_detectados[0], session_id))
+                    agregar_pasos_de_plato(grafo, product_name, detected.get("platos", {}).get(product_name))
+
+                    # ================================================================
+                    # COMPARACIÓN POST-BD (una vez mostrados los productos)
+                    # ================================================================
+                    if productos_detectados:
+                        coincidencia = await grafo.resultado("coincidencia")
+                        if coincidencia:
+                            session_data["producto_actual"] = coincidencia
+                            log.debug("📌 Producto actual actualizado tras búsqueda en BD: %s", coincidencia)
+                        else:
+                            log.debug("📌 No se encontró coincidencia tras BD; se mantiene el producto_actual previo.")
+
+                    es_comida = "sí" if await grafo.resultado("es_comida") else "no"
+                    ingredientes = None
+                    if es_comida == "sí":
+                        log.debug("🍽️ '%s' parece ser una comida. Buscando ingredientes...", product_name)
+                        ingredientes = await buscar_ingredientes_para_comida(product_name, session_id, grafo)
 
                 if es_comida != "sí":
-                    print(f"🚫 '{product_name}' no es una comida. No se buscarán ingredientes.")
+                    log.debug("🚫 '%s' no es una comida. No se buscarán ingredientes.", product_name)
                     prompt_no_ingredientes = f"""
             El cliente preguntó o mencionó: "{user_input}"
 
@@ -936,15 +1262,12 @@ def get_response(user_input: str, session_id: str, nombre_cliente: str = "Client
             No hagas preguntas ni ofrezcas acciones.
             Cerrá con una frase corta, amable y afirmativa, sin formular preguntas ni ofrecer acciones.
             """
-                    result_no_ing = modelo_output.invoke(prompt_no_ingredientes)
+                    result_no_ing = await modelo_output.ainvoke(prompt_no_ingredientes, proposito="respuesta_no_comida")
                     respuesta = result_no_ing.content if hasattr(result_no_ing, "content") else str(result_no_ing)
-                    return finalizar_respuesta(session_id, respuesta)
-
-                print(f"🍽️ '{product_name}' parece ser una comida. Buscando ingredientes...")
-                ingredientes = buscar_ingredientes_para_comida(product_name, session_id)
+                    return finalizar_respuesta(session_id, respuesta, "consulta_no_comida")
 
                 if ingredientes:
-                    print(f"✅ Ingredientes encontrados para {product_name}: {len(ingredientes)} productos")
+                    log.debug("✅ Ingredientes encontrados para %s: %s productos", product_name, len(ingredientes))
                     try:
                         prompt_ingredientes = f"""
             El cliente preguntó o mencionó: "{user_input}"
@@ -953,16 +1276,26 @@ def get_response(user_input: str, session_id: str, nombre_cliente: str = "Client
             Luego, explicale que puede prepararlo fácilmente y que tenemos todo lo necesario para hacerlo en casa.
 
             Estos son los ingredientes disponibles relacionados con su consulta:
-            {''.join([f"• {p['producto']} — ${p['precio_venta']}\n" for p in ingredientes])}
+            {listar_con_vinetas(ingredientes)}
 
             Mostrá esta lista con viñetas (•), de forma natural y amable.
             Cerrá con una frase corta, simpática y afirmativa sobre cocinar o preparar algo casero,
             sin formular preguntas ni ofrecer acciones.
             """
-                        result_ingredientes = modelo_output.invoke(prompt_ingredientes)
-                        respuesta = result_ingredientes.content if hasattr(result_ingredientes, "content") else str(result_ingredientes)
+                        respuesta = await renderizar_lista(
+                            modelo_output, ingredientes,
+                            encabezado=(
+                                f"Por ahora no tenemos {product_name} listo para vender, "
+                                "¡pero lo podés preparar en casa! Tenemos todo lo necesario:"
+                            ),
+                            prompt_ia=prompt_ingredientes,
+                            prompt_de_cierre=prompt_cierre(
+                                user_input, ingredientes,
+                                f"Escribí una frase corta, simpática y afirmativa sobre cocinar {product_name} en casa."
+                            ),
+                        )
                     except Exception as e:
-                        print(f"⚠️ Error al generar respuesta con IA para ingredientes: {e}")
+                        log.warning("⚠️ Error al generar respuesta con IA para ingredientes: %s", e)
                         respuesta = (
                             f"Lamentablemente no tenemos {product_name} en este momento, "
                             "pero podés prepararlo vos mismo con estos ingredientes:\n\n" +
@@ -972,10 +1305,10 @@ def get_response(user_input: str, session_id: str, nombre_cliente: str = "Client
                     session_data["productos_mostrados"][product_name.lower()] = ingredientes
                     mostrar_productos_en_memoria(session_id)
                     regenerar_productos_textuales(session_id)
-                    return finalizar_respuesta(session_id, respuesta)
+                    return finalizar_respuesta(session_id, respuesta, "consulta_ingredientes")
 
                 else:
-                    print(f"🚫 No se encontraron ingredientes relacionados con '{product_name}'.")
+                    log.debug("🚫 No se encontraron ingredientes relacionados con '%s'.", product_name)
                     prompt_no_ingredientes = f"""
             El cliente preguntó o mencionó: "{user_input}"
 
@@ -985,9 +1318,9 @@ def get_response(user_input: str, session_id: str, nombre_cliente: str = "Client
             No hagas preguntas ni ofrezcas acciones.
             Cerrá con una frase corta, amable y afirmativa sobre los productos, sin formular preguntas ni ofrecer acciones.
             """
-                    result_no_ing = modelo_output.invoke(prompt_no_ingredientes)
+                    result_no_ing = await modelo_output.ainvoke(prompt_no_ingredientes, proposito="respuesta_sin_ingredientes")
                     respuesta = result_no_ing.content if hasattr(result_no_ing, "content") else str(result_no_ing)
-                    return finalizar_respuesta(session_id, respuesta)
+                    return finalizar_respuesta(session_id, respuesta, "consulta_sin_ingredientes")
 
 
 
@@ -1001,14 +1334,14 @@ def get_response(user_input: str, session_id: str, nombre_cliente: str = "Client
         # COMPARACIÓN CON PRODUCTOS MOSTRADOS (para actualizar el producto actual)
         # ================================================================
         if session_data.get("productos_mostrados"):
-            coincidencia = comparar_con_producto_mostrado(user_input, session_id)
+            coincidencia = await comparar_con_producto_mostrado(user_input, session_id)
             if coincidencia:
                 session_data["producto_actual"] = coincidencia
-                print(f"🔁 Producto actual actualizado durante 'AGREGAR_PRODUCTO': {coincidencia}")
+                log.debug("🔁 Producto actual actualizado durante 'AGREGAR_PRODUCTO': %s", coincidencia)
             else:
-                print("🔁 No se encontró coincidencia durante 'AGREGAR_PRODUCTO'; se mantiene el producto_actual previo.")
+                log.debug("🔁 No se encontró coincidencia durante 'AGREGAR_PRODUCTO'; se mantiene el producto_actual previo.")
         else:
-            print("⚠️ No hay productos mostrados aún para comparar en 'AGREGAR_PRODUCTO'.")
+            log.warning("⚠️ No hay productos mostrados aún para comparar en 'AGREGAR_PRODUCTO'.")
 
         # 🧠 Si la IA no detectó producto o devolvió "ninguna", pero hay uno actual, usar ese
         if (
@@ -1017,7 +1350,7 @@ def get_response(user_input: str, session_id: str, nombre_cliente: str = "Client
         ):
             producto_actual = session_data["producto_actual"]
             productos_detectados = [producto_actual] if isinstance(producto_actual, str) else producto_actual
-            print(f"♻️  Usando producto_actual como fallback para agregar: {productos_detectados}")
+            log.debug("♻️  Usando producto_actual como fallback para agregar: %s", productos_detectados)
 
         # Si aún así no hay productos, salir
         if not productos_detectados:
@@ -1038,11 +1371,17 @@ No digas literalmente ninguno de los ejemplos anteriores.
 Inspirate en el estilo, pero generá tu propia frase original y natural.
 Respondé con una sola oración breve de ese tipo.
 """
-            result_aclaracion = modelo_output.invoke(prompt_aclaracion)
+            result_aclaracion = await modelo_output.ainvoke(prompt_aclaracion, proposito="aclaracion_agregar")
             respuesta_aclaracion = result_aclaracion.content if hasattr(result_aclaracion, "content") else str(result_aclaracion)
-            return finalizar_respuesta(session_id, respuesta_aclaracion)
+            return finalizar_respuesta(session_id, respuesta_aclaracion, "agregar_aclaracion")
+
+        log.debug("🛒 Intención de agregar producto detectada: %s", productos_detectados)
 
-        print(f"🛒 Intención de agregar producto detectada: {productos_detectados}")
+        # 🧠 Varios productos en el mismo mensaje: se agregan todos, cada uno con su cantidad
+        productos_a_agregar = [p for p in productos_detectados if p.lower() not in NO_PRODUCTOS]
+        if len(productos_a_agregar) > 1:
+            respuesta = await agregar_varios_productos(user_input, productos_a_agregar, session_id, detected.get("cantidades"))
+            return finalizar_respuesta(session_id, respuesta, "agregar_varios")
 
         # 🧠 Recuperar los productos ya mostrados en esta sesión
         session_data = get_datos_traidos_desde_bd(session_id)
@@ -1050,31 +1389,31 @@ Respondé con una sola oración breve de ese tipo.
 
 
         # 🧾 Mostrar en consola los productos actualmente guardados en la sesión
-        print("\n📋 Productos actualmente mostrados al cliente:")
+        log.debug("📋 Productos actualmente mostrados al cliente:")
         if productos_previos:
             for clave, lista in productos_previos.items():
-                print(f"  🔹 Producto '{clave}' → {len(lista)} producto(s):")
+                log.debug("  🔹 Producto '%s' → %s producto(s):", clave, len(lista))
                 for p in lista:
-                    print(f"     • {p['producto']}")
+                    log.debug("     • %s", p['producto'])
 
         else:
-            print("  (vacío)")
+            log.debug("  (vacío)")
 
         # Creamos una lista con los nombres de productos que ya vio el cliente
         #productos_previos_lista = list(productos_previos.keys())
 
         if productos_detectados:
             producto = productos_detectados[0]
-            cantidad = convertir_a_numero_es(user_input_lower)
+            cantidad = cantidades_detectadas.get(producto) or convertir_a_numero_es(user_input_lower)
 
             for lista in session_data["productos_mostrados"].values():
                 for p in lista:
                     if producto.lower() in p["producto"].lower():
                         nombre = p["producto"]
                         precio = p["precio_venta"]
-                        mensaje_confirmacion = agregar_a_pedido(session_id, nombre, cantidad, precio)
-                        print(f"✅ Producto agregado automáticamente: {nombre} x{cantidad}")
-                        return finalizar_respuesta(session_id, mensaje_confirmacion)
+                        mensaje_confirmacion = agregar_a_pedido(session_id, nombre, cantidad, precio, p.get("id"))
+                        log.debug("✅ Producto agregado automáticamente: %s x%s", nombre, cantidad)
+                        return finalizar_respuesta(session_id, mensaje_confirmacion, "agregar_mostrado")
 
         # 🧠 Verificar si alguno de los productos detectados ya fue mostrado
         encontrado_en_sesion = False
@@ -1082,18 +1421,18 @@ Respondé con una sola oración breve de ese tipo.
             for lista in session_data["productos_mostrados"].values():
                 for p in lista:
                     if product_name.lower() in p["producto"].lower():
-                        cantidad = convertir_a_numero_es(user_input_lower)
+                        cantidad = cantidades_detectadas.get(product_name) or convertir_a_numero_es(user_input_lower)
                         nombre = p["producto"]
                         precio = p["precio_venta"]
-                        print(f"✅ Producto encontrado en sesión: {nombre} — se agrega sin buscar en BD")
-                        mensaje_confirmacion = agregar_a_pedido(session_id, nombre, cantidad, precio)
+                        log.debug("✅ Producto encontrado en sesión: %s — se agrega sin buscar en BD", nombre)
+                        mensaje_confirmacion = agregar_a_pedido(session_id, nombre, cantidad, precio, p.get("id"))
                         encontrado_en_sesion = True
-                        return finalizar_respuesta(session_id, mensaje_confirmacion)
+                        return finalizar_respuesta(session_id, mensaje_confirmacion, "agregar_en_sesion")
 
         # Solo si no se encontró en sesión, recién ahí buscar en la base
         if not encontrado_en_sesion:
             for product_name in productos_detectados:
-                products = get_product_info(product_name, session_id)
+                products = await get_product_info(product_name, session_id)
 
             if isinstance(products, list) and len(products) > 0:
                 session_data = get_datos_traidos_desde_bd(session_id)
@@ -1101,12 +1440,12 @@ Respondé con una sola oración breve de ese tipo.
                 mostrar_productos_en_memoria(session_id)
 
                 try:
-                    respuesta = generar_lista_productos_con_ia(modelo_output, user_input, products, session_id)
+                    respuesta = await generar_lista_productos_con_ia(modelo_output, user_input, products, session_id)
                 except Exception as e:
-                    print(f"⚠️ Error al generar lista con IA: {e}")
-                    respuesta = generar_lista_productos_con_ia(modelo_output, user_input, products, session_id)
+                    log.warning("⚠️ Error al generar lista con IA: %s", e)
+                    respuesta = await generar_lista_productos_con_ia(modelo_output, user_input, products, session_id)
 
-                return finalizar_respuesta(session_id, respuesta)
+                return finalizar_respuesta(session_id, respuesta, "agregar_lista")
 
         # Si no se encuentra el producto ni en la lista ni en la base, se pide confirmación
         mensaje_ia = (
@@ -1114,16 +1453,17 @@ Respondé con una sola oración breve de ese tipo.
             f"alguno de los productos mostrados anteriormente. "
             f"Formulá una pregunta natural y breve para confirmar si desea agregarlo al pedido."
         )
-        result = with_message_history.invoke(
+        result = await with_message_history.ainvoke(
             {"input": mensaje_ia},
-            config={"configurable": {"session_id": session_id}}
+            config={"configurable": {"session_id": session_id}},
+            proposito="agregar_sin_producto"
         )
         bot_response = result.content if hasattr(result, "content") else str(result)
-        return finalizar_respuesta(session_id, bot_response)
+        return finalizar_respuesta(session_id, bot_response, "agregar_ia")
 
     # SI SE DETECTA LA INTENCIÓN: MOSTRAR_PEDIDO
     if intencion == "MOSTRAR_PEDIDO":
-        print("🧾 Mostrando pedido actual para el cliente...")
+        log.debug("🧾 Mostrando pedido actual para el cliente...")
         resumen = mostrar_pedido(session_id)
 
         if not resumen or resumen.strip() == "":
@@ -1135,7 +1475,7 @@ Respondé con una sola oración breve de ese tipo.
                 "¿Querés finalizar el pedido? 😉"
             )
 
-        return finalizar_respuesta(session_id, respuesta)
+        return finalizar_respuesta(session_id, respuesta, "mostrar_pedido")
 
 
     # SI SE DETECTA LA INTENCIÓN: VACIAR_PEDIDO
@@ -1144,7 +1484,7 @@ Respondé con una sola oración breve de ese tipo.
 
         vaciar_pedido(session_id)
         session_data["producto_actual"] = None  # 🧹 limpiar foco actual
-        print("🧹 Producto actual limpiado (pedido vaciado)")
+        log.debug("🧹 Producto actual limpiado (pedido vaciado)")
 
         try:
             prompt_vaciar = """
@@ -1161,17 +1501,17 @@ No digas literalmente ninguno de los ejemplos anteriores.
 Inspirate en el estilo, pero generá tu propia frase original y natural.
 Respondé con una sola oración breve de ese tipo.
 """
-            respuesta_vaciar = modelo_output.invoke(prompt_vaciar)
+            respuesta_vaciar = await modelo_output.ainvoke(prompt_vaciar, proposito="respuesta_vaciar")
             mensaje_vaciado = (
                 respuesta_vaciar.content
                 if hasattr(respuesta_vaciar, "content")
                 else str(respuesta_vaciar)
             )
         except Exception as e:
-            print(f"⚠️ Error al generar mensaje de vaciado con IA: {e}")
+            log.warning("⚠️ Error al generar mensaje de vaciado con IA: %s", e)
             mensaje_vaciado = "Listo 👍, vacié tu pedido completo. Podés empezar uno nuevo cuando quieras."
 
-        return finalizar_respuesta(session_id, mensaje_vaciado)
+        return finalizar_respuesta(session_id, mensaje_vaciado, "vaciar_pedido")
 
         # SI SE DETECTA LA INTENCIÓN: FINALIZAR_PEDIDO
     if intencion == "FINALIZAR_PEDIDO":
@@ -1179,22 +1519,23 @@ Respondé con una sola oración breve de ese tipo.
 
         # Mostrar resumen actual solo para registro en consola
         resumen = mostrar_pedido(session_id)
-        print(f"🧾 Resumen del pedido antes de finalizar:\n{resumen}")
+        log.debug("🧾 Resumen del pedido antes de finalizar:\n%s", resumen)
 
         # Limpiar producto_actual y marcar el pedido como confirmado
         session_data = get_datos_traidos_desde_bd(session_id)
         session_data["producto_actual"] = None
         session_data["pedido_confirmado"] = True
 
-        print("✅ Pedido finalizado correctamente. Enviando notificación al encargado...")
+        log.debug("✅ Pedido finalizado correctamente. Enviando notificación al encargado...")
 
         # Enviar el pedido al encargado usando la función finalizar_pedido()
         try:
             numero_cliente = session_id
-            mensaje_encargado = finalizar_pedido(session_id, "", numero_cliente, nombre_cliente)
-            print("📤 Pedido enviado al encargado correctamente.")
+            # finalizar_pedido hace un POST bloqueante al bot de Node: se corre en un hilo
+            mensaje_encargado = await asyncio.to_thread(finalizar_pedido, session_id, "", numero_cliente, nombre_cliente)
+            log.debug("📤 Pedido enviado al encargado correctamente.")
         except Exception as e:
-            print(f"⚠️ Error enviando pedido al encargado: {e}")
+            log.warning("⚠️ Error enviando pedido al encargado: %s", e)
 
         # Mensaje fijo directo al cliente (sin pasar por IA)
         mensaje_finalizacion = (
@@ -1203,19 +1544,19 @@ Respondé con una sola oración breve de ese tipo.
         )
 
         # Responder al cliente directamente
-        return finalizar_respuesta(session_id, mensaje_finalizacion)
+        return finalizar_respuesta(session_id, mensaje_finalizacion, "finalizar_pedido")
 
     # SI SE DETECTAN PRODUCTOS EN EL INPUT DEL CLIENTE
     # Solo si la intención NO es CHARLAR (para evitar repetir listas cuando el cliente solo charla o pide opinión)
     if productos_detectados and intencion != "CHARLAR":
-        print(f"🛍️  Producto o categoria detectado: {productos_detectados}")
+        log.debug("🛍️  Producto o categoria detectado: %s", productos_detectados)
         all_products = []
 
         # Recuperar los datos de sesión (productos ya consultados)
         session_data = get_datos_traidos_desde_bd(session_id)
 
         for product_name in productos_detectados:
-            products = get_product_info(product_name, session_id)
+            products = await get_product_info(product_name, session_id)
 
 
             # Guardar los productos traídos en memoria
@@ -1235,7 +1576,7 @@ Respondé con una sola oración breve de ese tipo.
             El cliente preguntó: "{user_input}"
 
             Estos son los productos encontrados en la base de datos relacionados con su consulta:
-            {''.join([f"• {p['producto']} — ${p['precio_venta']}\n" for p in products])}
+            {listar_con_vinetas(products)}
 
             Mostrale la lista al cliente de manera clara, breve y ordenada.
             Mantené el formato de viñetas (•) y un tono amable y natural.
@@ -1243,11 +1584,18 @@ Respondé con una sola oración breve de ese tipo.
             Cerrá con una frase corta y natural sobre los productos, sin invitar a comprar ni a continuar.
             """
 
-            result_lista = modelo_output.invoke(prompt_lista)
-            respuesta = result_lista.content if hasattr(result_lista, "content") else str(result_lista)
+            respuesta = await renderizar_lista(
+                modelo_output, products,
+                encabezado="Estos son los productos que encontré 😊",
+                prompt_ia=prompt_lista,
+                prompt_de_cierre=prompt_cierre(
+                    user_input, products,
+                    "Escribí una frase corta y natural sobre los productos, sin invitar a comprar ni a continuar."
+                ),
+            )
 
         except Exception as e:
-            print(f"⚠️ Error al generar lista con IA: {e}")
+            log.warning("⚠️ Error al generar lista con IA: %s", e)
             # fallback manual (solo si la IA falla)
             respuesta = (
                 "Tenemos estos productos disponibles:\n\n"
@@ -1255,28 +1603,35 @@ Respondé con una sola oración breve de ese tipo.
                 + "\n\n¿Querés agregar alguno de esos productos a tu pedido? 😊"
             )
 
-        return finalizar_respuesta(session_id, respuesta)
+        return finalizar_respuesta(session_id, respuesta, "productos_detectados")
 
     # SI EL CLIENTE NO NOMBRA PRODUCTOS NI DEMUESTRA NINGUNA INTENCION
 
     try:
-        result = with_message_history.invoke(
+        result = await with_message_history.ainvoke(
             {"input": user_input},
-            config={"configurable": {"session_id": session_id}}
+            config={"configurable": {"session_id": session_id}},
+            proposito="charla"
         )
         bot_response = result.content if hasattr(result, "content") else str(result)
-        return finalizar_respuesta(session_id, bot_response)
+        return finalizar_respuesta(session_id, bot_response, "charla")
 
     except Exception as e:
-        print(f"Error al generar respuesta predeterminada: {e}")
+        log.error("Error al generar respuesta predeterminada: %s", e)
         mensaje_ia_error = (
             f"Hubo un error general al intentar responder al cliente: '{user_input}'. "
             f"Respondé de manera amable y natural, pidiendo disculpas por el inconveniente "
             f"y ofreciendo continuar la conversación."
         )
-        result = with_message_history.invoke(
+        result = await with_message_history.ainvoke(
             {"input": mensaje_ia_error},
-            config={"configurable": {"session_id": session_id}}
+            config={"configurable": {"session_id": session_id}},
+            proposito="charla_error"
         )
         bot_response = result.content if hasattr(result, "content") else str(result)
-        return finalizar_respuesta(session_id, bot_response)
+        return finalizar_respuesta(session_id, bot_response, "charla_error")
+
+
+def get_response_sync(user_input: str, session_id: str, nombre_cliente: str = "Cliente sin nombre") -> str:
+    """Versión sincrónica de get_response, para scripts y pruebas fuera de FastAPI."""
+    return asyncio.run(get_response(user_input, session_id, nombre_cliente))
@@ -1,11 +1,16 @@
-import mysql.connector
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 import os
+import re
+
+from app.metricas import bd_segundos
+from app.logs import obtener_logger
 
 load_dotenv()
 
+log = obtener_logger("database")
+
 # Credenciales en .env
 MYSQL_USER = os.getenv("MYSQL_USER")
 MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD")
@@ -13,30 +18,83 @@ MYSQL_HOST = os.getenv("MYSQL_HOST")
 MYSQL_PORT = os.getenv("MYSQL_PORT")
 MYSQL_DATABASE = os.getenv("MYSQL_DATABASE")
 
+# Configuración del pool de conexiones (opcional en .env)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
 SQLALCHEMY_DATABASE_URL = f"mysql+mysqlconnector://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}"
+ASYNC_DATABASE_URL = f"mysql+aiomysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}"
 # Validación individual de variables de entorno
 if not all([MYSQL_USER, MYSQL_PASSWORD, MYSQL_HOST, MYSQL_PORT, MYSQL_DATABASE]):
     raise ValueError("Faltan credenciales en el archivo .env Asegúrate de definir: MYSQL_USER, MYSQL_PASSWORD, MYSQL_HOST, MYSQL_PORT, MYSQL_DATABASE")
-    
-# Crear una instancia de motor para la base de datos
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+
+POOL_CONFIG = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,   # evita usar conexiones que MySQL ya cerró por inactividad
+    "pool_pre_ping": True,             # valida la conexión antes de entregarla
+}
+
+# Crear una instancia de motor para la base de datos (con pool de conexiones)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **POOL_CONFIG)
 
 # Crear una clase de sesión para interactuar con la base de datos
 SessionLocal = sessionmaker(autocommit=False,autoflush=False,bind=engine)
+
+# Motor asíncrono (se crea la primera vez que se usa, requiere aiomysql)
+async_engine = None
+
+def get_async_engine():
+    global async_engine
+    if async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        async_engine = create_async_engine(ASYNC_DATABASE_URL, **POOL_CONFIG)
+    return async_engine
+
 def connect_to_db():
+    """
+    Devuelve una conexión tomada del pool. Se usa igual que una conexión de
+    mysql.connector (cursor(dictionary=True), close()), pero close() la
+    devuelve al pool en lugar de cortar la conexión TCP.
+    """
     try:
-        connection = mysql.connector.connect(
-            user=os.getenv("MYSQL_USER"),
-            password=os.getenv("MYSQL_PASSWORD"),
-            host=os.getenv("MYSQL_HOST"),
-            port=os.getenv("MYSQL_PORT"),
-            database=os.getenv("MYSQL_DATABASE")
-        )
-        return connection
+        return engine.raw_connection()
     except Exception as e:
-        print(f"Error en la conexión a la base de datos: {e}")
+        log.error("Error en la conexión a la base de datos: %s", e)
         return None
 
+# =============================================================================
+# CONSULTAS A TRAVÉS DEL POOL
+# =============================================================================
+
+_TABLA = re.compile(r"\b(?:FROM|TABLE|INTO|UPDATE)\s+`?(\w+)", re.IGNORECASE)
+
+def tabla_de(query: str) -> str:
+    """Etiqueta de la consulta en las métricas: la primera tabla que nombra."""
+    encontrada = _TABLA.search(query)
+    return encontrada.group(1).lower() if encontrada else "otra"
+
+def ejecutar_consulta(query: str, params: tuple = ()) -> list:
+    """Ejecuta una consulta de lectura y devuelve las filas como diccionarios."""
+    with bd_segundos.medir(tabla=tabla_de(query)), engine.connect() as conn:
+        result = conn.exec_driver_sql(query, params)
+        return [dict(fila) for fila in result.mappings()]
+
+async def ejecutar_consulta_async(query: str, params: tuple = ()) -> list:
+    """Versión asíncrona de ejecutar_consulta para usar desde FastAPI."""
+    with bd_segundos.medir(tabla=tabla_de(query)):
+        async with get_async_engine().connect() as conn:
+            result = await conn.exec_driver_sql(query, params)
+            return [dict(fila) for fila in result.mappings()]
+
+async def cerrar_pools():
+    engine.dispose()
+    if async_engine is not None:
+        await async_engine.dispose()
+
 # Test de conexión
 if __name__ == "__main__":
     try:
@@ -45,4 +103,4 @@ if __name__ == "__main__":
         db.close()
     except Exception as e:
         print(f"Error al conectar a la base de datos: {e}")
-        
\ No newline at end of file
+
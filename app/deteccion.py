@@ -0,0 +1,139 @@
+# ==============================================================================
+# Respuesta de detect_product_with_ai
+# En vez de texto libre ("Intención detectada: ...") leído con expresiones
+# regulares, a modelo_input se le pasa un esquema JSON (parámetro `format` de
+# Ollama) y la salida queda restringida a ese esquema: intención, productos con
+# su cantidad, si cada producto es una comida preparada (y sus ingredientes) y
+# una confianza. Una sola llamada reemplaza a la detección, al "¿es comida?" y
+# al pedido de ingredientes. Si el modelo no respeta el formato se usa el
+# lector de texto libre de siempre.
+# ==============================================================================
+
+import json
+import os
+import re
+
+# 1 = salida JSON con esquema; 0 = texto libre (como antes)
+DETECCION_ESTRUCTURADA = os.getenv("DETECCION_ESTRUCTURADA", "1") == "1"
+# Por debajo de esta confianza la detección no se guarda en la caché
+DETECCION_CONFIANZA_MINIMA = float(os.getenv("DETECCION_CONFIANZA_MINIMA", "0.5"))
+
+INTENCIONES = (
+    "AGREGAR_PRODUCTO",
+    "QUITAR_PRODUCTO",
+    "MOSTRAR_PEDIDO",
+    "VACIAR_PEDIDO",
+    "CONSULTAR_INFO",
+    "FINALIZAR_PEDIDO",
+    "CHARLAR",
+)
+
+ESQUEMA_DETECCION = {
+    "type": "object",
+    "properties": {
+        "intencion": {"type": "string", "enum": list(INTENCIONES)},
+        "productos": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "nombre": {"type": "string"},
+                    "cantidad": {"type": "integer", "minimum": 1},
+                    "es_comida": {"type": "boolean"},
+                    "ingredientes": {"type": "array", "items": {"type": "string"}},
+                },
+                "required": ["nombre", "cantidad", "es_comida", "ingredientes"],
+            },
+        },
+        "confianza": {"type": "number", "minimum": 0, "maximum": 1},
+    },
+    "required": ["intencion", "productos", "confianza"],
+}
+
+INSTRUCCIONES_JSON = """
+Respondé solo con un objeto JSON con estos campos:
+- "intencion": una de AGREGAR_PRODUCTO, QUITAR_PRODUCTO, MOSTRAR_PEDIDO, VACIAR_PEDIDO, CONSULTAR_INFO, FINALIZAR_PEDIDO, CHARLAR.
+- "productos": lista de productos mencionados (vacía si no hay). Cada uno con:
+    "nombre" (en singular y minúsculas), "cantidad" (1 si no la dice),
+    "es_comida" (true solo si es una comida o plato preparado, como pizza o locro),
+    "ingredientes" (los ingredientes principales si es_comida es true, si no []).
+- "confianza": de 0 a 1, qué tan seguro estás de la intención.
+"""
+
+
+def _vacia():
+    return {"intencion": None, "productos": [], "cantidades": {}, "platos": {}, "confianza": None}
+
+
+def interpretar_json(texto: str):
+    """
+    Detección a partir de la salida JSON del modelo, o None si no es un objeto
+    válido o la intención no es una de las conocidas. Los campos opcionales
+    que falten o vengan mal se completan con valores por defecto.
+    """
+    texto = re.sub(r"<think>.*?</think>", "", texto or "", flags=re.DOTALL | re.IGNORECASE)
+    inicio, fin = texto.find("{"), texto.rfind("}")
+    if inicio < 0 or fin < inicio:
+        return None
+    try:
+        datos = json.loads(texto[inicio:fin + 1])
+    except ValueError:
+        return None
+    if not isinstance(datos, dict):
+        return None
+
+    intencion = str(datos.get("intencion") or "").strip().upper()
+    if intencion not in INTENCIONES:
+        return None
+
+    resultado = _vacia()
+    resultado["intencion"] = intencion
+    for item in datos.get("productos") or []:
+        if isinstance(item, str):
+            item = {"nombre": item}
+        if not isinstance(item, dict):
+            continue
+        nombre = str(item.get("nombre") or "").strip().lower()
+        if not nombre or nombre in resultado["cantidades"]:
+            continue
+        cantidad = item.get("cantidad")
+        resultado["productos"].append(nombre)
+        resultado["cantidades"][nombre] = cantidad if isinstance(cantidad, int) and cantidad > 0 else 1
+        if isinstance(item.get("es_comida"), bool):
+            ingredientes = item.get("ingredientes") if item["es_comida"] else []
+            resultado["platos"][nombre] = {
+                "es_comida": item["es_comida"],
+                "ingredientes": list(dict.fromkeys(
+                    i.strip().lower() for i in ingredientes or [] if isinstance(i, str) and i.strip()
+                )),
+            }
+
+    confianza = datos.get("confianza")
+    if isinstance(confianza, (int, float)) and not isinstance(confianza, bool):
+        resultado["confianza"] = min(max(float(confianza), 0.0), 1.0)
+    return resultado
+
+
+def interpretar_texto(texto: str) -> dict:
+    """Formato del Modelfile: "Intención detectada: X" / "Productos mencionados: a, b"."""
+    texto = re.sub(r"<think>.*?</think>", "", texto or "", flags=re.DOTALL | re.IGNORECASE)
+    intent_match = re.search(r"intenci[oó]n\s*(detectada|:)?\s*[:\-]?\s*([A-Z_]+)", texto, re.IGNORECASE)
+    prod_match = re.search(r"productos\s*(mencionados|:)?\s*[:\-]?\s*([^\n\r]+)", texto, re.IGNORECASE)
+
+    resultado = _vacia()
+    resultado["intencion"] = intent_match.group(2).upper() if intent_match else None
+    products_text = prod_match.group(2).strip() if prod_match else ""
+    if products_text and not products_text.lower().startswith("ninguno"):
+        resultado["productos"] = [p.strip() for p in re.split(r",|\s+y\s+|\n", products_text) if p.strip()]
+    return resultado
+
+
+def interpretar(texto: str) -> dict:
+    """JSON si el modelo lo respetó; si no, el texto libre."""
+    return interpretar_json(texto) or interpretar_texto(texto)
+
+
+def se_puede_guardar(deteccion: dict) -> bool:
+    """Solo se cachean las detecciones válidas y seguras (si no, conviene volver a preguntar)."""
+    confianza = deteccion.get("confianza")
+    return bool(deteccion.get("intencion")) and (confianza is None or confianza >= DETECCION_CONFIANZA_MINIMA)
@@ -0,0 +1,142 @@
+# ==============================================================================
+# Categorías y marcas en memoria
+# Son tablas chicas que casi nunca cambian, pero se consultaban en cada mensaje
+# (categoría exacta en get_product_info y LIKE con el mensaje entero en
+# CONSULTAR_INFO). Se guardan como diccionarios normalizados y un
+# autómata Aho-Corasick encuentra en una sola pasada todas las categorías y
+# marcas mencionadas en un mensaje. Se arman con cada instantánea del catálogo
+# (app/catalogo.py), así que se actualizan con su mismo refresco.
+# ==============================================================================
+
+from collections import deque
+
+from app.catalogo import catalogo, normalizar_texto
+
+# =============================================================================
+# AHO-CORASICK
+# =============================================================================
+
+def _es_borde(texto: str, posicion: int) -> bool:
+    return posicion < 0 or posicion >= len(texto) or not texto[posicion].isalnum()
+
+
+class AhoCorasick:
+    """
+    Autómata sobre textos ya normalizados: `buscar` recorre el mensaje una sola
+    vez y devuelve las coincidencias de palabras completas, sin superponerse
+    (gana la que empieza antes y, entre esas, la más larga).
+    """
+
+    def __init__(self, patrones: dict):
+        self._hijos = [{}]
+        self._falla = [0]
+        self._salidas = [[]]      # nodo → [(largo, valor)]
+        for patron, valor in patrones.items():
+            nodo = 0
+            for caracter in patron:
+                siguiente = self._hijos[nodo].get(caracter)
+                if siguiente is None:
+                    siguiente = len(self._hijos)
+                    self._hijos[nodo][caracter] = siguiente
+                    self._hijos.append({})
+                    self._falla.append(0)
+                    self._salidas.append([])
+                nodo = siguiente
+            self._salidas[nodo].append((len(patron), valor))
+
+        # Enlaces de falla por niveles (BFS)
+        pendientes = deque(self._hijos[0].values())
+        while pendientes:
+            nodo = pendientes.popleft()
+            for caracter, hijo in self._hijos[nodo].items():
+                falla = self._falla[nodo]
+                while falla and caracter not in self._hijos[falla]:
+                    falla = self._falla[falla]
+                self._falla[hijo] = self._hijos[falla].get(caracter, 0)
+                self._salidas[hijo] = self._salidas[hijo] + self._salidas[self._falla[hijo]]
+                pendientes.append(hijo)
+
+    def buscar(self, texto: str) -> list:
+        """[(inicio, fin, valor)] en orden de aparición."""
+        encontrados = []
+        nodo = 0
+        for i, caracter in enumerate(texto):
+            while nodo and caracter not in self._hijos[nodo]:
+                nodo = self._falla[nodo]
+            nodo = self._hijos[nodo].get(caracter, 0)
+            for largo, valor in self._salidas[nodo]:
+                inicio = i - largo + 1
+                if _es_borde(texto, inicio - 1) and _es_borde(texto, i + 1):
+                    encontrados.append((inicio, i + 1, valor))
+
+        encontrados.sort(key=lambda e: (e[0], -(e[1] - e[0])))
+        resultado, fin = [], 0
+        for inicio, final, valor in encontrados:
+            if inicio >= fin:
+                resultado.append((inicio, final, valor))
+                fin = final
+        return resultado
+
+# =============================================================================
+# DICCIONARIOS
+# =============================================================================
+
+class CategoriasYMarcas:
+    """
+    Categorías ({clave: {"id", "nombre"}}) y marcas ({clave: {"nombre"}}) de una
+    instantánea del catálogo, con claves normalizadas. Nunca se modifica después de publicarse.
+    """
+
+    def __init__(self, categorias: dict, marcas: dict):
+        self.categorias = categorias
+        self.marcas = marcas
+        patrones = {}
+        for clave, marca in self.marcas.items():
+            patrones.setdefault(clave, []).append({"tipo": "marca", **marca})
+        # Si un nombre es a la vez marca y categoría, primero la categoría
+        for clave, categoria in self.categorias.items():
+            patrones.setdefault(clave, []).insert(0, {"tipo": "categoria", **categoria})
+        self.menciones = AhoCorasick(patrones)
+
+
+class Diccionarios:
+    """Búsquedas sobre las categorías y marcas de la instantánea publicada del catálogo."""
+
+    def __init__(self, indice=catalogo):
+        self._indice = indice
+
+    @property
+    def _actual(self) -> CategoriasYMarcas:
+        return self._indice._actual.diccionarios
+
+    def listo(self) -> bool:
+        return self._indice.listo()
+
+    def totales(self) -> dict:
+        return {"categorias": len(self._actual.categorias), "marcas": len(self._actual.marcas)}
+
+    # -------------------------------------------------------------------------
+    # Búsquedas
+    # -------------------------------------------------------------------------
+
+    def categoria(self, nombre: str):
+        """Equivale a: categorias WHERE nombre = x (sin distinguir mayúsculas ni acentos)."""
+        return self._actual.categorias.get(normalizar_texto(nombre))
+
+    def marca(self, nombre: str):
+        return self._actual.marcas.get(normalizar_texto(nombre))
+
+    def menciones(self, texto: str) -> list:
+        """Categorías y marcas nombradas en cualquier parte del texto, en orden de aparición."""
+        normalizado = normalizar_texto(texto)
+        return [
+            {**valor, "texto": normalizado[inicio:fin]}
+            for inicio, fin, valores in self._actual.menciones.buscar(normalizado)
+            for valor in valores
+        ]
+
+    def primera_categoria(self, texto: str):
+        return next((m for m in self.menciones(texto) if m["tipo"] == "categoria"), None)
+
+
+diccionarios = Diccionarios()
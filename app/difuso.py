@@ -0,0 +1,172 @@
+# ==============================================================================
+# Corrección de errores de tipeo contra el vocabulario del catálogo
+# "yerva", "cocacola", "galletitas oreos", "aseite": en vez de caer en
+# "No se encontró" (y en la cadena de consultas a la IA de "¿es una comida?"),
+# cada palabra se compara con las palabras de productos, marcas y categorías
+# después de un plegado fonético del español (v/b, ll/y, s/z/c, h muda, acentos)
+# y se corrige si hay un término a poca distancia de edición.
+# ==============================================================================
+
+import re
+from collections import Counter
+
+from app.catalogo import normalizar_texto
+
+# Reglas de plegado fonético, en orden
+_FONETICA = [
+    (re.compile(r"[^a-z0-9 ]"), ""),
+    (re.compile(r"ch"), "\x00"),            # se protege la "ch" antes de quitar la h
+    (re.compile(r"h"), ""),
+    (re.compile(r"qu(?=[ei])"), "k"),
+    (re.compile(r"c(?=[ei])"), "s"),
+    (re.compile(r"c"), "k"),
+    (re.compile(r"z"), "s"),
+    (re.compile(r"v"), "b"),
+    (re.compile(r"ll"), "y"),
+    (re.compile(r"g(?=[ei])"), "j"),
+    (re.compile(r"gu(?=[ei])"), "g"),
+    (re.compile(r"w"), "u"),
+    (re.compile(r"(.)\1+"), r"\1"),         # letras repetidas
+    (re.compile("\x00"), "ch"),
+]
+
+
+def plegar(texto: str) -> str:
+    """Forma fonética de un texto: "Yerva" → "yerba", "Coca-Cola" → "kokakola"."""
+    texto = normalizar_texto(texto)
+    for patron, reemplazo in _FONETICA:
+        texto = patron.sub(reemplazo, texto)
+    return texto
+
+
+def distancia_maxima(largo: int) -> int:
+    """Errores tolerados según el largo: las palabras cortas tienen que coincidir al plegarlas."""
+    if largo <= 4:
+        return 0
+    if largo <= 7:
+        return 1
+    return 2
+
+
+def distancia_acotada(a: str, b: str, maximo: int) -> int:
+    """
+    Distancia de edición con transposiciones (Damerau, OSA). Deja de calcular
+    apenas la fila entera supera `maximo` y en ese caso devuelve maximo + 1.
+    """
+    if abs(len(a) - len(b)) > maximo:
+        return maximo + 1
+    anterior2 = None
+    anterior = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        actual = [i] + [0] * len(b)
+        minimo = actual[0]
+        for j in range(1, len(b) + 1):
+            costo = 0 if a[i - 1] == b[j - 1] else 1
+            valor = min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + costo)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                valor = min(valor, anterior2[j - 2] + 1)
+            actual[j] = valor
+            minimo = min(minimo, valor)
+        if minimo > maximo:
+            return maximo + 1
+        anterior2, anterior = anterior, actual
+    return anterior[-1] if anterior[-1] <= maximo else maximo + 1
+
+
+def _trigramas(termino: str) -> set:
+    relleno = f"^{termino}$"
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+def terminos_de(texto: str) -> list:
+    """Palabras de un nombre y, además, cada par de palabras seguidas ("coca cola" → "coca cola")."""
+    palabras = [p for p in re.split(r"[^a-z0-9]+", normalizar_texto(texto)) if p]
+    terminos = [p for p in palabras if len(p) >= 3 and not p.isdigit()]
+    terminos += [f"{a} {b}" for a, b in zip(palabras, palabras[1:]) if not (a.isdigit() or b.isdigit())]
+    return terminos
+
+
+class IndiceDifuso:
+    """
+    Vocabulario plegado (término → forma original más frecuente) con un índice
+    invertido de trigramas para encontrar candidatos sin recorrer todo el vocabulario.
+    """
+
+    def __init__(self, textos):
+        frecuencias = Counter()
+        for texto in textos:
+            frecuencias.update(set(terminos_de(texto)))
+
+        formas = {}          # plegado → (frecuencia, forma original)
+        for termino, frecuencia in frecuencias.items():
+            plegado = plegar(termino).replace(" ", "")
+            if len(plegado) < 3:
+                continue
+            actual = formas.get(plegado)
+            if actual is None or frecuencia > actual[0]:
+                formas[plegado] = (frecuencia, termino)
+
+        self.plegados = list(formas)
+        self.formas = [formas[p][1] for p in self.plegados]
+        self.frecuencias = [formas[p][0] for p in self.plegados]
+        self.exactos = {p: i for i, p in enumerate(self.plegados)}
+        self.trigramas = {}
+        for i, plegado in enumerate(self.plegados):
+            for t in _trigramas(plegado):
+                self.trigramas.setdefault(t, []).append(i)
+
+    def __len__(self):
+        return len(self.plegados)
+
+    def mejor(self, palabra: str):
+        """(forma original, distancia) del término más parecido, o None si ninguno está cerca."""
+        plegado = plegar(palabra).replace(" ", "")
+        if plegado in self.exactos:
+            i = self.exactos[plegado]
+            return self.formas[i], 0
+
+        maximo = distancia_maxima(len(plegado))
+        if maximo == 0:
+            return None
+
+        trigramas = _trigramas(plegado)
+        # Cada error puede romper hasta 3 trigramas
+        minimo_comunes = max(1, len(trigramas) - 3 * maximo)
+        comunes = Counter()
+        for t in trigramas:
+            comunes.update(self.trigramas.get(t, ()))
+
+        mejor = None
+        for i, cantidad in comunes.items():
+            if cantidad < minimo_comunes:
+                continue
+            distancia = distancia_acotada(plegado, self.plegados[i], maximo)
+            if distancia > maximo:
+                continue
+            clave = (distancia, -self.frecuencias[i], -cantidad)
+            if mejor is None or clave < mejor[0]:
+                mejor = (clave, i)
+        if mejor is None:
+            return None
+        return self.formas[mejor[1]], mejor[0][0]
+
+    def corregir(self, texto: str):
+        """
+        Devuelve el texto con las palabras corregidas, o None si no hubo nada que corregir.
+        Primero prueba el texto completo ("cocacola" → "coca cola") y después palabra por palabra.
+        """
+        normalizado = normalizar_texto(texto)
+        completo = self.mejor(normalizado)
+        if completo and completo[0] != normalizado:
+            return completo[0]
+        if completo:
+            return None
+
+        palabras = normalizado.split()
+        corregidas = []
+        for palabra in palabras:
+            sugerencia = self.mejor(palabra) if len(palabra) >= 3 and not palabra.isdigit() else None
+            corregidas.append(sugerencia[0] if sugerencia else palabra)
+        if corregidas == palabras:
+            return None
+        return " ".join(corregidas)
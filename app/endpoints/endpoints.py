@@ -1,14 +1,41 @@
 from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from ..crud import get_response
+from ..catalogo import catalogo
+from ..diccionarios import diccionarios
+from ..sesiones import ejecutor_sesiones
+from ..intenciones import obtener_estadisticas_reglas, estadisticas_reglas
+from ..cache_deteccion import cache_deteccion
+from ..gestor_sesiones import gestor_sesiones
+from ..registro_conversaciones import escritor_conversaciones
+from ..modelos import precalentador
 import os
+import asyncio
 from datetime import datetime
+from ..logs import obtener_logger
+from ..metricas import registro, contadores
+
+log = obtener_logger("endpoints")
 
 router = APIRouter()
 
+# Contadores que ya llevan los módulos, traducidos al formato de /metrics
+registro.agregar_recolector(lambda: contadores(
+    "chatbot_cache_deteccion_total", "Consultas a la caché de detección", "resultado", cache_deteccion.metricas))
+registro.agregar_recolector(lambda: contadores(
+    "chatbot_reglas_total", "Mensajes resueltos por reglas o derivados a la IA", "resultado",
+    {"reglas": estadisticas_reglas["resueltos_por_reglas"], "ia": estadisticas_reglas["derivados_a_ia"]}))
+registro.agregar_recolector(lambda: contadores(
+    "chatbot_registro_conversaciones_total", "Actividad del registro de conversaciones", "evento",
+    escritor_conversaciones.metricas))
+registro.agregar_recolector(lambda: contadores(
+    "chatbot_sesiones_total", "Desalojos y carritos guardados o recuperados", "evento", gestor_sesiones.metricas))
+
 # Carpeta para guardar conversaciones
 CARPETA_CONVERSACIONES = "conversaciones"
 os.makedirs(CARPETA_CONVERSACIONES, exist_ok=True)
 
+
 @router.post("/process-message")
 async def process_message(request: Request):
     try:
@@ -20,28 +47,77 @@ async def process_message(request: Request):
         if not from_number or not body:
             return {"status": "error", "message": "Datos incompletos"}
 
-        # Guardar conversación en archivo
+        # Guardar conversación en archivo (lo escribe un hilo en segundo plano,
+        # así el disco nunca demora la respuesta)
         session_id = from_number.replace("+", "").replace(":", "_")
         ruta_archivo = os.path.join(CARPETA_CONVERSACIONES, f"{session_id}.txt")
 
-        with open(ruta_archivo, "a", encoding="utf-8") as f:
-            f.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - De {from_number}: {body}\n")
+        escritor_conversaciones.registrar(
+            ruta_archivo,
+            f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - De {from_number}: {body}\n"
+        )
 
         # Generar respuesta usando tu función de IA
+        # (en orden por cliente; clientes distintos se atienden en paralelo)
         try:
-            bot_response = get_response(body, session_id, nombre_cliente)
+            bot_response = await ejecutor_sesiones.ejecutar(
+                session_id, get_response, body, session_id, nombre_cliente
+            )
         except Exception as e:
-            print(f"❌ Error en IA: {e}")
+            log.error("❌ Error en IA: %s", e)
             bot_response = "Estoy teniendo problemas para responder."
 
 
         # Guardar respuesta
-        with open(ruta_archivo, "a", encoding="utf-8") as f:
-            f.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Bot: {bot_response}\n")
+        escritor_conversaciones.registrar(
+            ruta_archivo,
+            f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Bot: {bot_response}\n"
+        )
 
         return {"status": "ok", "response": bot_response}
 
     except Exception as e:
-        print(f"❌ Error procesando mensaje: {e}")
+        log.error("❌ Error procesando mensaje: %s", e)
         return {"status": "error"}
 
+
+@router.get("/metrics")
+async def metrics():
+    """Latencias por etapa y contadores en formato de texto de Prometheus."""
+    return PlainTextResponse(registro.texto(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/ready")
+async def ready():
+    """200 cuando los modelos de Ollama ya están cargados; 503 mientras tanto."""
+    return JSONResponse(precalentador.informe(), status_code=200 if precalentador.listo() else 503)
+
+
+@router.post("/catalogo/refrescar")
+async def refrescar_catalogo():
+    try:
+        total = await asyncio.to_thread(catalogo.refrescar)
+        return {"status": "ok", "productos": total, **diccionarios.totales()}
+    except Exception as e:
+        log.error("❌ Error refrescando catálogo: %s", e)
+        return {"status": "error"}
+
+
+@router.get("/estadisticas/intenciones")
+async def estadisticas_intenciones():
+    return obtener_estadisticas_reglas()
+
+
+@router.get("/estadisticas/cache-deteccion")
+async def estadisticas_cache_deteccion():
+    return cache_deteccion.estadisticas()
+
+
+@router.get("/estadisticas/registro-conversaciones")
+async def estadisticas_registro_conversaciones():
+    return escritor_conversaciones.estadisticas()
+
+
+@router.get("/debug/memoria-sesiones")
+async def memoria_sesiones(limite: int = 50):
+    return await asyncio.to_thread(gestor_sesiones.memoria, limite)
@@ -0,0 +1,322 @@
+# ==============================================================================
+# Backends del estado de sesión (carrito, productos mostrados e historial)
+# Con el estado solo en diccionarios del proceso, uvicorn tenía que correr con
+# un único worker. Con un backend compartido cada mensaje lee el estado de su
+# sesión en una sola operación, lo modifica en memoria y lo escribe de una vez
+# al terminar, así cualquier worker (o host) puede atender a cualquier cliente.
+# Mientras tanto el worker tiene un bloqueo con vencimiento sobre la sesión:
+# dos mensajes del mismo número en dos workers se atienden de a uno.
+# ==============================================================================
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import zlib
+from decimal import Decimal
+from urllib.parse import urlparse
+
+# "local"   → diccionarios del proceso (un solo worker; comportamiento anterior)
+# "memoria" → estado serializado en memoria (mismo camino que los externos, para pruebas)
+# "sqlite"  → archivo compartido por los workers de un mismo host
+# "kv"      → servidor clave-valor con protocolo Redis, compartido entre hosts
+ESTADO_SESIONES = os.getenv("ESTADO_SESIONES", "local")
+ESTADO_SQLITE_ARCHIVO = os.getenv(
+    "ESTADO_SQLITE_ARCHIVO",
+    os.path.join(os.path.dirname(__file__), "..", "estado_sesiones.db"),
+)
+ESTADO_KV_URL = os.getenv("ESTADO_KV_URL", "redis://localhost:6379/0")
+# Vencimiento del estado guardado (segundos de inactividad, 0 = no vence)
+ESTADO_TTL = int(os.getenv("ESTADO_TTL", str(7 * 24 * 3600)))
+# Cuánto dura como máximo el bloqueo de una sesión (si el worker se cae, se libera solo)
+ESTADO_BLOQUEO_MS = int(os.getenv("ESTADO_BLOQUEO_MS", "60000"))
+
+# Los estados más grandes que esto se comprimen
+_MIN_COMPRIMIR = 256
+
+# =============================================================================
+# SERIALIZACIÓN
+# =============================================================================
+
+def _codificar(valor):
+    # Los precios que vienen de MySQL son Decimal
+    if isinstance(valor, Decimal):
+        return {"$d": str(valor)}
+    raise TypeError(f"No se puede serializar {type(valor).__name__}")
+
+
+def _decodificar(objeto: dict):
+    if len(objeto) == 1 and "$d" in objeto:
+        return Decimal(objeto["$d"])
+    return objeto
+
+
+def serializar(estado: dict) -> bytes:
+    """JSON compacto; si el resultado es grande se comprime con zlib. El primer byte indica el formato."""
+    datos = json.dumps(estado, ensure_ascii=False, separators=(",", ":"), default=_codificar).encode("utf-8")
+    if len(datos) >= _MIN_COMPRIMIR:
+        return b"z" + zlib.compress(datos, 1)
+    return b"j" + datos
+
+
+def deserializar(datos: bytes) -> dict:
+    formato, cuerpo = datos[:1], datos[1:]
+    if formato == b"z":
+        cuerpo = zlib.decompress(cuerpo)
+    return json.loads(cuerpo.decode("utf-8"), object_hook=_decodificar)
+
+# =============================================================================
+# BACKENDS
+# =============================================================================
+
+class EstadoSesiones:
+    """Interfaz: una clave por sesión con todo su estado ya serializado."""
+
+    def leer(self, session_id: str):
+        """Devuelve los bytes guardados o None."""
+        raise NotImplementedError
+
+    def escribir(self, session_id: str, datos: bytes):
+        raise NotImplementedError
+
+    def borrar(self, session_id: str):
+        raise NotImplementedError
+
+    def bloquear(self, session_id: str, token: str, ms: int = ESTADO_BLOQUEO_MS) -> bool:
+        """Toma el bloqueo de la sesión si está libre (o vencido). Devuelve True si lo tomó."""
+        raise NotImplementedError
+
+    def liberar(self, session_id: str, token: str):
+        """Suelta el bloqueo solo si sigue siendo de `token`."""
+        raise NotImplementedError
+
+    def cerrar(self):
+        pass
+
+
+class EstadoMemoria(EstadoSesiones):
+    def __init__(self, ttl: int = ESTADO_TTL):
+        self.ttl = ttl
+        self._datos = {}     # session_id → (vence, bytes)
+        self._bloqueos = {}  # session_id → (vence, token)
+        self._lock = threading.Lock()
+
+    def leer(self, session_id):
+        with self._lock:
+            entrada = self._datos.get(session_id)
+        if entrada is None or (entrada[0] and entrada[0] <= time.time()):
+            return None
+        return entrada[1]
+
+    def escribir(self, session_id, datos):
+        with self._lock:
+            self._datos[session_id] = (time.time() + self.ttl if self.ttl else 0, datos)
+
+    def borrar(self, session_id):
+        with self._lock:
+            self._datos.pop(session_id, None)
+
+    def bloquear(self, session_id, token, ms=ESTADO_BLOQUEO_MS):
+        ahora = time.time()
+        with self._lock:
+            vence, _ = self._bloqueos.get(session_id, (0, None))
+            if vence > ahora:
+                return False
+            self._bloqueos[session_id] = (ahora + ms / 1000, token)
+            return True
+
+    def liberar(self, session_id, token):
+        with self._lock:
+            if self._bloqueos.get(session_id, (0, None))[1] == token:
+                del self._bloqueos[session_id]
+
+
+class EstadoSQLite(EstadoSesiones):
+    """Un archivo compartido por varios procesos (modo WAL: lectores y un escritor a la vez)."""
+
+    def __init__(self, archivo: str = ESTADO_SQLITE_ARCHIVO, ttl: int = ESTADO_TTL):
+        self.ttl = ttl
+        self._conexion = sqlite3.connect(archivo, timeout=10, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS estado (session_id TEXT PRIMARY KEY, vence REAL, datos BLOB)"
+        )
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS bloqueos (session_id TEXT PRIMARY KEY, vence REAL, token TEXT)"
+        )
+
+    def leer(self, session_id):
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT vence, datos FROM estado WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if fila is None or (fila[0] and fila[0] <= time.time()):
+            return None
+        return bytes(fila[1])
+
+    def escribir(self, session_id, datos):
+        vence = time.time() + self.ttl if self.ttl else 0
+        with self._lock:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO estado (session_id, vence, datos) VALUES (?, ?, ?)",
+                (session_id, vence, datos),
+            )
+
+    def borrar(self, session_id):
+        with self._lock:
+            self._conexion.execute("DELETE FROM estado WHERE session_id = ?", (session_id,))
+
+    def bloquear(self, session_id, token, ms=ESTADO_BLOQUEO_MS):
+        ahora = time.time()
+        # Una sola sentencia: inserta, o pisa el bloqueo solo si ya venció
+        with self._lock:
+            cursor = self._conexion.execute(
+                "INSERT INTO bloqueos (session_id, vence, token) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET vence = excluded.vence, token = excluded.token "
+                "WHERE bloqueos.vence <= ?",
+                (session_id, ahora + ms / 1000, token, ahora),
+            )
+        return cursor.rowcount == 1
+
+    def liberar(self, session_id, token):
+        with self._lock:
+            self._conexion.execute("DELETE FROM bloqueos WHERE session_id = ? AND token = ?", (session_id, token))
+
+    def purgar_vencidos(self):
+        with self._lock:
+            self._conexion.execute("DELETE FROM estado WHERE vence > 0 AND vence <= ?", (time.time(),))
+            self._conexion.execute("DELETE FROM bloqueos WHERE vence <= ?", (time.time(),))
+
+    def cerrar(self):
+        self._conexion.close()
+
+
+# Borra el bloqueo solo si sigue siendo del que lo tomó (si venció, puede ser de otro worker)
+_SCRIPT_LIBERAR = (
+    'if redis.call("GET", KEYS[1]) == ARGV[1] then return redis.call("DEL", KEYS[1]) else return 0 end'
+)
+
+
+class EstadoKV(EstadoSesiones):
+    """
+    Cliente mínimo del protocolo de Redis (RESP) sobre un socket reutilizado:
+    GET y SET con PX, un viaje de ida y vuelta por operación. El bloqueo de
+    cada sesión es SET NX PX y se suelta con un script que compara el token.
+    Sirve para Redis, Valkey, KeyDB o cualquier servidor compatible.
+    """
+
+    def __init__(self, url: str = ESTADO_KV_URL, ttl: int = ESTADO_TTL, prefijo: str = "sesion:", timeout: float = 5.0):
+        partes = urlparse(url)
+        self.host = partes.hostname or "localhost"
+        self.port = partes.port or 6379
+        self.db = int(partes.path.strip("/") or 0)
+        self.password = partes.password
+        self.ttl = ttl
+        self.prefijo = prefijo
+        self.timeout = timeout
+        self._socket = None
+        self._lector = None
+        self._lock = threading.Lock()
+
+    # --- protocolo ---
+
+    def _conectar(self):
+        self._socket = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._lector = self._socket.makefile("rb")
+        if self.password:
+            self._enviar("AUTH", self.password)
+        if self.db:
+            self._enviar("SELECT", self.db)
+
+    def _enviar(self, *argumentos):
+        partes = [f"*{len(argumentos)}\r\n".encode()]
+        for argumento in argumentos:
+            if not isinstance(argumento, bytes):
+                argumento = str(argumento).encode("utf-8")
+            partes.append(b"$%d\r\n%s\r\n" % (len(argumento), argumento))
+        self._socket.sendall(b"".join(partes))
+        return self._respuesta()
+
+    def _respuesta(self):
+        linea = self._lector.readline()
+        if not linea:
+            raise ConnectionError("El servidor clave-valor cerró la conexión")
+        tipo, resto = linea[:1], linea[1:-2]
+        if tipo == b"+":
+            return resto.decode()
+        if tipo == b"-":
+            raise RuntimeError(f"Error del servidor clave-valor: {resto.decode()}")
+        if tipo == b":":
+            return int(resto)
+        if tipo == b"$":
+            largo = int(resto)
+            if largo < 0:
+                return None
+            datos = self._lector.read(largo + 2)
+            return datos[:-2]
+        if tipo == b"*":
+            return [self._respuesta() for _ in range(int(resto))]
+        raise ConnectionError(f"Respuesta inesperada del servidor clave-valor: {linea!r}")
+
+    def _comando(self, *argumentos):
+        with self._lock:
+            # Un reintento si la conexión reutilizada se había cortado
+            for intento in range(2):
+                try:
+                    if self._socket is None:
+                        self._conectar()
+                    return self._enviar(*argumentos)
+                except (OSError, ConnectionError):
+                    self._desconectar()
+                    if intento:
+                        raise
+
+    def _desconectar(self):
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except OSError:
+                pass
+        self._socket = self._lector = None
+
+    # --- interfaz ---
+
+    def leer(self, session_id):
+        return self._comando("GET", self.prefijo + session_id)
+
+    def escribir(self, session_id, datos):
+        if self.ttl:
+            self._comando("SET", self.prefijo + session_id, datos, "PX", self.ttl * 1000)
+        else:
+            self._comando("SET", self.prefijo + session_id, datos)
+
+    def borrar(self, session_id):
+        self._comando("DEL", self.prefijo + session_id)
+
+    def bloquear(self, session_id, token, ms=ESTADO_BLOQUEO_MS):
+        return self._comando("SET", "lock:" + self.prefijo + session_id, token, "NX", "PX", ms) == "OK"
+
+    def liberar(self, session_id, token):
+        self._comando("EVAL", _SCRIPT_LIBERAR, 1, "lock:" + self.prefijo + session_id, token)
+
+    def cerrar(self):
+        with self._lock:
+            self._desconectar()
+
+
+def crear_backend(nombre: str = ESTADO_SESIONES):
+    """Backend configurado, o None para el modo "local" (diccionarios del proceso)."""
+    if nombre == "local":
+        return None
+    if nombre == "memoria":
+        return EstadoMemoria()
+    if nombre == "sqlite":
+        return EstadoSQLite()
+    if nombre == "kv":
+        return EstadoKV()
+    raise ValueError(f"ESTADO_SESIONES desconocido: {nombre}")
@@ -0,0 +1,380 @@
+# ==============================================================================
+# Estado por sesión: historial de chat, productos mostrados y carrito
+# Antes cada diccionario crecía con cada número que alguna vez escribió.
+# El gestor desaloja las sesiones inactivas (TTL) y las menos usadas cuando
+# se supera el máximo (LRU). Los carritos con productos se guardan en disco
+# al desalojar y se recuperan con el próximo mensaje de ese cliente.
+# Con un backend compartido (ver estado_sesiones.py) el estado de cada sesión
+# se lee al empezar un mensaje y se escribe de una vez al terminar.
+# ==============================================================================
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.estado_sesiones import crear_backend, serializar, deserializar
+from app.logs import obtener_logger
+
+log = obtener_logger("gestor_sesiones")
+
+SESIONES_MAX = int(os.getenv("SESIONES_MAX", "1000"))
+SESIONES_TTL = int(os.getenv("SESIONES_TTL", "1800"))   # segundos de inactividad
+SESIONES_LIMPIEZA_SEGUNDOS = int(os.getenv("SESIONES_LIMPIEZA_SEGUNDOS", "60"))
+# Cada cuánto se vuelve a intentar tomar una sesión bloqueada por otro worker
+SESIONES_ESPERA_BLOQUEO = float(os.getenv("SESIONES_ESPERA_BLOQUEO", "0.05"))
+SESIONES_CARPETA = os.getenv(
+    "SESIONES_CARPETA",
+    os.path.join(os.path.dirname(__file__), "..", "sesiones_desalojadas"),
+)
+
+
+def tamanio_profundo(objeto, vistos=None) -> int:
+    """Bytes aproximados de un objeto y todo lo que cuelga de él (sys.getsizeof recursivo)."""
+    vistos = set() if vistos is None else vistos
+    if id(objeto) in vistos:
+        return 0
+    vistos.add(id(objeto))
+    total = sys.getsizeof(objeto)
+    if isinstance(objeto, (str, bytes, int, float, bool)) or objeto is None:
+        return total
+    if isinstance(objeto, dict):
+        total += sum(tamanio_profundo(k, vistos) + tamanio_profundo(v, vistos) for k, v in objeto.items())
+    elif isinstance(objeto, (list, tuple, set, frozenset)):
+        total += sum(tamanio_profundo(v, vistos) for v in objeto)
+    elif hasattr(objeto, "__dict__"):
+        # Historiales y mensajes de LangChain (modelos de pydantic)
+        total += tamanio_profundo(vars(objeto), vistos)
+    elif hasattr(objeto, "__slots__"):
+        # Pedidos y sus líneas
+        total += sum(tamanio_profundo(getattr(objeto, a, None), vistos) for a in objeto.__slots__)
+    return total
+
+
+def _conversacion(historial):
+    """Mensajes del historial sin el contexto fijo del supermercado."""
+    if hasattr(historial, "fijos"):
+        return historial.messages[len(historial.fijos):]
+    return historial.messages[1:]
+
+
+def _exportar_pedido(pedido):
+    return pedido.a_lista() if hasattr(pedido, "a_lista") else pedido
+
+
+class GestorSesiones:
+    """
+    Dueño de los diccionarios por sesión. crud.py y pedidos.py usan directamente
+    `historiales`, `datos` y `pedidos`; el gestor solo agrega y quita claves.
+    Una sesión que está procesando un mensaje (ver `en_uso`) nunca se desaloja.
+
+    Si hay `backend`, los diccionarios solo guardan las sesiones que están
+    procesando un mensaje: el estado se trae del backend al entrar y se
+    devuelve al salir, para que lo vea cualquier otro worker. Entre esas dos
+    operaciones el mensaje tiene el bloqueo de la sesión en el backend, así que
+    los mensajes de un mismo cliente se atienden de a uno en todos los workers.
+    """
+
+    def __init__(self, max_sesiones=SESIONES_MAX, ttl=SESIONES_TTL, carpeta=SESIONES_CARPETA, backend=None):
+        self.max_sesiones = max_sesiones
+        self.ttl = ttl
+        self.carpeta = carpeta
+        self.backend = backend
+        # Crea un historial vacío con el contexto fijo (lo define crud.py)
+        self.fabrica_historial = None
+        # Reconstruye un pedido desde su forma serializada (lo define pedidos.py)
+        self.fabrica_pedido = None
+        self.historiales = {}
+        self.datos = {}
+        self.pedidos = {}
+        self._accesos = OrderedDict()    # session_id → último uso (más reciente al final)
+        self._en_uso = {}
+        self._saliendo = {}              # session_id → estado desalojado cuyo carrito se está escribiendo
+        self._lock = threading.RLock()
+        self._detener = threading.Event()
+        self._hilo = None
+        self.metricas = {"desalojadas_ttl": 0, "desalojadas_lru": 0, "carritos_guardados": 0, "carritos_recuperados": 0}
+
+    # -------------------------------------------------------------------------
+    # Ciclo de vida de una sesión
+    # -------------------------------------------------------------------------
+
+    @asynccontextmanager
+    async def en_uso(self, session_id: str):
+        """Marca la sesión como activa mientras se procesa un mensaje."""
+        # El bloqueo se toma antes de contar el mensaje: con backend nunca hay dos a la vez
+        token = await self._bloquear(session_id) if self.backend is not None else None
+        with self._lock:
+            self._en_uso[session_id] = self._en_uso.get(session_id, 0) + 1
+            primero = self._en_uso[session_id] == 1
+            self._tocar(session_id)
+        try:
+            if self.backend is None:
+                # Leer el carrito guardado y escribir los desalojados toca el disco: fuera del event loop
+                await asyncio.to_thread(self._al_entrar, session_id)
+            elif primero:
+                await asyncio.to_thread(self._cargar, session_id)
+            yield
+        finally:
+            with self._lock:
+                self._en_uso[session_id] -= 1
+                ultimo = not self._en_uso[session_id]
+                if ultimo:
+                    del self._en_uso[session_id]
+                self._tocar(session_id)
+            if self.backend is not None:
+                try:
+                    if ultimo:
+                        await asyncio.to_thread(self._guardar, session_id)
+                finally:
+                    await asyncio.to_thread(self.backend.liberar, session_id, token)
+
+    async def _bloquear(self, session_id: str) -> str:
+        """Espera hasta tener el bloqueo de la sesión; si otro worker se cayó, vence solo."""
+        token = uuid.uuid4().hex
+        while not await asyncio.to_thread(self.backend.bloquear, session_id, token):
+            await asyncio.sleep(SESIONES_ESPERA_BLOQUEO)
+        return token
+
+    def _al_entrar(self, session_id: str):
+        self._recuperar_carrito(session_id)
+        self.desalojar()
+
+    def _cargar(self, session_id: str):
+        """Una lectura al backend por mensaje, con todo el estado de la sesión."""
+        datos = self.backend.leer(session_id)
+        estado = deserializar(datos) if datos else {}
+        with self._lock:
+            if "d" in estado:
+                self.datos[session_id] = estado["d"]
+            if "p" in estado:
+                self.pedidos[session_id] = self._importar_pedido(estado["p"])
+            if "h" in estado and self.fabrica_historial is not None:
+                historial = self.fabrica_historial()
+                historial.add_messages([
+                    HumanMessage(content=contenido) if tipo == "h" else AIMessage(content=contenido)
+                    for tipo, contenido in estado["h"]
+                ])
+                self.historiales[session_id] = historial
+
+    def _guardar(self, session_id: str):
+        """Una escritura al backend por mensaje; la copia local se descarta."""
+        with self._lock:
+            if session_id in self._en_uso:
+                return     # entró otro mensaje de la sesión mientras tanto; guarda ese
+            estado = {}
+            historial = self.historiales.pop(session_id, None)
+            if historial is not None:
+                estado["h"] = [
+                    ["h" if m.type == "human" else "a", m.content]
+                    for m in _conversacion(historial)
+                ]
+            if session_id in self.datos:
+                estado["d"] = self.datos.pop(session_id)
+            if session_id in self.pedidos:
+                estado["p"] = _exportar_pedido(self.pedidos.pop(session_id))
+            self._accesos.pop(session_id, None)
+        self.backend.escribir(session_id, serializar(estado))
+
+    def _tocar(self, session_id: str):
+        self._accesos[session_id] = time.monotonic()
+        self._accesos.move_to_end(session_id)
+
+    def desalojar(self) -> int:
+        """Quita las sesiones vencidas y, si sobran, las menos usadas. Devuelve cuántas salieron."""
+        ahora = time.monotonic()
+        salientes = {}       # session_id → métrica
+        with self._lock:
+            for session_id, ultimo_uso in self._accesos.items():
+                if session_id in self._en_uso:
+                    continue
+                if self.ttl > 0 and ahora - ultimo_uso > self.ttl:
+                    salientes[session_id] = "desalojadas_ttl"
+
+            sobrantes = len(self._accesos) - len(salientes) - self.max_sesiones if self.max_sesiones > 0 else 0
+            for session_id in self._accesos:
+                if sobrantes <= 0:
+                    break
+                if session_id in self._en_uso or session_id in salientes:
+                    continue
+                salientes[session_id] = "desalojadas_lru"
+                sobrantes -= 1
+
+            for session_id in salientes:
+                self._quitar(session_id)
+
+        # Los carritos se escriben sin el lock: las demás sesiones no esperan al disco
+        desalojadas = 0
+        for session_id, metrica in salientes.items():
+            if self._escribir_saliente(session_id):
+                self.metricas[metrica] += 1
+                desalojadas += 1
+        return desalojadas
+
+    def _quitar(self, session_id: str):
+        """Saca la sesión de memoria; si tiene carrito, queda en `_saliendo` hasta escribirlo."""
+        ultimo_uso = self._accesos.pop(session_id)
+        saliente = {
+            "pedido": self.pedidos.pop(session_id, None),
+            "historial": self.historiales.pop(session_id, None),
+            "datos": self.datos.pop(session_id, None),
+            "ultimo_uso": ultimo_uso,
+        }
+        if saliente["pedido"]:
+            self._saliendo[session_id] = saliente
+        log.debug("🧹 Sesión %s desalojada de memoria", session_id)
+
+    def _escribir_saliente(self, session_id: str) -> bool:
+        with self._lock:
+            saliente = self._saliendo.get(session_id)
+        if saliente is None:
+            return True
+        try:
+            self._guardar_carrito(session_id, saliente["pedido"])
+        except OSError as e:
+            # Sin disco no se pierde el carrito: la sesión vuelve a memoria
+            log.warning("⚠️ No se pudo guardar el carrito de %s, no se desaloja: %s", session_id, e)
+            with self._lock:
+                if self._saliendo.get(session_id) is saliente:
+                    del self._saliendo[session_id]
+                    self._reponer(session_id, saliente)
+            return False
+        with self._lock:
+            if self._saliendo.get(session_id) is saliente:
+                del self._saliendo[session_id]
+            elif session_id not in self._saliendo:
+                # Entró un mensaje mientras se escribía y ya se llevó el carrito de memoria
+                self._borrar_carrito(session_id)
+        return True
+
+    def _reponer(self, session_id: str, saliente: dict):
+        self.pedidos.setdefault(session_id, saliente["pedido"])
+        if saliente["historial"] is not None:
+            self.historiales.setdefault(session_id, saliente["historial"])
+        if saliente["datos"] is not None:
+            self.datos.setdefault(session_id, saliente["datos"])
+        if session_id not in self._accesos:
+            self._accesos[session_id] = saliente["ultimo_uso"]
+            self._accesos.move_to_end(session_id, last=False)
+
+    # -------------------------------------------------------------------------
+    # Carritos en disco
+    # -------------------------------------------------------------------------
+
+    def _ruta(self, session_id: str) -> str:
+        return os.path.join(self.carpeta, f"{session_id}.json")
+
+    def _guardar_carrito(self, session_id: str, pedido):
+        os.makedirs(self.carpeta, exist_ok=True)
+        ruta = self._ruta(session_id)
+        with open(f"{ruta}.tmp", "w", encoding="utf-8") as f:
+            json.dump(_exportar_pedido(pedido), f, ensure_ascii=False)
+        os.replace(f"{ruta}.tmp", ruta)
+        self.metricas["carritos_guardados"] += 1
+
+    def _borrar_carrito(self, session_id: str):
+        try:
+            os.remove(self._ruta(session_id))
+        except FileNotFoundError:
+            pass
+
+    def _recuperar_carrito(self, session_id: str):
+        with self._lock:
+            if session_id in self.pedidos:
+                return
+            saliente = self._saliendo.pop(session_id, None)
+            if saliente is not None:
+                # Se estaba desalojando: vuelve tal cual, sin pasar por el disco
+                self._reponer(session_id, saliente)
+                return
+        ruta = self._ruta(session_id)
+        if not os.path.exists(ruta):
+            return
+        try:
+            with open(ruta, "r", encoding="utf-8") as f:
+                datos = json.load(f)
+        except FileNotFoundError:
+            return      # lo recuperó otro mensaje de la misma sesión
+        except (OSError, ValueError) as e:
+            log.warning("⚠️ No se pudo recuperar el carrito de %s: %s", session_id, e)
+            return
+        with self._lock:
+            if session_id in self.pedidos:
+                return
+            self.pedidos[session_id] = self._importar_pedido(datos)
+            self.metricas["carritos_recuperados"] += 1
+        self._borrar_carrito(session_id)
+        log.debug("📂 Carrito de %s recuperado del disco", session_id)
+
+    def _importar_pedido(self, datos):
+        return self.fabrica_pedido(datos) if self.fabrica_pedido is not None else datos
+
+    def carritos_en_disco(self) -> int:
+        if not os.path.isdir(self.carpeta):
+            return 0
+        return sum(1 for nombre in os.listdir(self.carpeta) if nombre.endswith(".json"))
+
+    # -------------------------------------------------------------------------
+    # Limpieza periódica (las sesiones inactivas se van aunque no entren mensajes)
+    # -------------------------------------------------------------------------
+
+    def iniciar_limpieza_periodica(self, segundos: int = SESIONES_LIMPIEZA_SEGUNDOS):
+        if segundos <= 0 or (self._hilo and self._hilo.is_alive()):
+            return
+        self._detener.clear()
+
+        def _loop():
+            while not self._detener.wait(segundos):
+                try:
+                    self.desalojar()
+                except Exception as e:
+                    log.warning("⚠️ Error al desalojar sesiones: %s", e)
+
+        self._hilo = threading.Thread(target=_loop, name="limpieza-sesiones", daemon=True)
+        self._hilo.start()
+
+    def detener_limpieza_periodica(self):
+        self._detener.set()
+
+    # -------------------------------------------------------------------------
+    # Memoria
+    # -------------------------------------------------------------------------
+
+    def memoria(self, limite: int = 50) -> dict:
+        """Bytes aproximados por sesión (las más pesadas primero) y el total."""
+        ahora = time.monotonic()
+        with self._lock:
+            ids = set(self.historiales) | set(self.datos) | set(self.pedidos) | set(self._accesos)
+            por_sesion = []
+            for session_id in ids:
+                fila = {
+                    "session_id": session_id,
+                    "historial_bytes": tamanio_profundo(self.historiales.get(session_id)),
+                    "datos_bytes": tamanio_profundo(self.datos.get(session_id)),
+                    "pedido_bytes": tamanio_profundo(self.pedidos.get(session_id)),
+                    "inactiva_segundos": round(ahora - self._accesos[session_id], 1) if session_id in self._accesos else None,
+                    "en_uso": session_id in self._en_uso,
+                }
+                fila["total_bytes"] = fila["historial_bytes"] + fila["datos_bytes"] + fila["pedido_bytes"]
+                por_sesion.append(fila)
+
+        por_sesion.sort(key=lambda f: f["total_bytes"], reverse=True)
+        return {
+            "sesiones": len(por_sesion),
+            "total_bytes": sum(f["total_bytes"] for f in por_sesion),
+            "max_sesiones": self.max_sesiones,
+            "ttl_segundos": self.ttl,
+            "carritos_en_disco": self.carritos_en_disco(),
+            **self.metricas,
+            "por_sesion": por_sesion[:limite],
+        }
+
+
+gestor_sesiones = GestorSesiones(backend=crear_backend())
@@ -0,0 +1,80 @@
+# ==============================================================================
+# Grafo de pasos de un mensaje
+# Cada paso (consulta a la IA, búsqueda en el catálogo) declara de qué pasos
+# depende y arranca apenas terminan esos, así los independientes corren a la
+# vez y la latencia del mensaje es la del camino más largo y no la suma.
+# Un semáforo limita cuántos pasos corren al mismo tiempo.
+# ==============================================================================
+
+import asyncio
+import os
+
+# Pasos de un mismo mensaje que pueden correr a la vez
+PIPELINE_CONCURRENCIA = int(os.getenv("PIPELINE_CONCURRENCIA", "4"))
+
+
+class Grafo:
+    """
+    Uso:
+        async with Grafo() as grafo:
+            grafo.agregar("es_comida", preguntar_si_es_comida)
+            grafo.agregar("ingredientes", pedir_ingredientes)
+            grafo.agregar("productos", buscar_productos, "ingredientes")
+            if await grafo.resultado("es_comida"):
+                productos = await grafo.resultado("productos")
+
+    Cada función recibe los resultados de sus dependencias en el orden en que
+    se declararon. Los pasos arrancan al agregarlos; al salir del bloque se
+    cancelan los que nadie esperó (por ejemplo, si ya no hacen falta).
+    """
+
+    def __init__(self, limite: int = None):
+        self._semaforo = asyncio.Semaphore(limite or PIPELINE_CONCURRENCIA)
+        self._tareas = {}
+
+    def agregar(self, nombre: str, funcion, *dependencias: str):
+        if nombre in self._tareas:
+            raise ValueError(f"El paso '{nombre}' ya existe")
+        faltantes = [d for d in dependencias if d not in self._tareas]
+        if faltantes:
+            # Las dependencias se agregan antes: así no puede haber ciclos
+            raise ValueError(f"El paso '{nombre}' depende de pasos inexistentes: {', '.join(faltantes)}")
+        previas = [self._tareas[d] for d in dependencias]
+        self._tareas[nombre] = asyncio.ensure_future(self._correr(funcion, previas))
+        return self
+
+    async def _correr(self, funcion, previas):
+        argumentos = [await tarea for tarea in previas]
+        async with self._semaforo:
+            return await funcion(*argumentos)
+
+    async def resultado(self, nombre: str):
+        # shield: si el que espera se cancela, el paso sigue para otros que dependen de él
+        return await asyncio.shield(self._tareas[nombre])
+
+    async def todos(self) -> dict:
+        """Espera todos los pasos y devuelve {nombre: resultado}."""
+        valores = await asyncio.gather(*self._tareas.values())
+        return dict(zip(self._tareas, valores))
+
+    def cancelar(self):
+        for tarea in self._tareas.values():
+            if not tarea.done():
+                tarea.cancel()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *excepcion):
+        self.cancelar()
+        # Se espera a que terminen de cancelarse para no dejar tareas sueltas
+        await asyncio.gather(*self._tareas.values(), return_exceptions=True)
+        return False
+
+
+async def en_paralelo(funciones: dict, limite: int = None) -> dict:
+    """Pasos sin dependencias entre sí: {nombre: función sin argumentos} → {nombre: resultado}."""
+    async with Grafo(limite) as grafo:
+        for nombre, funcion in funciones.items():
+            grafo.agregar(nombre, funcion)
+        return await grafo.todos()
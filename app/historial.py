@@ -0,0 +1,122 @@
+# ==============================================================================
+# Historial de chat con ventana por tokens
+# RunnableWithMessageHistory le manda al modelo todo el historial en cada
+# llamada, así que el tiempo de evaluación del prompt crecía con la charla.
+# Este historial fija el contexto del supermercado y, detrás, solo conserva
+# los últimos mensajes que entran en el presupuesto de tokens.
+# ==============================================================================
+
+import os
+import re
+
+from langchain_core.chat_history import BaseChatMessageHistory, InMemoryChatMessageHistory
+from langchain_core.messages import HumanMessage
+
+# "ventana" = contexto fijo + últimos mensajes dentro del presupuesto
+# "completo" = todo el historial (comportamiento anterior)
+HISTORIAL_ESTRATEGIA = os.getenv("HISTORIAL_ESTRATEGIA", "ventana")
+# Tokens de conversación que se mandan además del contexto fijo
+HISTORIAL_MAX_TOKENS = int(os.getenv("HISTORIAL_MAX_TOKENS", "1200"))
+# Tokens que agrega la plantilla de chat por cada mensaje (<start_of_turn>rol ... <end_of_turn>)
+TOKENS_POR_MENSAJE = int(os.getenv("HISTORIAL_TOKENS_POR_MENSAJE", "4"))
+
+_PIEZAS = re.compile(r"\d+|[^\W\d_]+|[^\w\s]", re.UNICODE)
+
+
+def estimar_tokens(texto: str) -> int:
+    """
+    Estimación de tokens para el tokenizador de gemma3 (SentencePiece, vocabulario grande):
+    - palabras comunes de hasta 6 letras: 1 token; las más largas se parten cada ~4 letras
+    - números: 1 token por dígito
+    - signos de puntuación: 1 token; emojis y otros símbolos fuera del BMP: 2 tokens
+    """
+    total = 0
+    for pieza in _PIEZAS.findall(texto):
+        if pieza.isdigit():
+            total += len(pieza)
+        elif pieza[0].isalpha():
+            total += 1 + (max(0, len(pieza) - 6) + 3) // 4
+        else:
+            total += 2 if ord(pieza[0]) > 0xFFFF else 1
+    return total
+
+
+def tokens_mensaje(mensaje) -> int:
+    contenido = mensaje.content if isinstance(mensaje.content, str) else str(mensaje.content)
+    return estimar_tokens(contenido) + TOKENS_POR_MENSAJE
+
+
+class HistorialConVentana(BaseChatMessageHistory):
+    """
+    Historial con mensajes fijos (el contexto del supermercado) y una ventana
+    deslizante de conversación que nunca supera `max_tokens`. Los mensajes que
+    quedan fuera de la ventana se descartan, así tampoco ocupan memoria.
+    """
+
+    def __init__(self, max_tokens: int = HISTORIAL_MAX_TOKENS):
+        self.max_tokens = max_tokens
+        self.fijos = []
+        self._ventana = []
+        self._tokens = []        # tokens estimados de cada mensaje de la ventana
+        self.descartados = 0
+
+    @property
+    def messages(self):
+        return self.fijos + self._ventana
+
+    @property
+    def tokens_ventana(self) -> int:
+        return sum(self._tokens)
+
+    def fijar(self, contenido: str):
+        """Agrega un mensaje que siempre se envía y nunca sale de la ventana."""
+        self.fijos.append(HumanMessage(content=contenido))
+
+    def add_message(self, message):
+        self._ventana.append(message)
+        self._tokens.append(tokens_mensaje(message))
+        self._recortar()
+
+    def add_messages(self, messages):
+        for mensaje in messages:
+            self._ventana.append(mensaje)
+            self._tokens.append(tokens_mensaje(mensaje))
+        self._recortar()
+
+    async def aget_messages(self):
+        return self.messages
+
+    async def aadd_messages(self, messages):
+        self.add_messages(messages)
+
+    def _recortar(self):
+        total = sum(self._tokens)
+        if total <= self.max_tokens:
+            return
+        # Siempre queda al menos el último mensaje, aunque solo supere el presupuesto
+        while len(self._ventana) > 1 and total > self.max_tokens:
+            total -= self._tokens.pop(0)
+            self._ventana.pop(0)
+            self.descartados += 1
+        # Después de cortar, la ventana empieza con un mensaje del cliente y no con una respuesta suelta
+        while len(self._ventana) > 1 and self._ventana[0].type != "human":
+            total -= self._tokens.pop(0)
+            self._ventana.pop(0)
+            self.descartados += 1
+
+    def clear(self):
+        self._ventana = []
+        self._tokens = []
+
+
+def crear_historial(contexto_fijo: str, estrategia: str = None, max_tokens: int = None):
+    """Historial nuevo según la estrategia configurada, con el contexto ya cargado."""
+    estrategia = estrategia or HISTORIAL_ESTRATEGIA
+    if estrategia == "completo":
+        historial = InMemoryChatMessageHistory()
+        historial.add_user_message(contexto_fijo)
+        return historial
+
+    historial = HistorialConVentana(HISTORIAL_MAX_TOKENS if max_tokens is None else max_tokens)
+    historial.fijar(contexto_fijo)
+    return historial
@@ -0,0 +1,195 @@
+# ==============================================================================
+# Pre-clasificador de intenciones por reglas
+# Resuelve sin llamar a la IA los mensajes que no tienen ambigüedad
+# ("ver mi pedido", "vaciá el carrito", "finalizar", "hola", "agregame 2 coca").
+# Si ninguna regla está segura, se sigue usando detect_product_with_ai.
+# ==============================================================================
+
+import os
+import re
+
+# Confianza mínima para aceptar el resultado de una regla sin consultar a la IA
+UMBRAL_CONFIANZA_REGLAS = float(os.getenv("UMBRAL_CONFIANZA_REGLAS", "0.9"))
+
+# Cortesías que pueden rodear a cualquier frase sin cambiar la intención
+# (las comas solo llegan en el texto de REGLA_AGREGAR_VARIOS, ver _con_comas)
+_ANTES = r"^(?:(?:dale|ok|bueno|listo|por favor|porfa)\s*,?\s+)*(?:(?:quiero|quisiera|queria|podes|podrias|me)\s+)?"
+_DESPUES = r"(?:\s*,?\s+(?:por favor|porfa|gracias|dale))*$"
+
+_NUMEROS = (
+    r"\d+|un par de|media docena de|una docena de|una|uno|un|dos|tres|cuatro|cinco"
+    r"|seis|siete|ocho|nueve|diez"
+)
+_VALORES = {
+    "un par de": 2, "media docena de": 6, "una docena de": 12, "una": 1, "uno": 1, "un": 1,
+    "dos": 2, "tres": 3, "cuatro": 4, "cinco": 5, "seis": 6, "siete": 7, "ocho": 8, "nueve": 9, "diez": 10,
+}
+# Dentro del nombre de un producto, un separador o un segundo número indican una lista
+_SEPARADOR = re.compile(r"\b(?:y|e|" + _NUMEROS + r")\b")
+
+# Palabras con las que el "producto" deja de ser un nombre y pasa a ser una referencia
+# o una unidad; en esos casos decide la IA (o el resolvedor de referencias)
+_NO_PRODUCTO = re.compile(
+    r"^(?:el|la|los|las|ese|esa|esos|esas|este|esta|otro|otra|mismo|misma|mas|más"
+    r"|kilo|kilos|kg|gramo|gramos|litro|litros|paquete|paquetes|caja|cajas|botella|botellas)\b"
+)
+
+# (intención, nombre de la regla, patrón, confianza)
+REGLAS = [
+    ("MOSTRAR_PEDIDO", "ver_pedido", re.compile(
+        _ANTES + r"(?:ver|mostrar|mostrame|mostrá|mostras|mostrás|pasame|decime)\s+(?:como va\s+)?(?:mi|el)\s+(?:pedido|carrito)" + _DESPUES), 0.98),
+    ("MOSTRAR_PEDIDO", "que_tengo", re.compile(
+        _ANTES + r"(?:que|qué)\s+(?:tengo|llevo|hay)\s+en\s+(?:mi|el)\s+(?:pedido|carrito)" + _DESPUES), 0.97),
+    ("MOSTRAR_PEDIDO", "solo_pedido", re.compile(
+        _ANTES + r"(?:mi|el)\s+(?:pedido|carrito)" + _DESPUES), 0.92),
+    ("VACIAR_PEDIDO", "vaciar", re.compile(
+        _ANTES + r"(?:vaciar|vaciá|vacia|vaciame|vacíame|limpiar|limpiá|limpia|borrar|borrá|borra)\s+(?:todo\s+)?(?:el|mi)\s+(?:pedido|carrito)" + _DESPUES), 0.98),
+    ("VACIAR_PEDIDO", "borrar_todo", re.compile(
+        _ANTES + r"(?:borrá|borra|sacá|saca|quitá|quita)\s+todo" + _DESPUES), 0.93),
+    ("FINALIZAR_PEDIDO", "finalizar", re.compile(
+        _ANTES + r"(?:finalizar|finalizá|finaliza|terminar|terminá|cerrar|cerrá|confirmar|confirmá|confirmo)(?:\s+(?:el|mi)\s+(?:pedido|compra))?" + _DESPUES), 0.97),
+    ("CHARLAR", "saludo", re.compile(
+        r"^(?:hola+|holis|buenas|buen d[ií]a|buenos d[ií]as|buenas tardes|buenas noches)"
+        r"(?:\s+(?:que tal|qué tal|como va|cómo va|como estas|cómo estás|como andas|cómo andás))?$"), 0.95),
+]
+
+_VERBOS_AGREGAR = r"(?:agregame|agregá|agrega|agregar|sumame|sumá|suma|poneme|poné|pone|dame|mandame)\s+"
+
+REGLA_AGREGAR = re.compile(
+    _ANTES + _VERBOS_AGREGAR +
+    r"(?P<cantidad>" + _NUMEROS + r")\s+(?:de\s+)?(?P<producto>[a-záéíóúñü][a-záéíóúñü0-9 ]*?)" + _DESPUES
+)
+CONFIANZA_AGREGAR = 0.9
+
+# Varios productos, cada uno con su cantidad: "agregame 2 leche y 3 coca", "sumame 2 coca, 1 yerba"
+REGLA_AGREGAR_VARIOS = re.compile(_ANTES + _VERBOS_AGREGAR + r"(?P<items>.+?)" + _DESPUES)
+# Corta solo en separadores explícitos: comas del mensaje original y "y"/"e". Un número
+# suelto no separa nada, porque puede ser parte del nombre ("galletitas 9 de oro")
+_CORTE_ITEMS = re.compile(r"\s*,\s*|\s+(?:y|e)\s+")
+_ITEM = re.compile(r"(?P<cantidad>" + _NUMEROS + r")\s+(?:de\s+)?(?P<producto>[a-záéíóúñü][a-záéíóúñü0-9 ]*)$")
+
+# =============================================================================
+# CONTADORES (tasa de aciertos de las reglas)
+# =============================================================================
+
+estadisticas_reglas = {
+    "resueltos_por_reglas": 0,
+    "derivados_a_ia": 0,
+    "por_regla": {},
+}
+
+def obtener_estadisticas_reglas() -> dict:
+    total = estadisticas_reglas["resueltos_por_reglas"] + estadisticas_reglas["derivados_a_ia"]
+    return {
+        **estadisticas_reglas,
+        "por_regla": dict(estadisticas_reglas["por_regla"]),
+        "tasa_aciertos": round(estadisticas_reglas["resueltos_por_reglas"] / total, 4) if total else 0.0,
+    }
+
+# =============================================================================
+# CLASIFICACIÓN
+# =============================================================================
+
+def _limpiar(texto: str) -> str:
+    texto = texto.lower()
+    texto = re.sub(r"[¿?¡!.,;:()\"']+", " ", texto)
+    texto = re.sub(r"[^\w\sáéíóúñü]", " ", texto)   # emojis y otros símbolos
+    return " ".join(texto.split())
+
+
+def evaluar_reglas(user_input: str):
+    """
+    Devuelve {"intencion", "productos", "cantidades", "confianza", "regla"} de la primera regla
+    que coincide con el mensaje completo, o None si ninguna coincide.
+    """
+    texto = _limpiar(user_input)
+    if not texto:
+        return None
+
+    for intencion, nombre, patron, confianza in REGLAS:
+        if patron.match(texto):
+            return {"intencion": intencion, "productos": [], "cantidades": {}, "confianza": confianza, "regla": nombre}
+
+    agregar = REGLA_AGREGAR.match(texto)
+    if agregar:
+        producto = agregar.group("producto").strip()
+        if _es_producto(producto, user_input):
+            return {
+                "intencion": "AGREGAR_PRODUCTO",
+                "productos": [producto],
+                "cantidades": {producto: _cantidad(agregar.group("cantidad"))},
+                "confianza": CONFIANZA_AGREGAR,
+                "regla": "agregar_cantidad",
+            }
+
+    varios = REGLA_AGREGAR_VARIOS.match(_con_comas(user_input))
+    if varios:
+        cantidades = _items(varios.group("items"), user_input)
+        if cantidades and len(cantidades) > 1:
+            return {
+                "intencion": "AGREGAR_PRODUCTO",
+                "productos": list(cantidades),
+                "cantidades": cantidades,
+                "confianza": CONFIANZA_AGREGAR,
+                "regla": "agregar_varios",
+            }
+    return None
+
+
+def _con_comas(user_input: str) -> str:
+    """Como _limpiar, pero conserva las comas del mensaje: "2 coca, 3 yerba" → "2 coca , 3 yerba"."""
+    return " , ".join(filter(None, (_limpiar(tramo) for tramo in user_input.split(","))))
+
+
+def _items(texto: str, user_input: str):
+    """
+    producto → cantidad, o None si algún tramo no es "cantidad producto" (sin
+    cantidad, o con otro número dentro del nombre): esos casos los decide la IA.
+    """
+    cantidades = {}
+    for tramo in filter(None, _CORTE_ITEMS.split(texto)):
+        item = _ITEM.match(tramo.strip())
+        if not item:
+            return None
+        producto = item.group("producto").strip()
+        if not _es_producto(producto, user_input) or producto in cantidades:
+            return None
+        cantidades[producto] = _cantidad(item.group("cantidad"))
+    return cantidades
+
+
+def _cantidad(texto: str) -> int:
+    return int(texto) if texto.isdigit() else _VALORES[texto]
+
+
+def _es_producto(producto: str, user_input: str) -> bool:
+    """
+    Un solo nombre de producto: sin referencias ni unidades, sin "y"/"e" ni otro
+    número adentro ("coca y 3 galletitas") y sin cruzar una coma, que _limpiar
+    borra ("coca, galletitas"). Las listas con una cantidad por producto se
+    parten en REGLA_AGREGAR_VARIOS; las demás las resuelve la IA.
+    """
+    return (
+        bool(producto)
+        and not _NO_PRODUCTO.match(producto)
+        and len(producto.split()) <= 4
+        and not _SEPARADOR.search(producto)
+        and any(producto in _limpiar(tramo) for tramo in user_input.split(","))
+    )
+
+
+def clasificar_con_reglas(user_input: str, umbral: float = UMBRAL_CONFIANZA_REGLAS):
+    """
+    Igual que evaluar_reglas, pero solo devuelve el resultado si la confianza
+    alcanza el umbral, y actualiza los contadores de aciertos.
+    None significa que hay que preguntarle a la IA.
+    """
+    resultado = evaluar_reglas(user_input)
+    if resultado is None or resultado["confianza"] < umbral:
+        estadisticas_reglas["derivados_a_ia"] += 1
+        return None
+
+    estadisticas_reglas["resueltos_por_reglas"] += 1
+    por_regla = estadisticas_reglas["por_regla"]
+    por_regla[resultado["regla"]] = por_regla.get(resultado["regla"], 0) + 1
+    return resultado
@@ -0,0 +1,66 @@
+# ==============================================================================
+# Armado de las listas de productos que se le muestran al cliente
+# En lugar de que gemma3_output reescriba toda la lista token por token, la
+# lista se arma en Python y la IA, como mucho, escribe una frase de cierre corta.
+# ==============================================================================
+
+import os
+
+# Modo de armado de listas (configurable por instalación):
+#   "ia"        → la IA genera toda la respuesta, lista incluida (comportamiento anterior)
+#   "plantilla" → la lista se arma en Python y la IA solo escribe una frase de cierre corta
+#   "fijo"      → todo en Python, sin llamar a la IA
+MODO_LISTAS = os.getenv("MODO_LISTAS", "plantilla")
+
+# Tope de tokens para la frase de cierre en modo "plantilla"
+MAX_TOKENS_CIERRE = int(os.getenv("MAX_TOKENS_CIERRE", "40"))
+
+
+def formatear_lista(productos) -> str:
+    return "\n".join(f"• {p['producto']} — ${p['precio_venta']}" for p in productos)
+
+
+def formatear_grupos(grupos: dict) -> str:
+    """Una lista por cada producto pedido: {"coca": [filas], "yerba": [filas]}."""
+    return "\n\n".join(f"*{nombre.capitalize()}:*\n{formatear_lista(filas)}" for nombre, filas in grupos.items())
+
+
+def prompt_cierre(user_input: str, productos, indicacion: str) -> str:
+    """Prompt corto para la frase de cierre: no incluye la lista ni los precios."""
+    ejemplos = ", ".join(p["producto"] for p in productos[:3])
+    return f"""
+El cliente preguntó o mencionó: "{user_input}"
+Ya le mostramos {len(productos)} producto(s), por ejemplo: {ejemplos}.
+
+{indicacion}
+Respondé con UNA sola oración breve, sin repetir la lista ni los precios,
+sin hacer preguntas ni ofrecer acciones.
+"""
+
+
+def _texto(resultado) -> str:
+    return (resultado.content if hasattr(resultado, "content") else str(resultado)).strip()
+
+
+async def renderizar_lista(modelo, productos, encabezado: str, prompt_ia: str, prompt_de_cierre: str, modo: str = None, cuerpo: str = None, proposito: str = "lista") -> str:
+    """
+    Devuelve la respuesta con la lista de productos según el modo configurado.
+    - prompt_ia: el prompt completo que se usa en modo "ia".
+    - prompt_de_cierre: el prompt corto para la frase final en modo "plantilla".
+    - cuerpo: texto ya armado que reemplaza a la lista simple (por ejemplo, formatear_grupos).
+    - proposito: etiqueta de las métricas del modelo (la frase de cierre suma "_cierre").
+    Los errores de la IA se propagan para que cada llamador use su propio respaldo.
+    """
+    modo = modo or MODO_LISTAS
+
+    if modo == "ia":
+        return _texto(await modelo.ainvoke(prompt_ia, proposito=proposito))
+
+    respuesta = f"{encabezado}\n\n{cuerpo or formatear_lista(productos)}"
+    if modo == "fijo":
+        return respuesta
+
+    cierre = _texto(await modelo.ainvoke(prompt_de_cierre, options={"num_predict": MAX_TOKENS_CIERRE}, proposito=f"{proposito}_cierre"))
+    # Si el modelo se extiende, se conserva solo la primera línea
+    cierre = cierre.splitlines()[0].strip() if cierre else ""
+    return f"{respuesta}\n\n{cierre}" if cierre else respuesta
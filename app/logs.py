@@ -0,0 +1,29 @@
+# ==============================================================================
+# Logger con niveles (reemplaza a los print del pipeline)
+# Los mensajes de cada paso de una respuesta van en DEBUG: con el nivel por
+# defecto (INFO) se descartan sin formatear el texto, porque los argumentos se
+# pasan aparte ("%s") y logging solo arma la línea si el nivel está activo.
+# ==============================================================================
+
+import logging
+import os
+import sys
+
+# DEBUG muestra el detalle de cada mensaje; INFO, WARNING o ERROR lo ocultan
+LOG_NIVEL = os.getenv("LOG_NIVEL", "INFO").upper()
+
+_raiz = logging.getLogger("chatbot")
+
+
+def obtener_logger(nombre: str) -> logging.Logger:
+    return _raiz.getChild(nombre)
+
+
+def configurar_logs(nivel: str = LOG_NIVEL):
+    """Salida por consola, una sola vez aunque se llame varias veces."""
+    _raiz.setLevel(nivel)
+    if not _raiz.handlers:
+        salida = logging.StreamHandler(sys.stdout)
+        salida.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        _raiz.addHandler(salida)
+        _raiz.propagate = False
@@ -1,8 +1,19 @@
+import asyncio
 from fastapi import FastAPI
 from dotenv import load_dotenv
 from app.endpoints.endpoints import router
+from app.catalogo import catalogo
+from app.database import cerrar_pools
+from app.gestor_sesiones import gestor_sesiones
+from app.registro_conversaciones import escritor_conversaciones
+from app.modelos import precalentador, cerrar_clientes, OLLAMA_PRECALENTAR
+from app import crud
+from app.logs import configurar_logs, obtener_logger
 
 load_dotenv()
+configurar_logs()
+
+log = obtener_logger("main")
 
 app = FastAPI()
 
@@ -10,8 +21,45 @@ app.include_router(router)
 
 @app.on_event("startup")
 async def startup_event():
-	print("\n=========================================================")
-	print("=========================================================\n")
+	log.info("Iniciando el servidor")
+
+	# Cargar el catálogo en memoria (con sus categorías y marcas) para no consultar la BD en cada mensaje
+	try:
+		total = await asyncio.to_thread(catalogo.refrescar)
+		log.info("📚 Catálogo cargado en memoria (%s productos)", total)
+		catalogo.iniciar_refresco_periodico()
+	except Exception as e:
+		log.warning("⚠️ No se pudo cargar el catálogo en memoria, se consultará la BD directamente: %s", e)
+
+	# Desalojar periódicamente las sesiones inactivas
+	gestor_sesiones.iniciar_limpieza_periodica()
+
+	# Hilo que escribe las conversaciones en disco
+	escritor_conversaciones.iniciar()
+
+	# Cargar los dos modelos en Ollama sin bloquear el arranque (/ready avisa cuando terminan)
+	if OLLAMA_PRECALENTAR:
+		app.state.precalentamiento = asyncio.create_task(precalentador.precalentar_con_reintentos({
+			"input": crud.modelo_input,
+			"output": crud.modelo_output,
+		}))
+	else:
+		precalentador.omitir()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+	catalogo.detener_refresco_periodico()
+	gestor_sesiones.detener_limpieza_periodica()
+	if gestor_sesiones.backend is not None:
+		gestor_sesiones.backend.cerrar()
+	precalentamiento = getattr(app.state, "precalentamiento", None)
+	if precalentamiento is not None:
+		precalentamiento.cancel()
+	await asyncio.to_thread(escritor_conversaciones.cerrar)
+	await asyncio.to_thread(crud.base_recetas.cerrar)
+	await asyncio.to_thread(crud.cache_deteccion.cerrar)
+	await cerrar_clientes(crud.modelo_input, crud.modelo_output)
+	await cerrar_pools()
 
 # Ruta raíz
 @app.get("/")
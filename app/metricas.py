@@ -0,0 +1,245 @@
+# ==============================================================================
+# Métricas del pipeline en formato Prometheus
+# Cuánto tarda cada etapa de una respuesta: cada llamada a la IA (por modelo y
+# para qué se usa), cada consulta a la BD, cada operación sobre el carrito y
+# cada escritura del registro de conversaciones, más el total del mensaje por
+# intención y por rama de get_response. GET /metrics las expone en el formato
+# de texto de Prometheus; no hace falta ninguna dependencia extra.
+# ==============================================================================
+
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Límites superiores de los buckets de los histogramas (segundos)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas(nombres, valores, extra="") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+_INF = 'le="+Inf"'
+
+
+def _numero(valor) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    def __init__(self, nombre: str, ayuda: str, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, cantidad=1, **etiquetas):
+        clave = tuple(str(etiquetas.get(n, "")) for n in self.etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def valor(self, **etiquetas):
+        return self._valores.get(tuple(str(etiquetas.get(n, "")) for n in self.etiquetas), 0)
+
+    def texto(self) -> list:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"]
+        with self._lock:
+            for clave, valor in sorted(self._valores.items()):
+                lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}")
+        return lineas
+
+
+class Histograma:
+    def __init__(self, nombre: str, ayuda: str, etiquetas=(), buckets=BUCKETS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.buckets = tuple(buckets)
+        self._series = {}     # etiquetas → [conteos por bucket..., suma, cantidad]
+        self._lock = threading.Lock()
+
+    def observar(self, segundos: float, **etiquetas):
+        clave = tuple(str(etiquetas.get(n, "")) for n in self.etiquetas)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [0] * len(self.buckets) + [0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if segundos <= limite:
+                    serie[i] += 1
+                    break
+            serie[-2] += segundos
+            serie[-1] += 1
+
+    def cantidad(self, **etiquetas) -> int:
+        serie = self._series.get(tuple(str(etiquetas.get(n, "")) for n in self.etiquetas))
+        return serie[-1] if serie else 0
+
+    @contextmanager
+    def medir(self, **etiquetas):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+
+    def medido(self, **etiquetas):
+        """Decorador: mide cada llamada a la función (sincrónica o async)."""
+        def decorador(funcion):
+            if inspect.iscoroutinefunction(funcion):
+                @functools.wraps(funcion)
+                async def _async(*args, **kwargs):
+                    with self.medir(**etiquetas):
+                        return await funcion(*args, **kwargs)
+                return _async
+
+            @functools.wraps(funcion)
+            def _sync(*args, **kwargs):
+                with self.medir(**etiquetas):
+                    return funcion(*args, **kwargs)
+            return _sync
+        return decorador
+
+    def texto(self) -> list:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            series = sorted((clave, list(serie)) for clave, serie in self._series.items())
+        for clave, serie in series:
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, serie):
+                acumulado += conteo
+                le = f'le="{_numero(limite)}"'
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, le)} {acumulado}")
+            lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, _INF)} {serie[-1]}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(serie[-2])}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {serie[-1]}")
+        return lineas
+
+
+class Registro:
+    """Métricas propias más recolectores: funciones que al momento de exponer
+    traducen contadores que ya existen (cachés, reglas, registro) a líneas."""
+
+    def __init__(self):
+        self._metricas = []
+        self._recolectores = []
+
+    def contador(self, nombre, ayuda, etiquetas=()) -> Contador:
+        metrica = Contador(nombre, ayuda, etiquetas)
+        self._metricas.append(metrica)
+        return metrica
+
+    def histograma(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS) -> Histograma:
+        metrica = Histograma(nombre, ayuda, etiquetas, buckets)
+        self._metricas.append(metrica)
+        return metrica
+
+    def agregar_recolector(self, recolector):
+        self._recolectores.append(recolector)
+
+    def texto(self) -> str:
+        lineas = []
+        for metrica in self._metricas:
+            lineas.extend(metrica.texto())
+        for recolector in self._recolectores:
+            try:
+                lineas.extend(recolector())
+            except Exception:
+                continue
+        return "\n".join(lineas) + "\n"
+
+
+def contadores(nombre: str, ayuda: str, etiqueta: str, valores: dict) -> list:
+    """Líneas de un contador a partir de un dict {valor de la etiqueta: número}."""
+    lineas = [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} counter"]
+    for clave, valor in valores.items():
+        if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            lineas.append(f'{nombre}{{{etiqueta}="{_escapar(clave)}"}} {_numero(valor)}')
+    return lineas
+
+
+registro = Registro()
+
+llm_segundos = registro.histograma(
+    "chatbot_llm_segundos", "Duración de las llamadas a los modelos de Ollama", ("modelo", "proposito"))
+llm_errores = registro.contador(
+    "chatbot_llm_errores_total", "Llamadas a los modelos que terminaron con error", ("modelo", "proposito"))
+bd_segundos = registro.histograma(
+    "chatbot_bd_segundos", "Duración de las consultas a MySQL", ("tabla",))
+carrito_segundos = registro.histograma(
+    "chatbot_carrito_segundos", "Duración de las operaciones sobre el carrito", ("operacion",))
+registro_segundos = registro.histograma(
+    "chatbot_registro_escritura_segundos", "Duración de cada lote escrito en conversaciones/")
+mensaje_segundos = registro.histograma(
+    "chatbot_mensaje_segundos", "Duración total de get_response", ("intencion", "rama"))
+mensajes = registro.contador(
+    "chatbot_mensajes_total", "Mensajes respondidos", ("intencion", "rama"))
+
+# =============================================================================
+# MENSAJE EN CURSO (intención y rama de get_response)
+# =============================================================================
+
+_mensaje_actual = ContextVar("mensaje_actual", default=None)
+
+
+@contextmanager
+def medir_mensaje():
+    """Mide un mensaje completo; adentro, anotar_mensaje() completa la intención y la rama."""
+    datos = {"intencion": "NINGUNA", "rama": "sin_rama"}
+    token = _mensaje_actual.set(datos)
+    inicio = time.perf_counter()
+    try:
+        yield datos
+    except BaseException:
+        datos["rama"] = "error"
+        raise
+    finally:
+        _mensaje_actual.reset(token)
+        mensaje_segundos.observar(time.perf_counter() - inicio, **datos)
+        mensajes.incrementar(**datos)
+
+
+def anotar_mensaje(**campos):
+    datos = _mensaje_actual.get()
+    if datos is not None:
+        datos.update({clave: valor for clave, valor in campos.items() if valor})
+
+# =============================================================================
+# MODELOS MEDIDOS
+# =============================================================================
+
+class ModeloMedido:
+    """
+    Envuelve un modelo (o runnable) y mide cada ainvoke. Cada llamada indica
+    su propósito con proposito=... (deteccion, ingredientes, ...); si falta,
+    se cuenta como "sin_proposito". Todo lo demás se delega en el modelo original.
+    """
+
+    def __init__(self, modelo, nombre: str):
+        self._modelo = modelo
+        self._nombre = nombre
+
+    async def ainvoke(self, *args, proposito: str = None, **kwargs):
+        proposito = proposito or "sin_proposito"
+        inicio = time.perf_counter()
+        try:
+            return await self._modelo.ainvoke(*args, **kwargs)
+        except BaseException:
+            llm_errores.incrementar(modelo=self._nombre, proposito=proposito)
+            raise
+        finally:
+            llm_segundos.observar(time.perf_counter() - inicio, modelo=self._nombre, proposito=proposito)
+
+    def __getattr__(self, nombre):
+        return getattr(self._modelo, nombre)
@@ -0,0 +1,136 @@
+# ==============================================================================
+# Modelos de Ollama: creación, conexiones y precalentamiento
+# Después de reiniciar (o de que Ollama descargue un modelo inactivo) el primer
+# cliente pagaba la carga completa de gemma3_input y gemma3_output. Al arrancar
+# se manda un prompt corto a cada modelo para dejarlo cargado, keep_alive lo
+# mantiene residente entre mensajes y cada modelo reutiliza un pool de
+# conexiones HTTP persistentes al servidor. /ready responde recién cuando
+# los dos modelos están calientes.
+# ==============================================================================
+
+import asyncio
+import os
+import re
+import time
+
+import httpx
+from langchain_ollama import OllamaLLM, ChatOllama
+from app.logs import obtener_logger
+
+log = obtener_logger("modelos")
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_MODELO_INPUT = os.getenv("OLLAMA_MODELO_INPUT", "gemma3_input:latest")
+OLLAMA_MODELO_OUTPUT = os.getenv("OLLAMA_MODELO_OUTPUT", "gemma3_output:latest")
+# Cuánto queda cargado un modelo sin uso ("30m", "2h", segundos; -1 = siempre)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Conexiones HTTP persistentes por modelo
+OLLAMA_CONEXIONES = int(os.getenv("OLLAMA_CONEXIONES", "10"))
+OLLAMA_PRECALENTAR = os.getenv("OLLAMA_PRECALENTAR", "1") == "1"
+OLLAMA_PRECALENTAR_TIMEOUT = float(os.getenv("OLLAMA_PRECALENTAR_TIMEOUT", "300"))
+# Si Ollama no respondió, se reintenta en segundo plano: la espera arranca en
+# REINTENTO segundos y se duplica en cada fallo hasta REINTENTO_MAX
+OLLAMA_PRECALENTAR_REINTENTO = float(os.getenv("OLLAMA_PRECALENTAR_REINTENTO", "5"))
+OLLAMA_PRECALENTAR_REINTENTO_MAX = float(os.getenv("OLLAMA_PRECALENTAR_REINTENTO_MAX", "120"))
+
+PROMPT_PRECALENTAMIENTO = "hola"
+
+
+def keep_alive(valor=OLLAMA_KEEP_ALIVE):
+    """Ollama acepta duraciones ("30m") o segundos como número (-1 = no descargar nunca)."""
+    valor = str(valor).strip()
+    return int(valor) if re.fullmatch(r"-?\d+", valor) else valor
+
+
+def opciones_cliente(conexiones: int = OLLAMA_CONEXIONES) -> dict:
+    """Argumentos del cliente httpx de cada modelo: conexiones que se mantienen abiertas."""
+    return {
+        "limits": httpx.Limits(
+            max_connections=conexiones,
+            max_keepalive_connections=conexiones,
+            keepalive_expiry=300,
+        ),
+    }
+
+
+def crear_modelo_input(url: str = OLLAMA_URL, modelo: str = OLLAMA_MODELO_INPUT, duracion=OLLAMA_KEEP_ALIVE):
+    return OllamaLLM(model=modelo, base_url=url, keep_alive=keep_alive(duracion), client_kwargs=opciones_cliente())
+
+
+def crear_modelo_output(url: str = OLLAMA_URL, modelo: str = OLLAMA_MODELO_OUTPUT, duracion=OLLAMA_KEEP_ALIVE):
+    return ChatOllama(model=modelo, base_url=url, keep_alive=keep_alive(duracion), client_kwargs=opciones_cliente())
+
+
+async def cerrar_clientes(*modelos):
+    """Cierra los pools de conexiones de los modelos (al apagar el servidor)."""
+    for modelo in modelos:
+        cliente = getattr(modelo, "_async_client", None)
+        if cliente is not None:
+            try:
+                await cliente.close()
+            except Exception as e:
+                log.warning("⚠️ Error cerrando el cliente de %s: %s", getattr(modelo, 'model', modelo), e)
+
+# =============================================================================
+# PRECALENTAMIENTO
+# =============================================================================
+
+class Precalentador:
+    """
+    Estado de los modelos para /ready: "frio" → "calentando" → "listo"
+    (o "error" si alguno no respondió; precalentar_con_reintentos vuelve a probar).
+    """
+
+    def __init__(self):
+        self.estado = "frio"
+        self.modelos = {}       # nombre → {"estado", "segundos"} o {"estado", "error"}
+
+    def listo(self) -> bool:
+        return self.estado == "listo"
+
+    def omitir(self):
+        """Sin precalentamiento (OLLAMA_PRECALENTAR=0): se considera listo desde el arranque."""
+        self.estado = "listo"
+
+    async def precalentar(self, modelos: dict, timeout: float = OLLAMA_PRECALENTAR_TIMEOUT) -> bool:
+        """Un prompt corto a cada modelo, todos a la vez. Devuelve True si quedaron todos cargados."""
+        self.estado = "calentando"
+
+        async def _uno(nombre, modelo):
+            inicio = time.perf_counter()
+            try:
+                await asyncio.wait_for(
+                    modelo.ainvoke(PROMPT_PRECALENTAMIENTO, options={"num_predict": 1}), timeout
+                )
+                segundos = round(time.perf_counter() - inicio, 2)
+                self.modelos[nombre] = {"estado": "listo", "segundos": segundos}
+                log.info("🔥 Modelo %s cargado en %s s", nombre, segundos)
+            except Exception as e:
+                self.modelos[nombre] = {"estado": "error", "error": str(e) or type(e).__name__}
+                log.warning("⚠️ No se pudo precalentar %s: %s", nombre, e)
+
+        await asyncio.gather(*[_uno(nombre, modelo) for nombre, modelo in modelos.items()])
+        ok = all(m["estado"] == "listo" for m in self.modelos.values())
+        self.estado = "listo" if ok else "error"
+        return ok
+
+    async def precalentar_con_reintentos(
+        self,
+        modelos: dict,
+        timeout: float = OLLAMA_PRECALENTAR_TIMEOUT,
+        espera: float = OLLAMA_PRECALENTAR_REINTENTO,
+        espera_max: float = OLLAMA_PRECALENTAR_REINTENTO_MAX,
+    ):
+        """Precalienta y, mientras falle alguno, reintenta solo esos con espera exponencial."""
+        pendientes = dict(modelos)
+        while not await self.precalentar(pendientes, timeout):
+            pendientes = {n: m for n, m in pendientes.items() if self.modelos[n]["estado"] != "listo"}
+            log.info("🔁 Reintentando precalentar %s en %s s", ", ".join(pendientes), espera)
+            await asyncio.sleep(espera)
+            espera = min(espera * 2, espera_max)
+
+    def informe(self) -> dict:
+        return {"estado": self.estado, "modelos": self.modelos}
+
+
+precalentador = Precalentador()
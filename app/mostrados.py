@@ -0,0 +1,113 @@
+# ==============================================================================
+# Productos mostrados de una sesión
+# Sigue siendo un dict término buscado → filas (lo usan las referencias y el
+# carrito), pero además lleva los productos sin repetir (por id), ordenados
+# por la última vez que se mostraron, y el texto "productos que ya se le
+# mostraron" para los prompts. Antes ese texto se rearmaba recorriendo todas
+# las listas en cada prompt, con un producto repetido por cada búsqueda que lo
+# trajo, y crecía durante toda la charla. Ahora se actualiza solo cuando se
+# muestra algo nuevo y nunca pasa del presupuesto de tokens.
+# ==============================================================================
+
+import os
+from collections import OrderedDict
+
+from app.historial import estimar_tokens
+
+# Búsquedas que se conservan (las más viejas se olvidan)
+MOSTRADOS_MAX_BUSQUEDAS = int(os.getenv("MOSTRADOS_MAX_BUSQUEDAS", "20"))
+# Productos distintos que se recuerdan para el contexto
+MOSTRADOS_MAX_PRODUCTOS = int(os.getenv("MOSTRADOS_MAX_PRODUCTOS", "40"))
+# Tokens del texto de contexto que va en los prompts
+MOSTRADOS_MAX_TOKENS = int(os.getenv("MOSTRADOS_MAX_TOKENS", "300"))
+
+ENCABEZADO = "Estos son los productos que ya se le mostraron al cliente:\n"
+
+
+def clave_producto(fila: dict):
+    return fila.get("id") or fila["producto"].lower()
+
+
+class ProductosMostrados(dict):
+    """
+    término → filas, en orden de la búsqueda más vieja a la más reciente
+    (volver a mostrar un término lo pasa al final).
+    """
+
+    def __init__(self, inicial=None, max_busquedas=MOSTRADOS_MAX_BUSQUEDAS,
+                 max_productos=MOSTRADOS_MAX_PRODUCTOS, max_tokens=MOSTRADOS_MAX_TOKENS):
+        super().__init__()
+        self.max_busquedas = max_busquedas
+        self.max_productos = max_productos
+        self.max_tokens = max_tokens
+        self._recientes = OrderedDict()    # clave → (línea, tokens); el más reciente al final
+        self._textos = {}                  # encabezado → texto ya armado
+        for termino, filas in (inicial or {}).items():
+            self[termino] = filas
+
+    def __setitem__(self, termino, filas):
+        super().pop(termino, None)
+        super().__setitem__(termino, filas)
+        while len(self) > self.max_busquedas:
+            super().__delitem__(next(iter(self)))
+        self._registrar(filas)
+
+    def __delitem__(self, termino):
+        super().__delitem__(termino)
+        self._reconstruir()
+
+    def pop(self, termino, *defecto):
+        resultado = super().pop(termino, *defecto)
+        self._reconstruir()
+        return resultado
+
+    def update(self, *args, **kwargs):
+        for termino, filas in dict(*args, **kwargs).items():
+            self[termino] = filas
+
+    def setdefault(self, termino, filas=None):
+        if termino not in self:
+            self[termino] = filas if filas is not None else []
+        return self[termino]
+
+    def _registrar(self, filas):
+        for fila in filas or []:
+            clave = clave_producto(fila)
+            entrada = self._recientes.pop(clave, None)
+            if entrada is None:
+                linea = f"- {fila['producto']}\n"
+                entrada = (linea, estimar_tokens(linea))
+            self._recientes[clave] = entrada
+        while len(self._recientes) > self.max_productos:
+            self._recientes.popitem(last=False)
+        self._textos.clear()
+
+    def _reconstruir(self):
+        self._recientes.clear()
+        self._textos.clear()
+        for filas in self.values():
+            self._registrar(filas)
+
+    def texto(self, encabezado: str = ENCABEZADO) -> str:
+        """Productos distintos, del más reciente al más viejo, hasta el presupuesto de tokens."""
+        texto = self._textos.get(encabezado)
+        if texto is None:
+            lineas, total = [], estimar_tokens(encabezado)
+            for linea, tokens in reversed(self._recientes.values()):
+                if total + tokens > self.max_tokens:
+                    break
+                lineas.append(linea)
+                total += tokens
+            texto = self._textos[encabezado] = encabezado + "".join(lineas) if lineas else ""
+        return texto
+
+    def cantidad_productos(self) -> int:
+        return len(self._recientes)
+
+
+def productos_mostrados_de(session_data: dict) -> ProductosMostrados:
+    """Los datos restaurados de disco o de otro worker traen un dict común: se convierte una vez."""
+    mostrados = session_data.get("productos_mostrados")
+    if not isinstance(mostrados, ProductosMostrados):
+        mostrados = session_data["productos_mostrados"] = ProductosMostrados(mostrados)
+    return mostrados
@@ -1,110 +1,229 @@
-# Diccionario global que guarda los pedidos activos por sesión
-pedidos_por_cliente = {}
+from decimal import Decimal
 
-def agregar_a_pedido(session_id: str, producto: str, cantidad: int, precio_unitario: float) -> str:
-    from decimal import Decimal
+from app.catalogo import normalizar_texto
+from app.gestor_sesiones import gestor_sesiones
+from app.logs import obtener_logger
+from app.metricas import carrito_segundos
 
-    if session_id not in pedidos_por_cliente:
-        pedidos_por_cliente[session_id] = []
+log = obtener_logger("pedidos")
 
-    pedido = pedidos_por_cliente[session_id]
+# =============================================================================
+# PEDIDO (carrito de una sesión)
+# =============================================================================
 
-    # Buscar si el producto ya está en el pedido
-    producto_existente = next((p for p in pedido if p["producto"].lower() == producto.lower()), None)
+def _decimal(valor) -> Decimal:
+    # str() evita arrastrar el error binario de un float (1.1 → 1.1000000000000000888)
+    return valor if isinstance(valor, Decimal) else Decimal(str(valor))
 
-    if producto_existente:
-        # Si ya existe, sumar la cantidad
-        producto_existente["cantidad"] += cantidad
-        producto_existente["subtotal"] = float(Decimal(producto_existente["precio_unitario"]) * producto_existente["cantidad"])
-        total_actual = sum(p["subtotal"] for p in pedido)
-        mensaje = f"🛒 Se actualizaron las unidades de {producto} (ahora x{producto_existente['cantidad']}). Total: ${int(total_actual)}"
 
+class LineaPedido:
+    __slots__ = ("clave", "producto_id", "producto", "cantidad", "precio_unitario", "subtotal")
+
+    def __init__(self, clave, producto_id, producto: str, cantidad: int, precio_unitario: Decimal):
+        self.clave = clave
+        self.producto_id = producto_id
+        self.producto = producto
+        self.cantidad = cantidad
+        self.precio_unitario = precio_unitario
+        self.subtotal = precio_unitario * cantidad
+
+
+class Pedido:
+    """
+    Líneas indexadas por id de producto (o por nombre normalizado si no hay id)
+    y un total que se actualiza en cada cambio, en Decimal. Agregar, quitar y
+    buscar una línea no recorren el pedido.
+    """
+
+    __slots__ = ("_lineas", "_por_nombre", "total")
+
+    def __init__(self):
+        self._lineas = {}        # clave → LineaPedido (en orden de llegada)
+        self._por_nombre = {}    # nombre normalizado → clave
+        self.total = Decimal("0")
+
+    def __len__(self):
+        return len(self._lineas)
+
+    def __iter__(self):
+        return iter(self._lineas.values())
+
+    def buscar(self, producto: str):
+        clave = self._por_nombre.get(normalizar_texto(producto))
+        return self._lineas.get(clave) if clave is not None else None
+
+    def agregar(self, producto: str, cantidad: int, precio_unitario, producto_id=None) -> LineaPedido:
+        """Agrega unidades; si el producto ya está, suma la cantidad. Devuelve la línea."""
+        nombre = normalizar_texto(producto)
+        clave = self._por_nombre.get(nombre)
+        if clave is None:
+            clave = producto_id if producto_id is not None else nombre
+        linea = self._lineas.get(clave)
+
+        if linea is None:
+            linea = self._lineas[clave] = LineaPedido(clave, producto_id, producto, cantidad, _decimal(precio_unitario))
+            self._por_nombre[nombre] = clave
+            self.total += linea.subtotal
+        else:
+            linea.cantidad += cantidad
+            agregado = linea.precio_unitario * cantidad
+            linea.subtotal += agregado
+            self.total += agregado
+        return linea
+
+    def quitar(self, producto: str, cantidad: int):
+        """
+        Quita unidades de un producto. Devuelve las unidades que quedan
+        (0 si la línea se eliminó) o None si el producto no estaba.
+        """
+        linea = self.buscar(producto)
+        if linea is None:
+            return None
+        if cantidad < linea.cantidad:
+            linea.cantidad -= cantidad
+            quitado = linea.precio_unitario * cantidad
+            linea.subtotal -= quitado
+            self.total -= quitado
+            return linea.cantidad
+        del self._lineas[linea.clave]
+        del self._por_nombre[normalizar_texto(linea.producto)]
+        self.total -= linea.subtotal
+        return 0
+
+    def agregar_varios(self, items) -> list:
+        """items: (producto, cantidad, precio_unitario[, producto_id]) — devuelve las líneas."""
+        return [self.agregar(*item) for item in items]
+
+    def quitar_varios(self, items) -> list:
+        """items: (producto, cantidad) — devuelve lo que devolvió quitar() para cada uno."""
+        return [self.quitar(producto, cantidad) for producto, cantidad in items]
+
+    def vaciar(self):
+        self._lineas.clear()
+        self._por_nombre.clear()
+        self.total = Decimal("0")
+
+    # --- serialización compacta: [[id, producto, cantidad, "precio"], ...] ---
+
+    def a_lista(self) -> list:
+        return [[l.producto_id, l.producto, l.cantidad, str(l.precio_unitario)] for l in self._lineas.values()]
+
+    @classmethod
+    def desde_lista(cls, datos) -> "Pedido":
+        pedido = cls()
+        for producto_id, producto, cantidad, precio in datos:
+            pedido.agregar(producto, cantidad, Decimal(precio), producto_id)
+        return pedido
+
+
+# Diccionario global que guarda los pedidos activos por sesión (session_id → Pedido)
+# (lo administra el gestor de sesiones, que desaloja y guarda en disco los inactivos)
+pedidos_por_cliente = gestor_sesiones.pedidos
+gestor_sesiones.fabrica_pedido = Pedido.desde_lista
+
+
+def _pedido(session_id: str) -> Pedido:
+    pedido = pedidos_por_cliente.get(session_id)
+    if pedido is None:
+        # setdefault es atómico: dos hilos no pueden crear dos pedidos para la misma sesión
+        pedido = pedidos_por_cliente.setdefault(session_id, Pedido())
+    return pedido
+
+
+@carrito_segundos.medido(operacion="agregar")
+def agregar_a_pedido(session_id: str, producto: str, cantidad: int, precio_unitario, producto_id=None) -> str:
+    pedido = _pedido(session_id)
+    lineas_antes = len(pedido)
+    linea = pedido.agregar(producto, cantidad, precio_unitario, producto_id)
+
+    if len(pedido) == lineas_antes:
+        # Si ya existe, se sumó la cantidad
+        mensaje = f"🛒 Se actualizaron las unidades de {producto} (ahora x{linea.cantidad}). Total: ${int(pedido.total)}"
     else:
-        # Si no existe, agregarlo nuevo
-        subtotal = float(Decimal(precio_unitario) * cantidad)
-        pedido.append({
-            "producto": producto,
-            "cantidad": cantidad,
-            "precio_unitario": float(precio_unitario),
-            "subtotal": subtotal
-        })
-        total_actual = sum(p["subtotal"] for p in pedido)
-        mensaje = f"🛒 Agregué {cantidad} {producto} al pedido. (Total: ${int(total_actual)}), cuando quieras finalizar tu pedido me avisas 😊"
-
-    print(f"✅ Pedido actualizado!({session_id})")
+        mensaje = f"🛒 Agregué {cantidad} {producto} al pedido. (Total: ${int(pedido.total)}), cuando quieras finalizar tu pedido me avisas 😊"
+
+    log.debug("✅ Pedido actualizado!(%s)", session_id)
     return mensaje
 
 
-def quitar_de_pedido(session_id: str, producto: str, cantidad: int) -> str:
-    from decimal import Decimal
+@carrito_segundos.medido(operacion="agregar_varios")
+def agregar_varios_a_pedido(session_id: str, items) -> str:
+    """items: (producto, cantidad, precio_unitario[, producto_id]). Una sola operación y un solo mensaje."""
+    pedido = _pedido(session_id)
+    lineas = pedido.agregar_varios(items)
 
-    if session_id not in pedidos_por_cliente or not pedidos_por_cliente[session_id]:
-        return "Todavía no tenés productos en tu pedido 😕"
+    detalle = "\n".join(
+        f"• {item[1]} {linea.producto}" + (f" (ahora x{linea.cantidad})" if linea.cantidad != item[1] else "")
+        for item, linea in zip(items, lineas)
+    )
+    log.debug("✅ Pedido actualizado con %s producto(s)!(%s)", len(lineas), session_id)
+    return (
+        f"🛒 Agregué al pedido:\n{detalle}\n\n"
+        f"(Total: ${int(pedido.total)}), cuando quieras finalizar tu pedido me avisas 😊"
+    )
 
-    pedido = pedidos_por_cliente[session_id]
-    producto_existente = next((p for p in pedido if p["producto"].lower() == producto.lower()), None)
 
-    if not producto_existente:
-        return f"No encontré {producto} en tu pedido 😕"
+@carrito_segundos.medido(operacion="quitar")
+def quitar_de_pedido(session_id: str, producto: str, cantidad: int) -> str:
+    pedido = pedidos_por_cliente.get(session_id)
+    if not pedido:
+        return "Todavía no tenés productos en tu pedido 😕"
 
-    # Si la cantidad a quitar es menor a la actual
-    if cantidad < producto_existente["cantidad"]:
-        producto_existente["cantidad"] -= cantidad
-        producto_existente["subtotal"] = float(Decimal(producto_existente["precio_unitario"]) * producto_existente["cantidad"])
-        total_actual = sum(p["subtotal"] for p in pedido)
-        mensaje = f"🧺 Quité {cantidad} {producto} (quedan x{producto_existente['cantidad']}). Total: ${int(total_actual)}"
+    quedan = pedido.quitar(producto, cantidad)
+    if quedan is None:
+        return f"No encontré {producto} en tu pedido 😕"
 
+    if quedan:
+        mensaje = f"🧺 Quité {cantidad} {producto} (quedan x{quedan}). Total: ${int(pedido.total)}"
+    elif pedido:
+        mensaje = f"🧺 Eliminé {producto} del pedido. Total: ${int(pedido.total)}"
     else:
-        # Si la cantidad es igual o mayor, eliminar el producto directamente
-        pedido.remove(producto_existente)
-        total_actual = sum(p["subtotal"] for p in pedido)
-        if total_actual > 0:
-            mensaje = f"🧺 Eliminé {producto} del pedido. Total: ${int(total_actual)}"
-        else:
-            mensaje = "🧺 Eliminé el último producto, tu pedido quedó vacío."
+        mensaje = "🧺 Eliminé el último producto, tu pedido quedó vacío."
 
-    print(f"✅ Producto quitado del pedido ({session_id})")
+    log.debug("✅ Producto quitado del pedido (%s)", session_id)
     return mensaje
 
 
 
+@carrito_segundos.medido(operacion="mostrar")
 def mostrar_pedido(session_id: str) -> str:
-    if session_id not in pedidos_por_cliente or not pedidos_por_cliente[session_id]:
+    pedido = pedidos_por_cliente.get(session_id)
+    if not pedido:
         return None
 
-    items = pedidos_por_cliente[session_id]
-    total = sum(i["subtotal"] for i in items)
-
     listado = "\n".join([
-        f"{i['producto']} ${int(i['precio_unitario'])} ({i['cantidad']}) : ${int(i['subtotal'])}"
-        for i in items
+        f"{i.producto} ${int(i.precio_unitario)} ({i.cantidad}) : ${int(i.subtotal)}"
+        for i in pedido
     ])
 
     return (
         f"🧺 Actualmente tu pedido tiene:\n\n"
         f"{listado}\n\n"
-        f"🧾 Total: ${int(total)}\n"
+        f"🧾 Total: ${int(pedido.total)}\n"
 
     )
 
 
 
+@carrito_segundos.medido(operacion="vaciar")
 def vaciar_pedido(session_id: str) -> str:
-    if session_id not in pedidos_por_cliente or not pedidos_por_cliente[session_id]:
+    pedido = pedidos_por_cliente.get(session_id)
+    if not pedido:
         return "todavía no agregaste productos a tu pedido 😕"
 
-    pedidos_por_cliente[session_id] = []
-    print(f"Pedido vaciado ({session_id})")
+    pedido.vaciar()
+    log.debug("Pedido vaciado (%s)", session_id)
     return "Vacié tu pedido. Podés empezar un nuevo pedido cuando quieras. 🧺"
 
 
 
 
+@carrito_segundos.medido(operacion="finalizar")
 def finalizar_pedido(session_id: str, datos_cliente: str, numero_cliente: str, nombre_cliente: str = "Cliente sin nombre") -> str:
     import requests
     from app.pedidos import mostrar_pedido
 
-    if session_id not in pedidos_por_cliente or not pedidos_por_cliente[session_id]:
+    if not pedidos_por_cliente.get(session_id):
         return "Todavía no tenés ningún producto en tu pedido 😕"
 
     # Obtener resumen limpio del pedido (modo final)
@@ -128,11 +247,11 @@ def finalizar_pedido(session_id: str, datos_cliente: str, numero_cliente: str, n
         url = "http://localhost:3000/enviar-mensaje"
         payload = {"numero": "5491162195267", "mensaje": mensaje}  # número del encargado
         requests.post(url, json=payload)
-        print("📤 Pedido enviado correctamente al encargado.")
+        log.debug("📤 Pedido enviado correctamente al encargado.")
     except Exception as e:
-        print(f"⚠️ Error enviando pedido al encargado: {e}")
+        log.warning("⚠️ Error enviando pedido al encargado: %s", e)
         return "Hubo un problema al enviar el pedido al encargado 😕. Intentá de nuevo más tarde."
 
-    pedidos_por_cliente[session_id] = []
-    print(f"Pedido finalizado ({session_id})")
+    pedidos_por_cliente[session_id].vaciar()
+    log.debug("Pedido finalizado (%s)", session_id)
     return "Perfecto 👍 Tu pedido fue confirmado en breve se van a comunicar con vos para coordinar la entrega 🚚"
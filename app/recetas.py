@@ -0,0 +1,144 @@
+# ==============================================================================
+# Base de conocimiento de comidas → ingredientes
+# Guarda lo que la IA respondió sobre cada plato (incluido "no es una comida")
+# para que una consulta repetida por pizza, empanadas o torta no vuelva a
+# llamar al modelo. Arranca con platos comunes y se persiste en un JSON, que
+# escribe un hilo aparte para no frenar el event loop.
+# ==============================================================================
+
+import json
+import os
+import threading
+
+from app.catalogo import normalizar_texto
+from app.logs import obtener_logger
+
+log = obtener_logger("recetas")
+
+RECETAS_ARCHIVO = os.getenv(
+    "RECETAS_ARCHIVO",
+    os.path.join(os.path.dirname(__file__), "..", "recetas_aprendidas.json"),
+)
+# Segundos que se esperan para juntar en una sola escritura las recetas aprendidas seguidas
+RECETAS_DEMORA_GUARDADO = float(os.getenv("RECETAS_DEMORA_GUARDADO", "1"))
+
+# Platos frecuentes (mismos términos que se le piden a la IA: manteca, choclo, etc.)
+RECETAS_BASE = {
+    "pizza": ["harina", "levadura", "queso", "tomate", "aceite"],
+    "torta": ["harina", "azúcar", "huevos", "manteca", "leche", "polvo de hornear"],
+    "empanada": ["harina", "carne", "cebolla", "huevo", "aceitunas"],
+    "sandwich": ["pan", "jamón", "queso", "mayonesa", "lechuga"],
+    "ensalada": ["lechuga", "tomate", "zanahoria", "aceite", "sal"],
+    "hamburguesa": ["carne", "pan", "lechuga", "tomate", "queso", "mayonesa"],
+    "milanesa": ["carne", "huevo", "pan rallado", "aceite"],
+    "fideos con tuco": ["fideos", "tomate", "cebolla", "aceite"],
+    "guiso": ["carne", "papa", "zanahoria", "cebolla", "arroz"],
+    "tarta de verdura": ["harina", "acelga", "huevo", "queso", "cebolla"],
+    "panqueques": ["harina", "leche", "huevo", "manteca"],
+    "flan": ["leche", "huevos", "azúcar"],
+    "ñoquis": ["papa", "harina", "huevo", "queso"],
+    "arroz con pollo": ["arroz", "pollo", "cebolla", "morrón", "caldo"],
+}
+
+
+def normalizar_plato(nombre: str) -> str:
+    return normalizar_texto(nombre).strip(" ?!.¿¡")
+
+
+def _variantes(clave: str) -> list:
+    """La clave tal cual y las posibles formas en singular de la primera palabra."""
+    primera, _, resto = clave.partition(" ")
+    variantes = [clave]
+    if len(primera) > 3 and primera.endswith("s"):
+        variantes.append(" ".join(filter(None, [primera[:-1], resto])))
+        if primera.endswith("es"):
+            variantes.append(" ".join(filter(None, [primera[:-2], resto])))
+    return variantes
+
+
+class BaseRecetas:
+    """
+    Diccionario plato → {"es_comida": bool, "ingredientes": [...]}.
+    `registrar` solo actualiza la memoria; un hilo escribe lo aprendido en un
+    archivo temporal y lo reemplaza de una vez, para no dejar el JSON a medio
+    escribir si el proceso se corta.
+    """
+
+    def __init__(self, archivo: str = RECETAS_ARCHIVO, base: dict = RECETAS_BASE, demora: float = RECETAS_DEMORA_GUARDADO):
+        self.archivo = archivo
+        self.demora = demora
+        self._lock = threading.Lock()
+        self._pendiente = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+        self._recetas = {
+            normalizar_plato(plato): {"es_comida": True, "ingredientes": list(ingredientes)}
+            for plato, ingredientes in base.items()
+        }
+        self._aprendidas = {}
+        self._cargar()
+
+    def _cargar(self):
+        if not self.archivo or not os.path.exists(self.archivo):
+            return
+        try:
+            with open(self.archivo, "r", encoding="utf-8") as f:
+                self._aprendidas = json.load(f)
+            self._recetas.update(self._aprendidas)
+        except (OSError, ValueError) as e:
+            log.warning("⚠️ No se pudo leer %s: %s", self.archivo, e)
+
+    def _guardar(self):
+        if not self.archivo:
+            return
+        with self._lock:
+            texto = json.dumps(self._aprendidas, ensure_ascii=False, indent=2)
+        temporal = f"{self.archivo}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(texto)
+        os.replace(temporal, self.archivo)
+
+    def _loop(self):
+        while True:
+            self._pendiente.wait()
+            self._detener.wait(self.demora)     # junta las recetas que llegan seguidas
+            self._pendiente.clear()
+            try:
+                self._guardar()
+            except OSError as e:
+                log.warning("⚠️ No se pudieron guardar las recetas aprendidas: %s", e)
+            if self._detener.is_set() and not self._pendiente.is_set():
+                return
+
+    def cerrar(self):
+        """Escribe lo pendiente y termina el hilo (al apagar el servidor)."""
+        self._detener.set()
+        if self._hilo is not None and self._hilo.is_alive():
+            self._pendiente.set()
+            self._hilo.join()
+
+    def obtener(self, plato: str):
+        """Devuelve la entrada conocida para el plato (o su singular), o None."""
+        for clave in _variantes(normalizar_plato(plato)):
+            if clave in self._recetas:
+                return self._recetas[clave]
+        return None
+
+    def registrar(self, plato: str, ingredientes: list):
+        self._registrar(plato, {"es_comida": True, "ingredientes": list(ingredientes)})
+
+    def registrar_no_comida(self, plato: str):
+        self._registrar(plato, {"es_comida": False, "ingredientes": []})
+
+    def _registrar(self, plato: str, entrada: dict):
+        clave = normalizar_plato(plato)
+        with self._lock:
+            self._recetas[clave] = entrada
+            self._aprendidas[clave] = entrada
+            self._pendiente.set()
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._loop, name="guardado-recetas", daemon=True)
+                self._hilo.start()
+
+
+base_recetas = BaseRecetas()
@@ -0,0 +1,241 @@
+# ==============================================================================
+# Resolución local de referencias a productos ya mostrados
+# "el de litro", "el de 900", "el más barato", "el primero", "el de girasol":
+# el tamaño sale del nombre o la descripción del producto y el precio de
+# precio_venta, así que no hace falta preguntarle a la IA. Solo cuando quedan
+# varios candidatos igual de válidos se recurre a comparar_con_producto_mostrado.
+# ==============================================================================
+
+import re
+from decimal import Decimal, InvalidOperation
+from fractions import Fraction
+
+from app.catalogo import normalizar_texto
+
+# Normalización de unidades escritas con palabras (misma tabla que usaba el prompt)
+NORMALIZACIONES = [(re.compile(patron), reemplazo) for patron, reemplazo in {
+    r"\bmedio litro\b": "500ml",
+    r"\bmedio kilo\b": "500g",
+    r"\bmedia docena\b": "6 unidades",
+    r"\bun litro\b": "1l",
+    r"\bdos litros\b": "2l",
+    r"\btres litros\b": "3l",
+    r"\bcuatro litros\b": "4l",
+    r"\bquinientos gramos\b": "500g",
+    r"\bun kilo\b": "1kg",
+    r"\bdos kilos\b": "2kg",
+    r"\btres kilos\b": "3kg",
+    r"\bcuatro kilos\b": "4kg",
+    r"\bmedio paquete\b": "1/2 paquete",
+}.items()]
+
+# unidad → (dimensión, factor a la unidad base: ml, g o unidades)
+UNIDADES = {
+    "ml": ("volumen", 1), "cc": ("volumen", 1), "cm3": ("volumen", 1),
+    "l": ("volumen", 1000), "lt": ("volumen", 1000), "lts": ("volumen", 1000),
+    "litro": ("volumen", 1000), "litros": ("volumen", 1000),
+    "g": ("peso", 1), "gr": ("peso", 1), "grs": ("peso", 1), "gramo": ("peso", 1), "gramos": ("peso", 1),
+    "kg": ("peso", 1000), "kilo": ("peso", 1000), "kilos": ("peso", 1000),
+    "u": ("unidades", 1), "un": ("unidades", 1), "unid": ("unidades", 1),
+    "unidad": ("unidades", 1), "unidades": ("unidades", 1),
+}
+_UNIDAD = "|".join(sorted(UNIDADES, key=len, reverse=True))
+_NUMERO = r"\d+(?:[.,]\d+)?|\d+/\d+"
+
+_CANTIDAD_CON_UNIDAD = re.compile(rf"(?<![\w.,/])({_NUMERO})\s*({_UNIDAD})\b")
+_PACK = re.compile(r"\b(?:x|pack(?: de)?|por)\s*(\d+)\b")
+# "el de litro", "el de kilo": unidad sin número = 1
+_UNIDAD_SOLA = re.compile(r"\b(?:de|del|el|la|x)\s+(litro|kilo|gramo)s?\b")
+# "el de 900": número suelto después de "de"
+_NUMERO_SUELTO = re.compile(rf"\bde\s+({_NUMERO})\b(?!\s*(?:{_UNIDAD})\b)")
+
+# "°" no es un carácter de palabra: después de "2°" no hay \b al final ni antes de un espacio.
+# "2º" (ordinal masculino) queda "2o" al normalizar.
+ORDINALES = [
+    (re.compile(r"\b(?:el|la)?\s*(?:(?:primer[oa]?|1r[oa])\b|1[°o](?!\w))"), 0),
+    (re.compile(r"\b(?:el|la)?\s*(?:(?:segund[oa]|2d[oa])\b|2[°o](?!\w))"), 1),
+    (re.compile(r"\b(?:el|la)?\s*(?:(?:tercer[oa]?|3r[oa])\b|3[°o](?!\w))"), 2),
+    (re.compile(r"\b(?:el|la)?\s*(?:(?:cuart[oa]|4t[oa])\b|4[°o](?!\w))"), 3),
+    (re.compile(r"\b(?:el|la)?\s*(?:(?:quint[oa]|5t[oa])\b|5[°o](?!\w))"), 4),
+    (re.compile(r"\b(?:anteultim[oa])\b"), -2),
+    (re.compile(r"\b(?:ultim[oa])\b"), -1),
+]
+
+# (patrón, criterio, sentido): sentido 1 = mayor, -1 = menor
+SUPERLATIVOS = [
+    (re.compile(r"\bmas\s+(?:barat[oa]s?|economic[oa]s?)\b|\b(?:menor|menos)\s+precio\b"), "precio", -1),
+    (re.compile(r"\bmas\s+car[oa]s?\b|\bmayor\s+precio\b"), "precio", 1),
+    (re.compile(r"\bmas\s+(?:grande|cantidad|litros|kilos)s?\b|\bde\s+mas\b|\bmayor\b"), "tamanio", 1),
+    (re.compile(r"\bmas\s+(?:chic[oa]|pequen[oa]|petis[oa])s?\b|\bde\s+menos\b|\bmenor\b"), "tamanio", -1),
+]
+
+# Palabras que no sirven para elegir un producto por nombre
+_VACIAS = {
+    "el", "la", "los", "las", "de", "del", "un", "una", "ese", "esa", "eso", "esos", "esas",
+    "este", "esta", "estos", "estas", "mas", "que", "cual", "me", "lo", "le", "al", "con", "por",
+    "quiero", "quisiera", "prefiero", "dame", "agregame", "agrega", "agregar", "sumame", "suma",
+    "poneme", "pone", "ponele", "mandame", "traeme", "anotame", "llevo", "llevame", "tenes", "hay",
+    "dale", "bueno", "listo", "mejor", "entonces", "favor", "porfa", "gracias", "mismo", "misma",
+    "otro", "otra", "pedido", "carrito", "unidad", "unidades", "paquete", "botella", "envase",
+}
+
+
+def normalizar_referencia(texto: str) -> str:
+    texto = texto.lower()
+    for patron, reemplazo in NORMALIZACIONES:
+        texto = patron.sub(reemplazo, texto)
+    return normalizar_texto(texto)
+
+
+def _numero(texto: str):
+    try:
+        if "/" in texto:
+            return Fraction(texto)
+        return Fraction(Decimal(texto.replace(",", ".")))
+    except (InvalidOperation, ValueError, ZeroDivisionError):
+        return None
+
+
+def parsear_presentacion(texto: str):
+    """
+    Tamaño de un producto a partir de su nombre o descripción:
+    "Aceite Natura 900ml" → ("volumen", 900), "Agua x6 1.5L" → ("volumen", 9000).
+    Devuelve None si no hay tamaño.
+    """
+    if not texto:
+        return None
+    texto = normalizar_referencia(texto)
+    encontrado = _CANTIDAD_CON_UNIDAD.search(texto)
+    if not encontrado:
+        return None
+    dimension, factor = UNIDADES[encontrado.group(2)]
+    cantidad = _numero(encontrado.group(1))
+    if cantidad is None:
+        return None
+    pack = _PACK.search(texto)
+    if pack and dimension != "unidades":
+        cantidad *= int(pack.group(1))
+    return dimension, cantidad * factor
+
+
+def presentacion_de(fila: dict):
+    return parsear_presentacion(fila.get("producto", "")) or parsear_presentacion(fila.get("descripcion") or "")
+
+
+def _presentacion_pedida(texto: str):
+    """Tamaño mencionado por el cliente ("el de 1l", "el de litro", "el de 900")."""
+    con_unidad = parsear_presentacion(texto)
+    if con_unidad and con_unidad[0] != "unidades":    # "2 unidades" es la cantidad a agregar
+        return con_unidad
+    sola = _UNIDAD_SOLA.search(texto)
+    if sola:
+        dimension, factor = UNIDADES[sola.group(1)]
+        return dimension, Fraction(factor)
+    suelto = _NUMERO_SUELTO.search(texto)
+    if suelto:
+        return None, _numero(suelto.group(1))
+    return None
+
+
+def _coincide_tamanio(fila: dict, pedido) -> bool:
+    propio = presentacion_de(fila)
+    if propio is None:
+        return False
+    dimension, cantidad = pedido
+    if dimension is not None:
+        return propio == (dimension, cantidad)
+    # Número sin unidad: vale en la unidad del producto (900 → 900ml) o en ml/g (1 → 1l/1kg)
+    return cantidad in (propio[1], propio[1] / 1000)
+
+
+def _sin_referencias(texto: str) -> str:
+    """El texto sin ordinales, superlativos ni tamaños: lo que queda puede ser un nombre."""
+    for patron in [p for p, _ in ORDINALES] + [p for p, _, _ in SUPERLATIVOS]:
+        texto = patron.sub(" ", texto)
+    for patron in (_CANTIDAD_CON_UNIDAD, _UNIDAD_SOLA, _NUMERO_SUELTO):
+        texto = patron.sub(" ", texto)
+    return texto
+
+
+def _por_nombre(texto: str, candidatos: list):
+    """Candidatos cuyo nombre contiene todas las palabras útiles del texto, o None si no nombra nada."""
+    palabras = [p for p in _sin_referencias(texto).split() if p not in _VACIAS and not p[0].isdigit() and len(p) > 2]
+    if not palabras:
+        return None
+    filtrados = [c for c in candidatos if all(p in normalizar_texto(c["producto"]) for p in palabras)]
+    return filtrados or None
+
+
+def _extremo(candidatos: list, clave, sentido: int) -> list:
+    valores = [(clave(c), c) for c in candidatos]
+    valores = [(v, c) for v, c in valores if v is not None]
+    if not valores:
+        return []
+    objetivo = max(v for v, _ in valores) if sentido > 0 else min(v for v, _ in valores)
+    return [c for v, c in valores if v == objetivo]
+
+
+def _tamanio(fila):
+    presentacion = presentacion_de(fila)
+    return presentacion[1] if presentacion else None
+
+
+def resolver_referencia(texto: str, listas: list):
+    """
+    Busca a qué producto ya mostrado se refiere el cliente.
+    `listas` son las listas de productos mostrados, de la más vieja a la más reciente.
+    Devuelve (fila, "resuelto"), (None, "ambiguo") con los candidatos que quedan
+    en el tercer elemento, o (None, "sin_referencia") si el texto no elige nada.
+    """
+    texto = normalizar_referencia(texto)
+    ultima = listas[-1] if listas else []
+    todos, vistos = [], set()
+    for lista in reversed(listas):
+        for fila in lista:
+            clave = fila.get("id", fila["producto"])
+            if clave not in vistos:
+                vistos.add(clave)
+                todos.append(fila)
+    if not todos:
+        return None, "sin_referencia", []
+
+    # 1) Ordinal: sobre la última lista mostrada
+    for patron, posicion in ORDINALES:
+        if patron.search(texto) and ultima:
+            if -len(ultima) <= posicion < len(ultima):
+                return ultima[posicion], "resuelto", []
+            return None, "ambiguo", ultima
+
+    # Los candidatos se acotan por las palabras del producto que nombró ("el aceite más barato")
+    candidatos = _por_nombre(texto, todos)
+    hay_nombre = candidatos is not None
+    if not hay_nombre:
+        candidatos = ultima or todos
+
+    # 2) Superlativo de precio o tamaño
+    for patron, criterio, sentido in SUPERLATIVOS:
+        if patron.search(texto):
+            if criterio == "precio":
+                elegidos = _extremo(candidatos, lambda f: f.get("precio_venta"), sentido)
+            else:
+                dimensiones = {p[0] for p in map(presentacion_de, candidatos) if p}
+                elegidos = _extremo(candidatos, _tamanio, sentido) if len(dimensiones) == 1 else []
+            if len(elegidos) == 1:
+                return elegidos[0], "resuelto", []
+            return None, "ambiguo", elegidos or candidatos
+
+    # 3) Tamaño pedido ("el de 900", "el de litro")
+    pedido = _presentacion_pedida(texto)
+    if pedido:
+        elegidos = [c for c in (candidatos if hay_nombre else todos) if _coincide_tamanio(c, pedido)]
+        if len(elegidos) == 1:
+            return elegidos[0], "resuelto", []
+        return None, "ambiguo", elegidos or candidatos
+
+    # 4) Solo por nombre ("el de girasol")
+    if hay_nombre:
+        if len(candidatos) == 1:
+            return candidatos[0], "resuelto", []
+        return None, "ambiguo", candidatos
+
+    return None, "sin_referencia", []
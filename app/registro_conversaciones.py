@@ -0,0 +1,203 @@
+# ==============================================================================
+# Escritura de las conversaciones en segundo plano
+# process_message ya no abre conversaciones/<sesión>.txt: deja la línea en una
+# cola acotada y un hilo la escribe en lotes agrupados por archivo, con los
+# archivos abiertos en un caché LRU, fsync periódico y rotación por tamaño.
+# El formato de las líneas no cambia.
+# ==============================================================================
+
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from app.logs import obtener_logger
+from app.metricas import registro_segundos
+
+log = obtener_logger("registro_conversaciones")
+
+REGISTRO_COLA_MAX = int(os.getenv("REGISTRO_COLA_MAX", "10000"))
+REGISTRO_LOTE_MAX = int(os.getenv("REGISTRO_LOTE_MAX", "500"))
+REGISTRO_ARCHIVOS_ABIERTOS = int(os.getenv("REGISTRO_ARCHIVOS_ABIERTOS", "64"))
+# "siempre" = fsync después de cada lote, "periodico" = cada REGISTRO_FSYNC_SEGUNDOS, "nunca"
+REGISTRO_FSYNC = os.getenv("REGISTRO_FSYNC", "periodico")
+REGISTRO_FSYNC_SEGUNDOS = float(os.getenv("REGISTRO_FSYNC_SEGUNDOS", "5"))
+# Al superar este tamaño el archivo pasa a <archivo>.1 (0 = sin rotación)
+REGISTRO_MAX_BYTES = int(os.getenv("REGISTRO_MAX_BYTES", str(5 * 1024 * 1024)))
+REGISTRO_ROTACIONES = int(os.getenv("REGISTRO_ROTACIONES", "3"))
+
+_FIN = object()
+
+
+class EscritorConversaciones:
+    """
+    `registrar` nunca bloquea: si la cola está llena la línea se descarta y se
+    cuenta en las métricas, para que un disco lento no demore la respuesta al cliente.
+    """
+
+    def __init__(
+        self,
+        max_cola: int = REGISTRO_COLA_MAX,
+        max_lote: int = REGISTRO_LOTE_MAX,
+        max_abiertos: int = REGISTRO_ARCHIVOS_ABIERTOS,
+        fsync: str = REGISTRO_FSYNC,
+        fsync_segundos: float = REGISTRO_FSYNC_SEGUNDOS,
+        max_bytes: int = REGISTRO_MAX_BYTES,
+        rotaciones: int = REGISTRO_ROTACIONES,
+    ):
+        self.max_lote = max_lote
+        self.max_abiertos = max_abiertos
+        self.fsync = fsync
+        self.fsync_segundos = fsync_segundos
+        self.max_bytes = max_bytes
+        self.rotaciones = rotaciones
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._abiertos = OrderedDict()     # ruta → archivo abierto en modo "a"
+        self._sin_fsync = set()
+        self._ultimo_fsync = time.monotonic()
+        self._hilo = None
+        self._lock = threading.Lock()
+        self.metricas = {"lineas_escritas": 0, "lotes": 0, "descartadas": 0, "rotaciones": 0, "errores": 0}
+
+    # -------------------------------------------------------------------------
+    # Lado de la API (no bloqueante)
+    # -------------------------------------------------------------------------
+
+    def registrar(self, ruta: str, linea: str):
+        self.iniciar()
+        try:
+            self._cola.put_nowait((ruta, linea))
+        except queue.Full:
+            self.metricas["descartadas"] += 1
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._hilo and self._hilo.is_alive():
+                return
+            self._hilo = threading.Thread(target=self._loop, name="registro-conversaciones", daemon=True)
+            self._hilo.start()
+
+    def esperar(self):
+        """Bloquea hasta que todo lo encolado esté escrito (para pruebas y el cierre)."""
+        self._cola.join()
+
+    def cerrar(self):
+        """Escribe lo pendiente, hace fsync y cierra los archivos."""
+        if self._hilo and self._hilo.is_alive():
+            self._cola.put(_FIN)
+            self._hilo.join()
+        self._cerrar_archivos()
+
+    def estadisticas(self) -> dict:
+        return {**self.metricas, "en_cola": self._cola.qsize(), "archivos_abiertos": len(self._abiertos)}
+
+    # -------------------------------------------------------------------------
+    # Hilo escritor
+    # -------------------------------------------------------------------------
+
+    def _loop(self):
+        while True:
+            primero = self._cola.get()
+            lote = [primero]
+            # Todo lo que ya está esperando se escribe en el mismo lote
+            while len(lote) < self.max_lote:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+
+            fin = any(item is _FIN for item in lote)
+            try:
+                with registro_segundos.medir():
+                    self._escribir_lote([item for item in lote if item is not _FIN])
+            except Exception as e:
+                self.metricas["errores"] += 1
+                log.warning("⚠️ Error escribiendo conversaciones: %s", e)
+            finally:
+                for _ in lote:
+                    self._cola.task_done()
+            if fin:
+                return
+
+    def _escribir_lote(self, lote):
+        por_archivo = OrderedDict()
+        for ruta, linea in lote:
+            por_archivo.setdefault(ruta, []).append(linea)
+
+        for ruta, lineas in por_archivo.items():
+            texto = "".join(lineas)
+            try:
+                archivo = self._archivo(ruta, len(texto.encode("utf-8")))
+                archivo.write(texto)
+                archivo.flush()
+                self._sin_fsync.add(ruta)
+                self.metricas["lineas_escritas"] += len(lineas)
+            except OSError as e:
+                self.metricas["errores"] += 1
+                log.warning("⚠️ No se pudo escribir en %s: %s", ruta, e)
+        self.metricas["lotes"] += 1
+
+        ahora = time.monotonic()
+        if self.fsync == "siempre" or (self.fsync == "periodico" and ahora - self._ultimo_fsync >= self.fsync_segundos):
+            self._sincronizar()
+            self._ultimo_fsync = ahora
+
+    def _archivo(self, ruta: str, bytes_nuevos: int):
+        archivo = self._abiertos.get(ruta)
+        if archivo is not None:
+            self._abiertos.move_to_end(ruta)
+        if self.max_bytes > 0 and self._tamanio(ruta, archivo) + bytes_nuevos > self.max_bytes:
+            if archivo is not None:
+                self._cerrar(ruta)
+            self._rotar(ruta)
+            archivo = None
+        if archivo is None:
+            os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+            archivo = self._abiertos[ruta] = open(ruta, "a", encoding="utf-8")
+            while len(self._abiertos) > self.max_abiertos:
+                self._cerrar(next(iter(self._abiertos)))
+        return archivo
+
+    @staticmethod
+    def _tamanio(ruta: str, archivo) -> int:
+        if archivo is not None:
+            return archivo.tell()
+        return os.path.getsize(ruta) if os.path.exists(ruta) else 0
+
+    def _rotar(self, ruta: str):
+        if self.rotaciones <= 0:
+            os.remove(ruta)
+        else:
+            for i in range(self.rotaciones - 1, 0, -1):
+                if os.path.exists(f"{ruta}.{i}"):
+                    os.replace(f"{ruta}.{i}", f"{ruta}.{i + 1}")
+            os.replace(ruta, f"{ruta}.1")
+        self.metricas["rotaciones"] += 1
+
+    def _cerrar(self, ruta: str):
+        archivo = self._abiertos.pop(ruta)
+        try:
+            if ruta in self._sin_fsync and self.fsync != "nunca":
+                os.fsync(archivo.fileno())
+        finally:
+            self._sin_fsync.discard(ruta)
+            archivo.close()
+
+    def _sincronizar(self):
+        for ruta in list(self._sin_fsync):
+            archivo = self._abiertos.get(ruta)
+            if archivo is not None:
+                os.fsync(archivo.fileno())
+        self._sin_fsync.clear()
+
+    def _cerrar_archivos(self):
+        for ruta in list(self._abiertos):
+            try:
+                self._cerrar(ruta)
+            except OSError as e:
+                log.warning("⚠️ Error cerrando %s: %s", ruta, e)
+
+
+escritor_conversaciones = EscritorConversaciones()
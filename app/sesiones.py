@@ -0,0 +1,61 @@
+# ==============================================================================
+# Ejecución ordenada por sesión
+# Los mensajes de un mismo número de WhatsApp se procesan de a uno y en el
+# orden en que llegaron; los de números distintos corren en paralelo.
+# ==============================================================================
+
+import asyncio
+import os
+
+# Máximo de sesiones procesándose a la vez (0 = sin límite)
+MAX_SESIONES_CONCURRENTES = int(os.getenv("MAX_SESIONES_CONCURRENTES", "0"))
+
+
+class _Turno:
+    """Candado de una sesión y cuántos mensajes lo están usando o esperando."""
+
+    __slots__ = ("lock", "usuarios")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.usuarios = 0
+
+
+class EjecutorSesiones:
+    """
+    Serializa el trabajo de cada sesión con un asyncio.Lock propio.
+    asyncio.Lock despierta a los que esperan en orden de llegada, así que los
+    mensajes de una sesión se atienden en el mismo orden en que entraron.
+    Los candados se descartan cuando la sesión no tiene mensajes pendientes.
+    """
+
+    def __init__(self, max_concurrencia: int = MAX_SESIONES_CONCURRENTES):
+        self._turnos = {}
+        self._limite = asyncio.Semaphore(max_concurrencia) if max_concurrencia > 0 else None
+
+    async def ejecutar(self, session_id: str, funcion, *args, **kwargs):
+        """Ejecuta la corrutina funcion(*args, **kwargs) en el turno de la sesión."""
+        turno = self._turnos.get(session_id)
+        if turno is None:
+            turno = self._turnos[session_id] = _Turno()
+        turno.usuarios += 1
+        try:
+            async with turno.lock:
+                if self._limite is None:
+                    return await funcion(*args, **kwargs)
+                async with self._limite:
+                    return await funcion(*args, **kwargs)
+        finally:
+            turno.usuarios -= 1
+            if turno.usuarios == 0:
+                del self._turnos[session_id]
+
+    def pendientes(self, session_id: str) -> int:
+        turno = self._turnos.get(session_id)
+        return turno.usuarios if turno else 0
+
+    def sesiones_activas(self) -> int:
+        return len(self._turnos)
+
+
+ejecutor_sesiones = EjecutorSesiones()
@@ -0,0 +1,56 @@
+# bench_arranque.py
+# Latencia de la primera respuesta con los modelos descargados (arranque en frío)
+# contra la primera respuesta después del precalentamiento de app/modelos.py.
+#
+# Uso (con Ollama levantado y los modelos gemma3_input/gemma3_output creados):
+#   python -m benchmarks.bench_arranque [url de Ollama]
+
+import asyncio
+import sys
+import time
+
+from ollama import AsyncClient
+
+from app.modelos import OLLAMA_URL, Precalentador, crear_modelo_input, crear_modelo_output
+
+MENSAJE = "hola, tenés yerba?"
+
+
+async def descargar(url, modelos):
+    """keep_alive=0 sin prompt: Ollama saca el modelo de memoria."""
+    cliente = AsyncClient(host=url)
+    for modelo in modelos.values():
+        await cliente.generate(model=modelo.model, keep_alive=0)
+
+
+async def primera_respuesta(modelos):
+    tiempos = {}
+    for nombre, modelo in modelos.items():
+        inicio = time.perf_counter()
+        await modelo.ainvoke(MENSAJE)
+        tiempos[nombre] = (time.perf_counter() - inicio) * 1000
+    return tiempos
+
+
+async def main():
+    url = sys.argv[1] if len(sys.argv) > 1 else OLLAMA_URL
+    modelos = {"input": crear_modelo_input(url), "output": crear_modelo_output(url)}
+
+    await descargar(url, modelos)
+    frio = await primera_respuesta(modelos)
+
+    await descargar(url, modelos)
+    precalentador = Precalentador()
+    inicio = time.perf_counter()
+    await precalentador.precalentar(modelos)
+    precalentamiento = (time.perf_counter() - inicio) * 1000
+    caliente = await primera_respuesta(modelos)
+
+    print(f"precalentamiento (los dos modelos en paralelo): {precalentamiento:.0f} ms")
+    print(f"{'modelo':>8} {'en frío':>10} {'precalentado':>13}")
+    for nombre in modelos:
+        print(f"{nombre:>8} {frio[nombre]:>7.0f} ms {caliente[nombre]:>10.0f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+# bench_conexiones.py
+# Compara el costo de abrir una conexión nueva por consulta (como hacía
+# connect_to_db) contra reutilizar conexiones del pool de app/database.py.
+#
+# Uso (con la BD del .env levantada):
+#   python -m benchmarks.bench_conexiones [repeticiones]
+
+import os
+import sys
+import time
+import statistics
+import mysql.connector
+from app.database import ejecutar_consulta, engine
+
+QUERY = "SELECT id, nombre FROM categorias WHERE LOWER(nombre) = %s;"
+
+
+def consulta_sin_pool():
+    connection = mysql.connector.connect(
+        user=os.getenv("MYSQL_USER"),
+        password=os.getenv("MYSQL_PASSWORD"),
+        host=os.getenv("MYSQL_HOST"),
+        port=os.getenv("MYSQL_PORT"),
+        database=os.getenv("MYSQL_DATABASE")
+    )
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute(QUERY, ("lácteos",))
+    cursor.fetchall()
+    cursor.close()
+    connection.close()
+
+
+def consulta_con_pool():
+    ejecutar_consulta(QUERY, ("lácteos",))
+
+
+def medir(nombre, funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    print(f"{nombre:<12} p50={statistics.median(tiempos):7.2f} ms  "
+          f"p95={tiempos[int(len(tiempos) * 0.95) - 1]:7.2f} ms  "
+          f"total={sum(tiempos):9.1f} ms")
+
+
+if __name__ == "__main__":
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"🔍 {repeticiones} consultas por modo\n")
+    medir("sin pool", consulta_sin_pool, repeticiones)
+    consulta_con_pool()  # calentar el pool
+    medir("con pool", consulta_con_pool, repeticiones)
+    print(f"\n📊 {engine.pool.status()}")
@@ -0,0 +1,177 @@
+# bench_consultas_bd.py
+# Compara las consultas de búsqueda anteriores (LOWER() + LIKE '%...%' + OR entre
+# tres tablas) con las de app/consultas_catalogo.py sobre los índices de
+# script/migraciones/001_indices_busqueda.sql, en una base descartable con
+# productos sintéticos. Muestra latencia p50/p95 y las filas que estima EXPLAIN.
+#
+# Uso (con el servidor MySQL del .env levantado; crea y borra la base BENCH_BASE):
+#   python -m benchmarks.bench_consultas_bd [productos]     (por defecto 100000)
+
+import os
+import random
+import statistics
+import sys
+import time
+
+from app.consultas_catalogo import (
+    QUERY_CATEGORIA, QUERY_PRODUCTOS_CATEGORIA, QUERY_PREFIJO, QUERY_PALABRAS, texto_fulltext,
+)
+
+BENCH_BASE = os.getenv("BENCH_BASE", "pp3_bench_busqueda")
+MIGRACION = os.path.join(os.path.dirname(__file__), "..", "script", "migraciones", "001_indices_busqueda.sql")
+
+# Mismas tablas que script/bd.sql (solo las columnas que intervienen)
+ESQUEMA = [
+    """CREATE TABLE categorias (
+        id int(11) NOT NULL AUTO_INCREMENT, nombre varchar(255) NOT NULL, descripcion text DEFAULT NULL,
+        PRIMARY KEY (id), UNIQUE KEY nombre (nombre)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3 COLLATE=utf8mb3_general_ci""",
+    """CREATE TABLE marcas (
+        id int(11) NOT NULL AUTO_INCREMENT, nombre varchar(255) NOT NULL,
+        PRIMARY KEY (id), UNIQUE KEY nombre (nombre)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3 COLLATE=utf8mb3_general_ci""",
+    """CREATE TABLE productos (
+        id int(11) NOT NULL AUTO_INCREMENT, nombre varchar(255) NOT NULL, descripcion text DEFAULT NULL,
+        precio_costo decimal(10,2) NOT NULL, precio_venta decimal(10,2) NOT NULL, stock int(11) NOT NULL DEFAULT 0,
+        marca_id int(11) DEFAULT NULL, categoria_id int(11) DEFAULT NULL, codigo_barras varchar(50) DEFAULT NULL,
+        PRIMARY KEY (id), UNIQUE KEY codigo_barras (codigo_barras),
+        KEY fk_productos_marcas (marca_id), KEY fk_productos_categorias (categoria_id),
+        CONSTRAINT fk_productos_categorias FOREIGN KEY (categoria_id) REFERENCES categorias (id),
+        CONSTRAINT fk_productos_marcas FOREIGN KEY (marca_id) REFERENCES marcas (id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3 COLLATE=utf8mb3_general_ci""",
+]
+
+TIPOS = [
+    "Yerba Mate", "Galletitas", "Aceite de Girasol", "Aceite de Oliva", "Arvejas", "Lentejas",
+    "Queso Cremoso", "Leche Entera", "Dulce de Leche", "Fideos Tirabuzón", "Arroz Largo Fino",
+    "Harina Leudante", "Gaseosa Cola", "Agua Mineral", "Jabón en Polvo", "Lavandina", "Mayonesa",
+]
+CATEGORIAS = [f"Categoría {i:02d}" for i in range(60)] + ["Lácteos", "Bebidas sin alcohol", "Almacén"]
+
+# Consultas anteriores (las que tenía buscar_en_bd antes de la migración)
+_COLUMNAS_ANTERIORES = """p.id, p.nombre AS producto, p.descripcion, p.precio_costo, p.precio_venta, p.stock,
+    m.nombre AS marca, c.nombre AS categoria
+    FROM productos p
+    INNER JOIN marcas m ON p.marca_id = m.id
+    INNER JOIN categorias c ON p.categoria_id = c.id"""
+ANTERIORES = {
+    "categoria": ("SELECT id, nombre FROM categorias WHERE LOWER(nombre) = %s;", ("lácteos",)),
+    "productos de categoría": (f"SELECT {_COLUMNAS_ANTERIORES} WHERE p.categoria_id = %s ORDER BY p.nombre ASC;", (61,)),
+    "prefijo": (
+        f"SELECT {_COLUMNAS_ANTERIORES} WHERE LOWER(p.nombre) LIKE %s or LOWER(m.nombre) LIKE %s "
+        "or LOWER(c.nombre) LIKE %s ORDER BY p.nombre ASC;",
+        ("yerba%", "yerba%", "yerba%"),
+    ),
+    "contiene": (
+        f"SELECT {_COLUMNAS_ANTERIORES} WHERE LOWER(p.nombre) LIKE %s AND NOT LOWER(p.nombre) LIKE %s ORDER BY p.nombre ASC;",
+        ("%oliva%", "oliva%"),
+    ),
+}
+NUEVAS = {
+    "categoria": (QUERY_CATEGORIA, ("lácteos",)),
+    "productos de categoría": (QUERY_PRODUCTOS_CATEGORIA, (61,)),
+    "prefijo": (QUERY_PREFIJO, ("yerba%", "yerba%", "yerba%")),
+    "contiene": (QUERY_PALABRAS, (texto_fulltext("oliva"),)),
+}
+
+
+def sentencias_migracion(ruta: str = MIGRACION) -> list:
+    with open(ruta, "r", encoding="utf-8") as f:
+        sin_comentarios = "\n".join(l for l in f.read().splitlines() if not l.strip().startswith("--"))
+    return [s.strip() for s in sin_comentarios.split(";") if s.strip()]
+
+
+def ejecutar(cursor, sql: str, params=()):
+    cursor.execute(sql, params)
+    return cursor.fetchall() if cursor.with_rows else []
+
+
+def crear_base(cursor, nombre: str = BENCH_BASE):
+    ejecutar(cursor, f"DROP DATABASE IF EXISTS `{nombre}`")
+    ejecutar(cursor, f"CREATE DATABASE `{nombre}` DEFAULT CHARACTER SET utf8mb3 COLLATE utf8mb3_general_ci")
+    ejecutar(cursor, f"USE `{nombre}`")
+    for sentencia in ESQUEMA:
+        ejecutar(cursor, sentencia)
+
+
+def cargar_datos(cursor, cantidad: int, azar: random.Random, lote: int = 5000):
+    cursor.executemany("INSERT INTO categorias (nombre) VALUES (%s)", [(c,) for c in CATEGORIAS])
+    cursor.executemany("INSERT INTO marcas (nombre) VALUES (%s)", [(f"Marca {i:05d}",) for i in range(2000)])
+    for inicio in range(0, cantidad, lote):
+        filas = []
+        for i in range(inicio, min(cantidad, inicio + lote)):
+            tipo = azar.choice(TIPOS)
+            marca = azar.randint(1, 2000)
+            filas.append((
+                f"{tipo} Marca {marca - 1:05d} {azar.choice(['500g', '1kg', '900ml', '1.5L'])}",
+                f"{tipo} de calidad, presentación {i}",
+                10, round(100 + azar.random() * 4000, 2), azar.randint(0, 200),
+                marca, azar.randint(1, len(CATEGORIAS)), f"CB{i:010d}",
+            ))
+        cursor.executemany(
+            "INSERT INTO productos (nombre, descripcion, precio_costo, precio_venta, stock, marca_id, categoria_id, codigo_barras) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+            filas,
+        )
+    ejecutar(cursor, "ANALYZE TABLE productos, marcas, categorias")
+
+
+def aplicar_migracion(cursor):
+    for sentencia in sentencias_migracion():
+        ejecutar(cursor, sentencia)
+
+
+def explicar(cursor, sql: str, params=()) -> list:
+    """Filas de EXPLAIN como diccionarios (table, type, key, rows, ...)."""
+    cursor.execute("EXPLAIN " + sql.rstrip().rstrip(";"), params)
+    columnas = [c[0] for c in cursor.description]
+    return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+
+def medir(cursor, sql: str, params, repeticiones: int) -> list:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        ejecutar(cursor, sql, params)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return sorted(tiempos)
+
+
+def informe(cursor, titulo: str, consultas: dict, repeticiones: int):
+    print(f"\n{titulo}")
+    print(f"{'consulta':>24} {'p50':>9} {'p95':>9} {'filas EXPLAIN':>14}")
+    for nombre, (sql, params) in consultas.items():
+        tiempos = medir(cursor, sql, params, repeticiones)
+        filas = sum(int(f.get("rows") or 0) for f in explicar(cursor, sql, params))
+        p95 = tiempos[int(len(tiempos) * 0.95)]
+        print(f"{nombre:>24} {statistics.median(tiempos):>6.1f} ms {p95:>6.1f} ms {filas:>14}")
+
+
+def main():
+    from app.database import engine
+
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    conexion = engine.raw_connection()
+    cursor = conexion.cursor()
+    try:
+        inicio = time.perf_counter()
+        crear_base(cursor)
+        cargar_datos(cursor, cantidad, random.Random(7))
+        conexion.commit()
+        print(f"{cantidad} productos cargados en {time.perf_counter() - inicio:.1f} s")
+
+        informe(cursor, "Antes de la migración (consultas anteriores)", ANTERIORES, 20)
+
+        inicio = time.perf_counter()
+        aplicar_migracion(cursor)
+        print(f"\nMigración aplicada en {time.perf_counter() - inicio:.1f} s")
+
+        informe(cursor, "Después de la migración (app/consultas_catalogo.py)", NUEVAS, 20)
+    finally:
+        ejecutar(cursor, f"DROP DATABASE IF EXISTS `{BENCH_BASE}`")
+        cursor.close()
+        conexion.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# bench_difuso.py
+# Mide la corrección de errores de tipeo (app/difuso.py) sobre un catálogo
+# sintético: tiempo de armado del índice y latencia p50/p95/máx por consulta.
+#
+# Uso:
+#   python -m benchmarks.bench_difuso              (50.000 productos)
+#   python -m benchmarks.bench_difuso 200000
+
+import random
+import statistics
+import sys
+import time
+
+from app.difuso import IndiceDifuso
+
+TIPOS = [
+    "Yerba Mate", "Galletitas", "Aceite de Girasol", "Aceite de Oliva", "Arvejas", "Lentejas",
+    "Queso Cremoso", "Leche Entera", "Dulce de Leche", "Fideos Tirabuzón", "Arroz Largo Fino",
+    "Harina Leudante", "Gaseosa Cola", "Agua Mineral", "Jabón en Polvo", "Lavandina", "Mayonesa",
+    "Mermelada de Durazno", "Café Molido", "Cerveza Rubia", "Vino Tinto Malbec", "Chocolate con Leche",
+]
+TAMANIOS = ["250g", "500g", "1kg", "900ml", "1.5L", "2.25L", "x6", "x12"]
+SILABAS = ["la", "ma", "ri", "to", "ser", "ve", "ca", "llo", "zu", "que", "bi", "na", "gue", "pa", "dor"]
+
+CONSULTAS = [
+    "yerva", "galetitas", "aseite de jirasol", "arbejas", "keso cremozo", "lentejaz",
+    "dulse de leche", "fideos tirabuson", "arros", "harina leudante", "cafe molido",
+    "mermelada de durasno", "cerbeza", "vino tinto malbek", "chocolate con lece", "caviar",
+]
+
+
+def marcas(cantidad, azar):
+    return [
+        "".join(azar.choice(SILABAS) for _ in range(azar.randint(2, 4))).capitalize()
+        for _ in range(cantidad)
+    ]
+
+
+def catalogo_sintetico(cantidad, azar):
+    lista_marcas = marcas(2000, azar)
+    return [
+        f"{azar.choice(TIPOS)} {azar.choice(lista_marcas)} {azar.choice(TAMANIOS)}"
+        for _ in range(cantidad)
+    ] + lista_marcas
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    azar = random.Random(7)
+    textos = catalogo_sintetico(cantidad, azar)
+
+    inicio = time.perf_counter()
+    indice = IndiceDifuso(textos)
+    armado = time.perf_counter() - inicio
+    print(f"{cantidad} productos, {len(indice)} términos, índice armado en {armado:.2f} s")
+
+    tiempos = []
+    for _ in range(20):
+        for consulta in CONSULTAS:
+            inicio = time.perf_counter()
+            indice.corregir(consulta)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    p95 = tiempos[int(len(tiempos) * 0.95)]
+    print(f"consultas: p50 {statistics.median(tiempos):.2f} ms, p95 {p95:.2f} ms, máx {tiempos[-1]:.2f} ms")
+
+    print()
+    for consulta in CONSULTAS:
+        print(f"  {consulta!r:>24} → {indice.corregir(consulta)!r}")
+
+
+if __name__ == "__main__":
+    main()
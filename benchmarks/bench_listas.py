@@ -0,0 +1,100 @@
+# bench_listas.py
+# Compara los modos de armado de listas (app/listas.py): tokens generados por
+# la IA y latencia para listas de distinto tamaño.
+#
+# Uso:
+#   python -m benchmarks.bench_listas            (contra Ollama, gemma3_output)
+#   python -m benchmarks.bench_listas --simulado (modelo simulado a 15 tokens/s)
+
+import asyncio
+import sys
+import time
+from decimal import Decimal
+
+from app.listas import renderizar_lista, prompt_cierre, formatear_lista
+
+TAMANIOS = [1, 10, 40]
+MODOS = ["ia", "plantilla", "fijo"]
+TOKENS_POR_SEGUNDO = 15
+
+
+class _Respuesta:
+    def __init__(self, content, tokens):
+        self.content = content
+        self.response_metadata = {"eval_count": tokens}
+
+
+class ModeloSimulado:
+    """Genera texto a velocidad constante; en modo "ia" reescribe la lista completa."""
+
+    async def ainvoke(self, prompt, **kwargs):
+        if "•" in prompt:
+            texto = "\n".join(l.strip() for l in prompt.splitlines() if l.strip().startswith("•"))
+            texto += "\n¡Hay mucha variedad para elegir!"
+        else:
+            texto = "¡Hay mucha variedad para elegir!"
+        tokens = max(1, len(texto) // 4)
+        tope = kwargs.get("options", {}).get("num_predict")
+        if tope:
+            tokens = min(tokens, tope)
+        await asyncio.sleep(tokens / TOKENS_POR_SEGUNDO)
+        return _Respuesta(texto, tokens)
+
+
+def productos_de_prueba(cantidad):
+    return [
+        {"producto": f"Galletitas Surtidas Marca {i} 300g", "precio_venta": Decimal("1570.00") + i}
+        for i in range(cantidad)
+    ]
+
+
+class _Contador:
+    """Envuelve al modelo para sumar los tokens generados (eval_count de Ollama)."""
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self.tokens = 0
+
+    async def ainvoke(self, prompt, **kwargs):
+        resultado = await self.modelo.ainvoke(prompt, **kwargs)
+        self.tokens += getattr(resultado, "response_metadata", {}).get("eval_count", 0)
+        return resultado
+
+
+async def medir(modelo, modo, productos):
+    contador = _Contador(modelo)
+    prompt_ia = f"""
+El cliente preguntó: "tenés galletitas?"
+
+{formatear_lista(productos)}
+
+Mostrá la lista con viñetas (•) de forma amable y natural.
+"""
+    inicio = time.perf_counter()
+    await renderizar_lista(
+        contador, productos,
+        encabezado="Estos son los productos que tenemos 😊",
+        prompt_ia=prompt_ia,
+        prompt_de_cierre=prompt_cierre("tenés galletitas?", productos, "Escribí un comentario corto sobre los productos."),
+        modo=modo,
+    )
+    return contador.tokens, (time.perf_counter() - inicio) * 1000
+
+
+async def main():
+    if "--simulado" in sys.argv:
+        modelo = ModeloSimulado()
+    else:
+        from langchain_ollama import ChatOllama
+        modelo = ChatOllama(model="gemma3_output:latest")
+
+    print(f"{'productos':>9} {'modo':>10} {'tokens':>7} {'latencia':>11}")
+    for cantidad in TAMANIOS:
+        productos = productos_de_prueba(cantidad)
+        for modo in MODOS:
+            tokens, ms = await medir(modelo, modo, productos)
+            print(f"{cantidad:>9} {modo:>10} {tokens:>7} {ms:>8.0f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
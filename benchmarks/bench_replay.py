@@ -0,0 +1,500 @@
+# bench_replay.py
+# Reproduce las conversaciones reales de conversaciones/*.txt y sesiones de
+# compra sintéticas contra get_response y contra /process-message, sin Ollama
+# ni MySQL: la IA es un modelo falso determinístico y la base es una SQLite en
+# memoria cargada con los datos de script/bd.sql. Informa latencia p50/p95/p99,
+# llamadas y tokens de IA por mensaje, consultas a la base por mensaje y
+# memoria por sesión, y lo compara con benchmarks/base_replay.json (sale con
+# código 1 si algo empeoró más de lo tolerado).
+#
+# Uso:
+#   python -m benchmarks.bench_replay                    (compara con la base guardada)
+#   python -m benchmarks.bench_replay --guardar-base     (reemplaza la base)
+#   python -m benchmarks.bench_replay --tokens-por-segundo 40 --sesiones 50
+#   python -m benchmarks.bench_replay --sin-indice       (búsquedas contra la base)
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+# Antes de importar app: nada de lo que escribe la app va a las carpetas reales
+_TEMPORAL = tempfile.mkdtemp(prefix="bench_replay_")
+for _clave, _valor in {
+    "MYSQL_USER": "bench", "MYSQL_PASSWORD": "bench", "MYSQL_HOST": "127.0.0.1",
+    "MYSQL_PORT": "3306", "MYSQL_DATABASE": "bench",
+    "SESIONES_CARPETA": os.path.join(_TEMPORAL, "sesiones"),
+    "RECETAS_ARCHIVO": os.path.join(_TEMPORAL, "recetas.json"),
+    "CACHE_DETECCION_ARCHIVO": "",
+    "ESTADO_SESIONES": "local",
+    "OLLAMA_PRECALENTAR": "0",
+    "LOG_NIVEL": "ERROR",
+}.items():
+    os.environ.setdefault(_clave, _valor)
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables.history import RunnableWithMessageHistory
+
+from app import crud
+from app.cache_deteccion import CacheDeteccion
+from app.catalogo import QUERY_PRODUCTOS, QUERY_CATEGORIAS, normalizar_texto
+from app.gestor_sesiones import gestor_sesiones
+from app.historial import estimar_tokens
+from app.logs import configurar_logs
+from app.metricas import ModeloMedido
+from app.recetas import BaseRecetas
+
+RAIZ = os.path.join(os.path.dirname(__file__), "..")
+SCRIPT_BD = os.path.join(RAIZ, "script", "bd.sql")
+CONVERSACIONES = os.path.join(RAIZ, "conversaciones", "*.txt")
+BASE = os.path.join(os.path.dirname(__file__), "base_replay.json")
+
+# Cuánto puede empeorar cada métrica respecto de la base antes de contar como regresión
+TOLERANCIAS = {
+    "p50_ms": 0.25, "p95_ms": 0.25, "p99_ms": 0.25,
+    "llm_llamadas_por_mensaje": 0.02, "tokens_entrada_por_mensaje": 0.05,
+    "tokens_salida_por_mensaje": 0.05, "consultas_bd_por_mensaje": 0.02,
+    "bytes_por_sesion": 0.10,
+}
+# Por debajo de esta diferencia la latencia se considera ruido
+RUIDO_MS = 1.0
+
+# =============================================================================
+# BASE DE DATOS LOCAL (SQLite con los datos de script/bd.sql)
+# =============================================================================
+
+ESQUEMA = [
+    "CREATE TABLE categorias (id INTEGER PRIMARY KEY, nombre TEXT NOT NULL, descripcion TEXT)",
+    "CREATE TABLE marcas (id INTEGER PRIMARY KEY, nombre TEXT NOT NULL)",
+    """CREATE TABLE productos (
+        id INTEGER PRIMARY KEY, nombre TEXT NOT NULL, descripcion TEXT, precio_costo REAL,
+        precio_venta REAL, stock INTEGER, marca_id INTEGER, categoria_id INTEGER,
+        codigo_barras TEXT, fecha_alta TEXT, nombre_busqueda TEXT)""",
+]
+TABLAS = ("categorias", "marcas", "productos")
+
+
+def _coincide(nombre, descripcion, consulta):
+    """MATCH ... AGAINST en modo booleano, solo con los "+palabra*" que arma texto_fulltext."""
+    palabras = normalizar_texto(f"{nombre} {descripcion or ''}").split()
+    for grupo in re.findall(r"\(([^)]*)\)", consulta) or [consulta]:
+        terminos = re.findall(r"\+(\w+)\*", grupo)
+        if terminos and all(any(p.startswith(t) for p in palabras) for t in terminos):
+            return 1
+    return 0
+
+
+def _traducir(query: str) -> str:
+    """Dialecto de MySQL de app/consultas_catalogo.py → SQLite."""
+    query = re.sub(
+        r"MATCH\((\w+\.nombre), (\w+\.descripcion)\) AGAINST \(%s IN BOOLEAN MODE\)",
+        r"coincide(\1, \2, ?)", query,
+    )
+    return query.replace("LIKE %s", "LIKE ? ESCAPE '\\'").replace("%s", "?")
+
+
+class BaseLocal:
+    """Atiende ejecutar_consulta(_async) y cuenta cada consulta."""
+
+    def __init__(self, script=SCRIPT_BD):
+        self._conexion = sqlite3.connect(":memory:", check_same_thread=False)
+        self._conexion.row_factory = sqlite3.Row
+        self._conexion.create_function("coincide", 3, _coincide)
+        self._lock = threading.Lock()
+        self.consultas = 0
+        for sentencia in ESQUEMA:
+            self._conexion.execute(sentencia)
+        with open(script, encoding="utf-8") as f:
+            texto = f.read().replace("\\'", "''")
+        for tabla in TABLAS:
+            inicio = texto.index(f"INSERT INTO `{tabla}` (")
+            self._conexion.execute(texto[inicio:texto.index(";\n", inicio)])
+        self._conexion.execute("UPDATE productos SET nombre_busqueda = LOWER(TRIM(nombre))")
+
+    def ejecutar(self, query: str, params: tuple = ()) -> list:
+        self.consultas += 1
+        with self._lock:
+            return [dict(f) for f in self._conexion.execute(_traducir(query), params)]
+
+    async def ejecutar_async(self, query: str, params: tuple = ()) -> list:
+        return self.ejecutar(query, params)
+
+    def instalar(self, indice: bool = True):
+        """
+        Reemplaza la base de crud y carga el catálogo (con categorías y marcas) en
+        memoria; sin índice, todas las búsquedas van a la base (como cuando el
+        catálogo no se pudo cargar al arrancar).
+        """
+        crud.ejecutar_consulta_async = self.ejecutar_async
+        if indice:
+            crud.catalogo._cargador = lambda: (self.ejecutar(QUERY_PRODUCTOS), self.ejecutar(QUERY_CATEGORIAS))
+            crud.catalogo.refrescar()
+        else:
+            # Que la detección de categorías no lo cargue a mitad de la corrida
+            crud.catalogo._cargador = self._sin_indice
+        self.consultas = 0
+
+    @staticmethod
+    def _sin_indice():
+        raise RuntimeError("corrida sin índice del catálogo")
+
+# =============================================================================
+# IA FALSA
+# =============================================================================
+
+# Platos para los que la IA falsa dice que sí es una comida
+PLATOS = {
+    "empanada": ["harina", "carne", "cebolla", "huevo", "aceitunas"],
+    "pizza": ["harina", "levadura", "queso", "tomate", "aceite"],
+    "locro": ["maíz", "zapallo", "porotos", "panceta"],
+    "guiso": ["arroz", "papa", "cebolla", "carne"],
+    "torta": ["harina", "azúcar", "huevos", "manteca", "leche"],
+    "ensalada": ["lechuga", "tomate", "zanahoria", "aceite"],
+}
+INTENCIONES = [
+    ("VACIAR_PEDIDO", r"\b(vacia|vaciar|borra todo|cancela todo)"),
+    ("FINALIZAR_PEDIDO", r"\b(finaliz|confirm|eso es todo)"),
+    ("QUITAR_PRODUCTO", r"\b(saca|quita|elimina)"),
+    ("MOSTRAR_PEDIDO", r"\b(mi pedido|el pedido|mi carrito)"),
+    ("AGREGAR_PRODUCTO", r"\b(agreg|suma|pone|dame|mandame|quiero)"),
+    ("CONSULTAR_INFO", r"\b(tenes|tienen|hay|venden|precio|cuanto|busco|mostrame)"),
+]
+NUMEROS = {"un": 1, "una": 1, "uno": 1, "dos": 2, "tres": 3, "cuatro": 4, "cinco": 5}
+NO_PRODUCTOS = {
+    "hola", "buenas", "gracias", "tenes", "tienen", "quiero", "agregame", "agrega", "dame",
+    "sacame", "quitame", "pedido", "mostrame", "carrito", "tambien", "cuanto", "precio",
+    "para", "como", "este", "esta", "esos", "esas", "otro", "otra", "todo", "finalizar",
+    "confirmar", "vaciar", "favor", "barato", "barata", "caro", "cara", "grande", "chico",
+}
+FRASE = re.compile(r'(?:Frase del cliente:|Analizá la nueva frase del cliente:)\s*"(.*)"')
+
+
+class IAFalsa:
+    """
+    Responde como gemma3_input/gemma3_output lo suficiente para recorrer todas
+    las ramas de crud. Cuenta llamadas y tokens (estimados igual que el
+    historial) y, con tokens_por_segundo, tarda lo que tardaría en generarlos.
+    """
+
+    def __init__(self, vocabulario: set, tokens_por_segundo: float = 0.0):
+        self.vocabulario = vocabulario
+        self.tokens_por_segundo = tokens_por_segundo
+        self.llamadas = 0
+        self.tokens_entrada = 0
+        self.tokens_salida = 0
+
+    async def _generar(self, prompt: str, texto: str) -> str:
+        self.llamadas += 1
+        self.tokens_entrada += estimar_tokens(prompt)
+        salida = estimar_tokens(texto)
+        self.tokens_salida += salida
+        if self.tokens_por_segundo:
+            await asyncio.sleep(salida / self.tokens_por_segundo)
+        return texto
+
+    # ---- gemma3_input ------------------------------------------------------
+
+    async def ainvoke(self, prompt, *args, **kwargs):
+        return await self._generar(prompt, self._entrada(prompt, kwargs.get("format")))
+
+    def _entrada(self, prompt: str, formato) -> str:
+        frase = FRASE.search(prompt)
+        if frase is None:
+            plato = self._plato(prompt)
+            if "ingredientes principales" in prompt:
+                return ", ".join(PLATOS[plato]) if plato else "NINGUNO"
+            return "sí" if plato else "no"
+
+        frase = normalizar_texto(frase.group(1))
+        intencion = next((i for i, patron in INTENCIONES if re.search(patron, frase)), "CHARLAR")
+        productos = self._productos(frase)
+        if not productos and re.search(r"\b(barat|car[oa]\b|ese|esa|eso)\b", frase) and "\n- " in prompt:
+            # Referencia a algo ya mostrado: el primero de la lista
+            productos = [(re.search(r"^\s*- (.+)$", prompt, re.M).group(1).strip().lower(), 1)]
+
+        if formato:
+            return json.dumps({
+                "intencion": intencion,
+                "productos": [
+                    {"nombre": nombre, "cantidad": cantidad, "es_comida": nombre in PLATOS,
+                     "ingredientes": PLATOS.get(nombre, [])}
+                    for nombre, cantidad in productos
+                ],
+                "confianza": 0.9,
+            }, ensure_ascii=False)
+        nombres = ", ".join(n for n, _ in productos) or "ninguno"
+        return f"Intención detectada: {intencion}\nProductos mencionados: {nombres}"
+
+    def _plato(self, prompt: str):
+        texto = normalizar_texto(prompt)
+        return next((p for p in PLATOS if re.search(rf"'{p}s?'|\"{p}s?\"", texto)), None)
+
+    def _productos(self, frase: str) -> list:
+        productos, cantidad = [], 1
+        for palabra in re.findall(r"\w+", frase):
+            if palabra.isdigit() or palabra in NUMEROS:
+                cantidad = int(palabra) if palabra.isdigit() else NUMEROS[palabra]
+                continue
+            singular = re.sub(r"(es|s)$", "", palabra) if len(palabra) > 4 else palabra
+            for candidata in (palabra, singular):
+                if candidata in NO_PRODUCTOS:
+                    break
+                if candidata in PLATOS or candidata in self.vocabulario:
+                    productos.append((candidata, cantidad))
+                    cantidad = 1
+                    break
+        return productos
+
+    # ---- gemma3_output -----------------------------------------------------
+
+    async def responder(self, entrada):
+        prompt = entrada.to_string() if hasattr(entrada, "to_string") else str(entrada)
+        # Con historial, solo cuenta el último mensaje (el que trae los productos de ahora)
+        ultimo = entrada.to_messages()[-1].content if hasattr(entrada, "to_messages") else prompt
+        lineas = [l for l in ultimo.splitlines() if l.lstrip().startswith("•")][:8]
+        texto = "\n".join(lineas + ["¡Cualquier cosa avisame! 😊"]) if lineas else "¡Dale, te ayudo con eso! 😊"
+        texto = await self._generar(prompt, texto)
+        return AIMessage(content=texto, response_metadata={"eval_count": estimar_tokens(texto)})
+
+
+class _Salida:
+    def __init__(self, ia: IAFalsa):
+        self._ia = ia
+
+    async def ainvoke(self, prompt, *args, **kwargs):
+        return await self._ia.responder(prompt)
+
+
+def instalar_ia(ia: IAFalsa):
+    """Los dos modelos de crud pasan a ser la IA falsa; el historial sigue siendo el real."""
+    crud.modelo_input = ModeloMedido(ia, "input")
+    crud.modelo_output = ModeloMedido(_Salida(ia), "output")
+    crud.with_message_history = ModeloMedido(RunnableWithMessageHistory(
+        crud.prompt | RunnableLambda(ia.responder),
+        crud.get_session_history,
+        input_messages_key="input",
+        history_messages_key="history",
+    ), "output")
+
+
+def vocabulario_del_catalogo(filas: list) -> set:
+    palabras = set(categorias_de_una_palabra(filas))
+    for fila in filas:
+        palabras.update(p for p in re.findall(r"[a-z]+", normalizar_texto(fila["producto"])) if len(p) >= 4)
+    return palabras - NO_PRODUCTOS
+
+
+def categorias_de_una_palabra(filas: list) -> list:
+    return sorted({normalizar_texto(f["categoria"]) for f in filas if " " not in f["categoria"].strip()})
+
+# =============================================================================
+# SESIONES: CONVERSACIONES REALES Y SINTÉTICAS
+# =============================================================================
+
+LINEA_CLIENTE = re.compile(r"^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d - De [^:]+: (.*)$")
+
+
+def leer_conversaciones(patron=CONVERSACIONES) -> dict:
+    """session_id → mensajes del cliente, en orden."""
+    sesiones = {}
+    for ruta in sorted(glob.glob(patron)):
+        with open(ruta, encoding="utf-8") as f:
+            mensajes = [m.group(1).strip() for m in map(LINEA_CLIENTE.match, f) if m and m.group(1).strip()]
+        if mensajes:
+            sesiones[os.path.splitext(os.path.basename(ruta))[0]] = mensajes
+    return sesiones
+
+
+def sesiones_sinteticas(filas: list, cantidad: int, semilla: int = 7) -> dict:
+    """Recorridos de compra típicos con nombres del catálogo (siempre los mismos para una semilla)."""
+    azar = random.Random(semilla)
+    nombres = sorted({" ".join(f["producto"].lower().split()[:2]) for f in filas})
+    categorias = categorias_de_una_palabra(filas)
+    sesiones = {}
+    for i in range(cantidad):
+        a, b, c = azar.sample(nombres, 3)
+        plato = azar.choice(sorted(PLATOS))
+        mensajes = [
+            azar.choice(["hola", "buenas tardes", "hola! cómo andan?"]),
+            f"tenés {a}?",
+            f"agregame {azar.randint(1, 3)} {a}",
+            f"tenés {b} y {c}?",
+            "agregame el más barato",
+            f"qué tenés de {azar.choice(categorias)}?",
+            f"tenés algo para hacer {plato}s?",
+            "mostrame mi pedido",
+            f"sacame {a}",
+            azar.choice(["finalizar pedido", "vaciá el carrito", "gracias!"]),
+        ]
+        sesiones[f"sintetica-{i:03d}"] = mensajes
+    return sesiones
+
+# =============================================================================
+# REPRODUCCIÓN Y MEDICIÓN
+# =============================================================================
+
+def percentil(valores: list, p: int) -> float:
+    if len(valores) < 2:
+        return valores[0] if valores else 0.0
+    return statistics.quantiles(valores, n=100, method="inclusive")[p - 1]
+
+
+async def reproducir(modo: str, sesiones: dict, ia: IAFalsa, base: BaseLocal) -> dict:
+    """Cada sesión en orden; las sesiones una detrás de otra (latencia sin competencia)."""
+    prefijo = "gr" if modo == "get_response" else "pm"
+    latencias = []
+    llamadas, tokens_entrada, tokens_salida, consultas = ia.llamadas, ia.tokens_entrada, ia.tokens_salida, base.consultas
+
+    if modo == "get_response":
+        async def enviar(session_id, mensaje):
+            await crud.get_response(mensaje, session_id, "Cliente de prueba")
+    else:
+        import httpx
+
+        from app.main import app
+
+        cliente = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+        async def enviar(session_id, mensaje):
+            respuesta = await cliente.post("/process-message", json={
+                "from": session_id, "body": mensaje, "nombre": "Cliente de prueba",
+            })
+            respuesta.raise_for_status()
+
+    for nombre, mensajes in sesiones.items():
+        for mensaje in mensajes:
+            inicio = time.perf_counter()
+            await enviar(f"{prefijo}-{nombre}", mensaje)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    if modo != "get_response":
+        await cliente.aclose()
+
+    n = len(latencias)
+    por_sesion = [
+        f["total_bytes"] for f in gestor_sesiones.memoria(limite=10 ** 6)["por_sesion"]
+        if f["session_id"].startswith(f"{prefijo}-")
+    ]
+    return {
+        "mensajes": n,
+        "p50_ms": round(percentil(latencias, 50), 3),
+        "p95_ms": round(percentil(latencias, 95), 3),
+        "p99_ms": round(percentil(latencias, 99), 3),
+        "llm_llamadas_por_mensaje": round((ia.llamadas - llamadas) / n, 3),
+        "tokens_entrada_por_mensaje": round((ia.tokens_entrada - tokens_entrada) / n, 1),
+        "tokens_salida_por_mensaje": round((ia.tokens_salida - tokens_salida) / n, 1),
+        "consultas_bd_por_mensaje": round((base.consultas - consultas) / n, 3),
+        "bytes_por_sesion": int(statistics.mean(por_sesion)) if por_sesion else 0,
+    }
+
+
+def preparar_corrida():
+    """Caché de detecciones y recetas aprendidas vacías: cada modo arranca igual."""
+    crud.cache_deteccion = CacheDeteccion(archivo="")
+    crud.base_recetas = BaseRecetas(archivo="")
+
+
+async def correr(argumentos) -> dict:
+    configurar_logs()
+    base = BaseLocal()
+    base.instalar(indice=not argumentos.sin_indice)
+    filas = base.ejecutar(QUERY_PRODUCTOS)
+    base.consultas = 0
+    ia = IAFalsa(vocabulario_del_catalogo(filas), argumentos.tokens_por_segundo)
+    instalar_ia(ia)
+
+    sesiones = {**leer_conversaciones(), **sesiones_sinteticas(filas, argumentos.sesiones)}
+    resultados = {}
+
+    from app.endpoints import endpoints as rutas
+    from app.registro_conversaciones import escritor_conversaciones
+
+    # El pedido finalizado no sale al bot de WhatsApp y las conversaciones no se mezclan con las reales
+    with mock.patch("requests.post"), \
+            mock.patch.object(rutas, "CARPETA_CONVERSACIONES", os.path.join(_TEMPORAL, "conversaciones")):
+        os.makedirs(rutas.CARPETA_CONVERSACIONES, exist_ok=True)
+        for modo in ("get_response", "process_message"):
+            preparar_corrida()
+            resultados[modo] = await reproducir(modo, sesiones, ia, base)
+        await asyncio.to_thread(escritor_conversaciones.esperar)
+    return resultados
+
+# =============================================================================
+# INFORME Y COMPARACIÓN CON LA BASE
+# =============================================================================
+
+def comparar(resultados: dict, base: dict) -> list:
+    """Líneas del informe y, al final, las regresiones encontradas."""
+    regresiones = []
+    for modo in ("get_response", "process_message"):
+        print(f"\n{modo} ({resultados[modo]['mensajes']} mensajes)")
+        print(f"  {'métrica':<28}{'actual':>12}{'base':>12}{'cambio':>10}")
+        for metrica, tolerancia in TOLERANCIAS.items():
+            actual = resultados[modo][metrica]
+            anterior = base.get(modo, {}).get(metrica)
+            if anterior is None:
+                print(f"  {metrica:<28}{actual:>12}{'-':>12}")
+                continue
+            cambio = (actual - anterior) / anterior if anterior else (1.0 if actual else 0.0)
+            empeoro = cambio > tolerancia and not (metrica.endswith("_ms") and actual - anterior < RUIDO_MS)
+            marca = "  ✗" if empeoro else ""
+            print(f"  {metrica:<28}{actual:>12}{anterior:>12}{cambio:>+10.1%}{marca}")
+            if empeoro:
+                regresiones.append(f"{modo}.{metrica}: {anterior} → {actual} ({cambio:+.1%})")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduce conversaciones contra crud sin Ollama ni MySQL.")
+    parser.add_argument("--sesiones", type=int, default=40, help="sesiones sintéticas (además de las reales)")
+    parser.add_argument("--tokens-por-segundo", type=float, default=0.0,
+                        help="velocidad simulada de la IA (0 = instantánea)")
+    parser.add_argument("--sin-indice", action="store_true",
+                        help="sin el catálogo en memoria: las búsquedas van a la base")
+    parser.add_argument("--guardar-base", action="store_true", help="guarda el resultado como nueva base")
+    argumentos = parser.parse_args()
+
+    resultados = asyncio.run(correr(argumentos))
+
+    # Una base por configuración: solo se comparan corridas equivalentes
+    configuracion = (
+        f"sesiones={argumentos.sesiones} tokens_por_segundo={argumentos.tokens_por_segundo:g} "
+        f"indice={'no' if argumentos.sin_indice else 'si'}"
+    )
+    bases = {}
+    if os.path.exists(BASE):
+        with open(BASE, encoding="utf-8") as f:
+            bases = json.load(f)
+
+    print(f"Configuración: {configuracion}")
+    if argumentos.guardar_base or configuracion not in bases:
+        bases[configuracion] = resultados
+        with open(BASE, "w", encoding="utf-8") as f:
+            json.dump(bases, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write("\n")
+        comparar(resultados, {})
+        print(f"\nBase guardada en {os.path.normpath(BASE)}")
+        return
+
+    regresiones = comparar(resultados, bases[configuracion])
+    if regresiones:
+        print("\n❌ Regresiones respecto de la base:")
+        for regresion in regresiones:
+            print(f"  - {regresion}")
+        sys.exit(1)
+    print("\n✅ Sin regresiones respecto de la base")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+# ollama_simulado.py
+# Servidor compatible con la API de Ollama (/api/generate, /api/chat y
+# /api/tags) para medir el pipeline sin GPU ni los modelos gemma3_input y
+# gemma3_output:
+#  - grabar: hace de proxy contra un Ollama real y guarda cada prompt con su
+#    respuesta, tokens y tiempos (primer token y total) en un archivo JSONL.
+#  - reproducir: devuelve lo grabado con la latencia y la velocidad de tokens
+#    grabadas o las que se configuren, e inyecta errores con la probabilidad
+#    indicada. Lo que no está grabado recibe una respuesta fija.
+#
+# Uso:
+#   python -m benchmarks.ollama_simulado grabar grabaciones.jsonl [--ollama http://localhost:11434] [--puerto 11435]
+#   python -m benchmarks.ollama_simulado reproducir grabaciones.jsonl [--latencia 0.3]
+#       [--tokens-por-segundo 25] [--errores 0.05] [--puerto 11435]
+# y la app (o un benchmark) con OLLAMA_URL=http://127.0.0.1:11435
+
+import argparse
+import hashlib
+import http.client
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+RUTAS = ("/api/generate", "/api/chat")
+
+
+def clave_pedido(ruta: str, cuerpo: dict) -> str:
+    """Identifica un pedido por modelo, prompt (o mensajes) y formato; no por opciones ni keep_alive."""
+    datos = {
+        "ruta": ruta,
+        "modelo": cuerpo.get("model", ""),
+        "prompt": cuerpo.get("prompt"),
+        "mensajes": [(m.get("role"), m.get("content")) for m in cuerpo.get("messages") or []],
+        "system": cuerpo.get("system"),
+        "format": cuerpo.get("format"),
+    }
+    return hashlib.sha1(json.dumps(datos, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def partir_en_tokens(texto: str) -> list:
+    """Trozos de más o menos un token (palabra con su espacio), como los que manda Ollama."""
+    return re.findall(r"\s*\S+\s*", texto) or [texto]
+
+
+def leer_grabaciones(archivo: str) -> dict:
+    """clave → grabación (si un pedido se grabó varias veces, queda la última)."""
+    grabaciones = {}
+    with open(archivo, encoding="utf-8") as f:
+        for linea in f:
+            if linea.strip():
+                grabacion = json.loads(linea)
+                grabaciones[grabacion["clave"]] = grabacion
+    return grabaciones
+
+
+class ErrorSimulado(Exception):
+    def __init__(self, codigo: int, mensaje: str):
+        super().__init__(mensaje)
+        self.codigo = codigo
+
+# =============================================================================
+# SERVIDOR
+# =============================================================================
+
+class OllamaSimulado:
+    """
+    Modo reproducir. Cada pedido a /api/generate o /api/chat se busca en
+    `grabaciones`; si no está, se contesta `respuesta`. La primera consulta a
+    cada modelo tarda además `carga` segundos (como cuando Ollama lo carga en
+    memoria; keep_alive=0 lo descarga).
+
+    latencia: segundos hasta el primer token (None = los grabados).
+    tokens_por_segundo: velocidad de generación (None = la grabada, 0 = todo junto).
+    errores: probabilidad de responder `codigo_error` en lugar del texto.
+    """
+
+    def __init__(self, grabaciones=None, respuesta="ok", latencia=None, tokens_por_segundo=None,
+                 errores=0.0, codigo_error=500, carga=0.0, semilla=None, host="127.0.0.1", puerto=0):
+        self.grabaciones = grabaciones or {}
+        self.respuesta = respuesta
+        self.latencia = latencia
+        self.tokens_por_segundo = tokens_por_segundo
+        self.errores = errores
+        self.codigo_error = codigo_error
+        self.carga = carga
+        self.pedidos = []           # (ruta, cuerpo JSON, puerto del cliente)
+        self.cargados = set()
+        self.metricas = {"reproducidas": 0, "sin_grabacion": 0, "errores": 0}
+        self._azar = random.Random(semilla)
+        self._lock = threading.Lock()
+
+        self._servidor = ThreadingHTTPServer((host, puerto), _manejador(self))
+        self._servidor.daemon_threads = True
+        self.url = f"http://{host}:{self._servidor.server_address[1]}"
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._hilo.start()
+
+    @property
+    def conexiones(self) -> int:
+        return len({puerto for _, _, puerto in self.pedidos})
+
+    def modelos(self) -> list:
+        return sorted({g["modelo"] for g in self.grabaciones.values()} | self.cargados)
+
+    def cargar(self, modelo: str, cuerpo: dict):
+        if modelo not in self.cargados:
+            time.sleep(self.carga)
+            self.cargados.add(modelo)
+        if cuerpo.get("keep_alive") == 0:
+            self.cargados.discard(modelo)
+
+    def atender(self, ruta: str, cuerpo: dict):
+        """Partes de la respuesta (dicts de Ollama), ya esperando lo que corresponde entre una y otra."""
+        grabacion = self.grabaciones.get(clave_pedido(ruta, cuerpo))
+        with self._lock:
+            if self.errores and self._azar.random() < self.errores:
+                self.metricas["errores"] += 1
+                raise ErrorSimulado(self.codigo_error, "error simulado")
+            self.metricas["reproducidas" if grabacion else "sin_grabacion"] += 1
+
+        if grabacion is None:
+            texto, primer_token, segundos_por_token = self.respuesta, 0.0, 0.0
+            eval_count, prompt_eval_count = len(partir_en_tokens(texto)), 1
+        else:
+            texto, primer_token = grabacion["texto"], grabacion.get("primer_token", 0.0)
+            eval_count = grabacion.get("eval_count") or len(partir_en_tokens(texto))
+            prompt_eval_count = grabacion.get("prompt_eval_count", 1)
+            generacion = grabacion.get("duracion", 0.0) - primer_token
+            segundos_por_token = max(generacion, 0.0) / eval_count
+        if self.latencia is not None:
+            primer_token = self.latencia
+        if self.tokens_por_segundo is not None:
+            segundos_por_token = 1 / self.tokens_por_segundo if self.tokens_por_segundo else 0.0
+
+        inicio = time.perf_counter()
+        time.sleep(primer_token)
+        base = {"model": cuerpo.get("model", ""), "created_at": "2025-01-01T00:00:00Z"}
+        for i, trozo in enumerate(partir_en_tokens(texto)):
+            if i:
+                time.sleep(segundos_por_token)
+            yield {**base, **_contenido(ruta, trozo), "done": False}
+        total = int((time.perf_counter() - inicio) * 1e9)
+        yield {
+            **base, **_contenido(ruta, ""), "done": True, "done_reason": "stop",
+            "total_duration": total, "eval_count": eval_count, "prompt_eval_count": prompt_eval_count,
+        }
+
+    def cerrar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+
+class GrabadorOllama(OllamaSimulado):
+    """
+    Modo grabar: reenvía cada pedido al Ollama de `destino`, devuelve la
+    respuesta tal cual llega (en streaming si así se pidió) y agrega una
+    línea por pedido a `archivo`.
+    """
+
+    def __init__(self, archivo: str, destino: str = "http://localhost:11434", **kwargs):
+        self.archivo = archivo
+        self.destino = urlsplit(destino)
+        super().__init__(**kwargs)
+        self.metricas["grabadas"] = 0
+
+    def cargar(self, modelo: str, cuerpo: dict):
+        """La carga la hace el Ollama real."""
+
+    def _conexion(self):
+        return http.client.HTTPConnection(self.destino.hostname, self.destino.port or 11434, timeout=600)
+
+    def atender(self, ruta: str, cuerpo: dict):
+        conexion = self._conexion()
+        try:
+            inicio = time.perf_counter()
+            conexion.request("POST", ruta, json.dumps(cuerpo), {"Content-Type": "application/json"})
+            respuesta = conexion.getresponse()
+            if respuesta.status >= 400:
+                raise ErrorSimulado(respuesta.status, respuesta.read().decode(errors="replace"))
+
+            trozos, primer_token, final = [], None, {}
+            for linea in respuesta:
+                if not linea.strip():
+                    continue
+                parte = json.loads(linea)
+                trozo = parte.get("response", parte.get("message", {}).get("content", ""))
+                if trozo and primer_token is None:
+                    primer_token = time.perf_counter() - inicio
+                trozos.append(trozo)
+                final = parte
+                yield parte
+            duracion = time.perf_counter() - inicio
+        finally:
+            conexion.close()
+
+        self._guardar({
+            "clave": clave_pedido(ruta, cuerpo),
+            "ruta": ruta,
+            "modelo": cuerpo.get("model", ""),
+            "pedido": {k: cuerpo[k] for k in ("prompt", "messages", "system", "format") if k in cuerpo},
+            "texto": "".join(trozos),
+            "primer_token": round(primer_token if primer_token is not None else duracion, 4),
+            "duracion": round(duracion, 4),
+            "eval_count": final.get("eval_count"),
+            "prompt_eval_count": final.get("prompt_eval_count"),
+        })
+
+    def _guardar(self, grabacion: dict):
+        with self._lock:
+            with open(self.archivo, "a", encoding="utf-8") as f:
+                f.write(json.dumps(grabacion, ensure_ascii=False) + "\n")
+            self.grabaciones[grabacion["clave"]] = grabacion
+            self.metricas["grabadas"] += 1
+
+    def modelos(self) -> list:
+        conexion = self._conexion()
+        try:
+            conexion.request("GET", "/api/tags")
+            return [m["name"] for m in json.loads(conexion.getresponse().read()).get("models", [])]
+        finally:
+            conexion.close()
+
+
+def _contenido(ruta: str, texto: str) -> dict:
+    if ruta == "/api/chat":
+        return {"message": {"role": "assistant", "content": texto}}
+    return {"response": texto}
+
+
+def _manejador(servidor: OllamaSimulado):
+    class _Manejador(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"    # conexiones persistentes
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, codigo: int, datos: dict):
+            cuerpo = json.dumps(datos).encode()
+            self.send_response(codigo)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._json(200, {"models": [{"name": m, "model": m} for m in servidor.modelos()]})
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            cuerpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            servidor.pedidos.append((self.path, cuerpo, self.client_address[1]))
+            if self.path not in RUTAS:
+                self._json(404, {"error": "not found"})
+                return
+            servidor.cargar(cuerpo.get("model", ""), cuerpo)
+
+            partes = servidor.atender(self.path, cuerpo)
+            try:
+                primera = next(partes)
+            except ErrorSimulado as e:
+                self._json(e.codigo, {"error": str(e)})
+                return
+            except OSError as e:
+                # Modo grabar con el Ollama real caído
+                self._json(502, {"error": str(e)})
+                return
+
+            if not cuerpo.get("stream", True):
+                # Sin streaming: un solo objeto con el texto completo
+                resto = list(partes)
+                texto = "".join(
+                    p.get("response", p.get("message", {}).get("content", "")) for p in [primera, *resto]
+                )
+                final = resto[-1] if resto else primera
+                self._json(200, {**final, **_contenido(self.path, texto), "done": True})
+                return
+
+            # Streaming NDJSON con transferencia por trozos: el cliente ve el primer token apenas sale
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for parte in (primera, *partes):
+                datos = (json.dumps(parte) + "\n").encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(datos), datos))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+
+    return _Manejador
+
+# =============================================================================
+# LÍNEA DE COMANDOS
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama simulado: graba respuestas reales o las reproduce.")
+    parser.add_argument("modo", choices=("grabar", "reproducir"))
+    parser.add_argument("archivo", help="grabaciones en JSONL")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=11435)
+    parser.add_argument("--ollama", default="http://localhost:11434", help="Ollama real (modo grabar)")
+    parser.add_argument("--latencia", type=float, default=None, help="segundos hasta el primer token")
+    parser.add_argument("--tokens-por-segundo", type=float, default=None, help="0 = todo de una vez")
+    parser.add_argument("--errores", type=float, default=0.0, help="probabilidad de error por pedido (0 a 1)")
+    parser.add_argument("--codigo-error", type=int, default=500)
+    parser.add_argument("--carga", type=float, default=0.0, help="segundos extra del primer pedido a cada modelo")
+    parser.add_argument("--respuesta", default="ok", help="texto para los pedidos que no están grabados")
+    parser.add_argument("--semilla", type=int, default=None, help="para repetir los mismos errores")
+    argumentos = parser.parse_args()
+
+    comunes = {"host": argumentos.host, "puerto": argumentos.puerto}
+    if argumentos.modo == "grabar":
+        servidor = GrabadorOllama(argumentos.archivo, argumentos.ollama, **comunes)
+        print(f"Grabando {argumentos.ollama} en {argumentos.archivo}: OLLAMA_URL={servidor.url}")
+    else:
+        servidor = OllamaSimulado(
+            leer_grabaciones(argumentos.archivo), argumentos.respuesta, argumentos.latencia,
+            argumentos.tokens_por_segundo, argumentos.errores, argumentos.codigo_error,
+            argumentos.carga, argumentos.semilla, **comunes,
+        )
+        print(f"Reproduciendo {len(servidor.grabaciones)} respuestas: OLLAMA_URL={servidor.url}")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.cerrar()
+        print(servidor.metricas)
+
+
+if __name__ == "__main__":
+    main()
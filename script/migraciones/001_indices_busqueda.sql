@@ -0,0 +1,29 @@
+-- 001_indices_busqueda.sql
+-- Índices para las búsquedas de get_product_info (ver app/consultas_catalogo.py).
+-- Antes cada búsqueda recorría completo el join productos × marcas × categorías:
+-- LOWER() sobre las columnas y LIKE '%texto%' no pueden usar ningún índice.
+--
+-- Se aplica una sola vez, después de script/bd.sql:
+--   mysql -u <usuario> -p pp3_proyecto < script/migraciones/001_indices_busqueda.sql
+--
+-- Las collations *_ci ya comparan sin distinguir mayúsculas ni acentos, así que
+-- en marcas y categorías alcanza con el UNIQUE KEY que ya tiene `nombre`
+-- (las consultas dejan de envolverlo en LOWER()).
+
+-- Nombre normalizado del producto, calculado por la base y con su propio índice
+-- (prefijos: "aceite%")
+ALTER TABLE `productos`
+  ADD COLUMN `nombre_busqueda` varchar(255) AS (LOWER(TRIM(`nombre`))) STORED;
+
+ALTER TABLE `productos`
+  ADD KEY `idx_productos_nombre_busqueda` (`nombre_busqueda`);
+
+-- Productos de una categoría ya ordenados por nombre (sin filesort)
+ALTER TABLE `productos`
+  ADD KEY `idx_productos_categoria_nombre` (`categoria_id`, `nombre`);
+
+-- Palabras del nombre y la descripción ("contiene", búsqueda por palabra e ingredientes)
+ALTER TABLE `productos`
+  ADD FULLTEXT KEY `ft_productos_nombre_descripcion` (`nombre`, `descripcion`);
+
+ANALYZE TABLE `productos`, `marcas`, `categorias`;
@@ -0,0 +1,17 @@
+# conftest.py
+# Credenciales ficticias para poder importar app.database sin un .env real
+# (las pruebas no se conectan a MySQL: usan el catálogo en memoria).
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for clave, valor in {
+    "MYSQL_USER": "test",
+    "MYSQL_PASSWORD": "test",
+    "MYSQL_HOST": "127.0.0.1",
+    "MYSQL_PORT": "3306",
+    "MYSQL_DATABASE": "test",
+}.items():
+    os.environ.setdefault(clave, valor)
@@ -0,0 +1,138 @@
+# fakes.py
+# Modelos falsos para probar el pipeline sin Ollama.
+
+import asyncio
+
+from benchmarks.ollama_simulado import OllamaSimulado
+from test_catalogo import PRODUCTOS, CATEGORIAS
+
+
+class Respuesta:
+    """Imita el AIMessage que devuelve ChatOllama."""
+
+    def __init__(self, content):
+        self.content = content
+
+
+class ModeloFalso:
+    """
+    Responde con `responder(prompt)` (o con un texto fijo) después de `demora`
+    segundos. Con chat=True envuelve la respuesta como lo hace ChatOllama.
+    """
+
+    def __init__(self, responder, demora=0.0, chat=False):
+        self.responder = responder
+        self.demora = demora
+        self.chat = chat
+        self.prompts = []
+        self.argumentos = []     # kwargs de cada llamada (format, options, ...)
+
+    @property
+    def llamadas(self):
+        return len(self.prompts)
+
+    async def ainvoke(self, entrada, *args, **kwargs):
+        self.prompts.append(entrada)
+        self.argumentos.append(kwargs)
+        await asyncio.sleep(self.demora() if callable(self.demora) else self.demora)
+        texto = self.responder(entrada) if callable(self.responder) else self.responder
+        return Respuesta(texto) if self.chat else texto
+
+
+def instalar_modelos(monkeypatch, crud, entrada, salida):
+    """Reemplaza los modelos de crud y carga el catálogo de prueba (con sus categorías y marcas) en memoria."""
+    monkeypatch.setattr(crud, "modelo_input", entrada)
+    monkeypatch.setattr(crud, "modelo_output", salida)
+    monkeypatch.setattr(crud, "with_message_history", salida)
+    monkeypatch.setattr(crud.catalogo, "_cargador", lambda: (PRODUCTOS, CATEGORIAS))
+    crud.catalogo.refrescar()
+
+
+class ServidorKVFalso:
+    """
+    Servidor clave-valor local que habla el protocolo de Redis (RESP) con los
+    comandos que usa EstadoKV: PING, AUTH, SELECT, GET, SET [NX] [PX ms], DEL y
+    el EVAL con el que se suelta el bloqueo de una sesión.
+    """
+
+    def __init__(self):
+        import socketserver
+        import threading
+        import time
+
+        datos = self.datos = {}     # clave → (vence, valor)
+        self.comandos = []
+        comandos = self.comandos
+
+        class _Manejador(socketserver.StreamRequestHandler):
+            def _leer_comando(self):
+                linea = self.rfile.readline()
+                if not linea:
+                    return None
+                argumentos = []
+                for _ in range(int(linea[1:-2])):
+                    largo = int(self.rfile.readline()[1:-2])
+                    argumentos.append(self.rfile.read(largo + 2)[:-2])
+                return argumentos
+
+            def handle(self):
+                while True:
+                    argumentos = self._leer_comando()
+                    if argumentos is None:
+                        return
+                    nombre = argumentos[0].decode().upper()
+                    comandos.append(nombre)
+                    if nombre in ("PING", "AUTH", "SELECT"):
+                        self.wfile.write(b"+OK\r\n")
+                    elif nombre == "GET":
+                        vence, valor = datos.get(argumentos[1], (0, None))
+                        if valor is None or (vence and vence <= time.time()):
+                            self.wfile.write(b"$-1\r\n")
+                        else:
+                            self.wfile.write(b"$%d\r\n%s\r\n" % (len(valor), valor))
+                    elif nombre == "SET":
+                        opciones = [a.upper() for a in argumentos[3:]]
+                        vence = 0
+                        if b"PX" in opciones:
+                            vence = time.time() + int(opciones[opciones.index(b"PX") + 1]) / 1000
+                        actual_vence, actual = datos.get(argumentos[1], (0, None))
+                        if b"NX" in opciones and actual is not None and not (actual_vence and actual_vence <= time.time()):
+                            self.wfile.write(b"$-1\r\n")
+                        else:
+                            datos[argumentos[1]] = (vence, argumentos[2])
+                            self.wfile.write(b"+OK\r\n")
+                    elif nombre == "EVAL":
+                        # Solo el script de EstadoKV.liberar: borra la clave si tiene ese valor
+                        clave, token = argumentos[3], argumentos[4]
+                        borrar = datos.get(clave, (0, None))[1] == token
+                        if borrar:
+                            del datos[clave]
+                        self.wfile.write(b":%d\r\n" % int(borrar))
+                    elif nombre == "DEL":
+                        self.wfile.write(b":%d\r\n" % int(datos.pop(argumentos[1], None) is not None))
+                    else:
+                        self.wfile.write(b"-ERR comando desconocido\r\n")
+
+        class _Servidor(socketserver.ThreadingMixIn, socketserver.TCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._servidor = _Servidor(("127.0.0.1", 0), _Manejador)
+        self.url = f"redis://127.0.0.1:{self._servidor.server_address[1]}/0"
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+
+    def cerrar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+
+class ServidorOllamaFalso(OllamaSimulado):
+    """
+    Servidor HTTP local con /api/generate y /api/chat como los de Ollama
+    (respuestas en streaming NDJSON). La primera consulta a cada modelo tarda
+    `carga` segundos, como cuando Ollama lo tiene que cargar en memoria;
+    keep_alive=0 lo descarga. Registra cada pedido y qué conexión lo trajo.
+    """
+
+    def __init__(self, carga=0.0, respuesta="ok"):
+        super().__init__(respuesta=respuesta, latencia=0, tokens_por_segundo=0, carga=carga)
@@ -0,0 +1,108 @@
+# test_cache_deteccion.py
+import time
+
+from app.cache_deteccion import CacheDeteccion, clave_deteccion
+
+DETECCION = {"intencion": "CONSULTAR_INFO", "productos": ["coca"]}
+
+
+def test_la_clave_ignora_acentos_mayusculas_y_signos():
+    assert clave_deteccion("¿Tenés COCA?") == clave_deteccion("tenes coca")
+    assert clave_deteccion("tenes coca", "- Coca Cola 2.25L\n") != clave_deteccion("tenes coca")
+
+
+def test_acierto_y_fallo():
+    cache = CacheDeteccion(max_entradas=10, ttl=60)
+    clave = clave_deteccion("tenés coca?")
+    assert cache.obtener(clave) is None
+    cache.guardar(clave, DETECCION)
+
+    resultado = cache.obtener(clave)
+    assert resultado == DETECCION
+    resultado["productos"].append("sprite")   # no debe alterar lo guardado
+    assert cache.obtener(clave) == DETECCION
+    assert cache.estadisticas()["fallos"] == 1
+    assert cache.estadisticas()["aciertos_memoria"] == 2
+
+
+def test_lru_desaloja_la_menos_usada():
+    cache = CacheDeteccion(max_entradas=2, ttl=60)
+    cache.guardar("a", DETECCION)
+    cache.guardar("b", DETECCION)
+    cache.obtener("a")
+    cache.guardar("c", DETECCION)
+    assert cache.obtener("b") is None
+    assert cache.obtener("a") is not None
+
+
+def test_ttl_vence_las_entradas():
+    cache = CacheDeteccion(max_entradas=10, ttl=0.01)
+    cache.guardar("a", DETECCION)
+    time.sleep(0.02)
+    assert cache.obtener("a") is None
+    assert cache.estadisticas()["vencidos"] == 1
+
+
+def test_nivel_en_disco_sobrevive_reinicios(tmp_path):
+    archivo = str(tmp_path / "deteccion.sqlite")
+    cache = CacheDeteccion(ttl=60, archivo=archivo)
+    cache.guardar("a", DETECCION)
+    cache.cerrar()
+
+    reiniciada = CacheDeteccion(ttl=60, archivo=archivo)
+    assert reiniciada.obtener("a") == DETECCION
+    assert reiniciada.estadisticas()["aciertos_disco"] == 1
+    # Una vez leída del disco queda en memoria
+    reiniciada.obtener("a")
+    assert reiniciada.estadisticas()["aciertos_memoria"] == 1
+
+
+def test_la_copia_incluye_cantidades_y_platos():
+    cache = CacheDeteccion(ttl=60)
+    deteccion = {
+        **DETECCION, "cantidades": {"coca": 2},
+        "platos": {"pizza": {"es_comida": True, "ingredientes": ["harina"]}},
+    }
+    cache.guardar("a", deteccion)
+    deteccion["platos"]["pizza"]["ingredientes"].append("queso")   # el llamador sigue usando su dict
+
+    resultado = cache.obtener("a")
+    resultado["cantidades"]["coca"] = 5
+    resultado["platos"]["pizza"]["es_comida"] = False
+    assert cache.obtener("a")["cantidades"] == {"coca": 2}
+    assert cache.obtener("a")["platos"] == {"pizza": {"es_comida": True, "ingredientes": ["harina"]}}
+
+
+def test_el_disco_se_escribe_fuera_del_event_loop(tmp_path, monkeypatch):
+    import asyncio
+    import threading
+
+    cache = CacheDeteccion(ttl=60, archivo=str(tmp_path / "deteccion.sqlite"))
+    hilos = []
+    disco = cache._disco
+
+    class DiscoMedido:
+        def __getattr__(self, nombre):
+            hilos.append(threading.current_thread())
+            return getattr(disco, nombre)
+
+    monkeypatch.setattr(cache, "_disco", DiscoMedido())
+
+    async def _mensaje():
+        cache.guardar("a", DETECCION)
+        return await cache.aobtener("b")
+
+    assert asyncio.run(_mensaje()) is None
+    cache.cerrar()
+    assert hilos and threading.main_thread() not in hilos
+    assert CacheDeteccion(ttl=60, archivo=str(tmp_path / "deteccion.sqlite")).obtener("a") == DETECCION
+
+
+def test_acierto_en_menos_de_un_milisegundo():
+    cache = CacheDeteccion(ttl=60)
+    clave = clave_deteccion("precio de la leche")
+    cache.guardar(clave, DETECCION)
+    inicio = time.perf_counter()
+    for _ in range(1000):
+        cache.obtener(clave_deteccion("precio de la leche"))
+    assert (time.perf_counter() - inicio) / 1000 < 0.001
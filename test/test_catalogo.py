@@ -0,0 +1,93 @@
+# test_catalogo.py
+from decimal import Decimal
+
+from app.catalogo import IndiceCatalogo, normalizar_texto
+
+CATEGORIAS = [
+    {"id": 1, "nombre": "Lácteos"},
+    {"id": 11, "nombre": "Bebidas sin alcohol"},
+    {"id": 16, "nombre": "Aceites y aderezos"},
+    {"id": 47, "nombre": "Frutas y verduras"},
+]
+
+
+def _fila(pid, nombre, marca, categoria_id, precio):
+    categoria = next(c["nombre"] for c in CATEGORIAS if c["id"] == categoria_id)
+    return {
+        "id": pid, "producto": nombre, "descripcion": None,
+        "precio_costo": Decimal("1.00"), "precio_venta": Decimal(precio), "stock": 10,
+        "marca": marca, "categoria": categoria, "categoria_id": categoria_id,
+    }
+
+
+PRODUCTOS = [
+    _fila(1, "Leche Entera La Serenísima 1L", "La Serenísima", 1, "1200.00"),
+    _fila(2, "Dulce de Leche La Serenísima", "La Serenísima", 1, "2300.00"),
+    _fila(3, "Coca Cola 2.25L", "Coca-Cola", 11, "3100.00"),
+    _fila(4, "Aceite de Girasol Natura", "Natura", 16, "2300.00"),
+    _fila(5, "Aceite de Oliva Lira", "Lira", 16, "5400.00"),
+    _fila(6, "Cebolla", "Verdulería", 47, "168.35"),
+    _fila(7, "Cebolla de Verdeo", "Verdulería", 47, "228.26"),
+]
+
+
+def _indice(productos=PRODUCTOS, categorias=CATEGORIAS):
+    estado = {"productos": productos, "categorias": categorias}
+    indice = IndiceCatalogo(cargador=lambda: (estado["productos"], estado["categorias"]))
+    indice.refrescar()
+    return indice, estado
+
+
+def _nombres(filas):
+    return [f["producto"] for f in filas]
+
+
+def test_normalizar_texto_quita_acentos_y_mayusculas():
+    assert normalizar_texto("  LÁCTEOS   Frescos ") == "lacteos frescos"
+
+
+def test_categoria_exacta_sin_importar_acentos():
+    indice, _ = _indice()
+    categoria, productos = indice.buscar_categoria("lacteos")
+    assert categoria["nombre"] == "Lácteos"
+    assert _nombres(productos) == ["Dulce de Leche La Serenísima", "Leche Entera La Serenísima 1L"]
+
+
+def test_prefijo_busca_en_nombre_marca_y_categoria():
+    indice, _ = _indice()
+    assert _nombres(indice.buscar_por_prefijo("aceite")) == [
+        "Aceite de Girasol Natura", "Aceite de Oliva Lira",
+    ]
+    # "la" es prefijo de la marca "La Serenísima"
+    assert set(_nombres(indice.buscar_por_prefijo("la"))) == {
+        "Leche Entera La Serenísima 1L", "Dulce de Leche La Serenísima",
+    }
+    # "bebidas" es prefijo de la categoría
+    assert _nombres(indice.buscar_por_prefijo("bebidas")) == ["Coca Cola 2.25L"]
+
+
+def test_contiene_excluye_los_que_empiezan_igual():
+    indice, _ = _indice()
+    assert _nombres(indice.buscar_contiene("leche")) == ["Dulce de Leche La Serenísima"]
+    assert _nombres(indice.buscar_contiene("girasol natura")) == ["Aceite de Girasol Natura"]
+
+
+def test_por_palabra_completa():
+    indice, _ = _indice()
+    assert _nombres(indice.buscar_por_palabra("cebolla")) == ["Cebolla", "Cebolla de Verdeo"]
+    assert _nombres(indice.buscar_por_palabra("verdeo")) == ["Cebolla de Verdeo"]
+    assert indice.buscar_por_palabra("cebo") == []
+
+
+def test_refresco_incremental_no_altera_la_instantanea_anterior():
+    indice, estado = _indice()
+    anterior = indice._actual
+
+    estado["productos"] = PRODUCTOS[1:] + [_fila(8, "Leche Descremada Sancor", "Sancor", 1, "1100.00")]
+    indice.refrescar()
+
+    assert _nombres(indice.buscar_por_prefijo("leche")) == ["Leche Descremada Sancor"]
+    assert "Leche Entera La Serenísima 1L" in [f["producto"] for f in anterior.filas.values()]
+    assert 8 not in anterior.filas
+    # Las filas sin cambios se reutilizan tal cual
+    assert indice._actual.filas[3] is anterior.filas[3]
@@ -0,0 +1,132 @@
+# test_consultas_catalogo.py
+import asyncio
+import os
+import random
+
+import pytest
+
+from app import crud
+from app.consultas_catalogo import (
+    QUERY_CATEGORIA, QUERY_PRODUCTOS_CATEGORIA, QUERY_PREFIJO, QUERY_PALABRAS, QUERY_CONTIENE,
+    escapar_like, filtrar_contiene, filtrar_por_palabra, texto_fulltext, texto_fulltext_varios,
+)
+
+CONSULTAS = [QUERY_CATEGORIA, QUERY_PRODUCTOS_CATEGORIA, QUERY_PREFIJO, QUERY_PALABRAS, QUERY_CONTIENE]
+
+
+def test_texto_fulltext():
+    assert texto_fulltext("Aceite de Oliva") == "+aceite* +oliva*"
+    assert texto_fulltext("Café (molido)") == "+cafe* +molido*"
+    assert texto_fulltext("la de 1l") is None
+    assert texto_fulltext_varios(["harina", "aceite de oliva", "sal"]) == "(+harina*) (+aceite* +oliva*) (+sal*)"
+
+
+def test_escapar_like():
+    assert escapar_like("50%_off") == "50\\%\\_off"
+
+
+def test_consultas_no_anulan_los_indices():
+    for consulta in CONSULTAS:
+        assert "LOWER(" not in consulta
+        assert "precio_costo" not in consulta
+
+
+def test_filtros_mantienen_la_semantica_anterior():
+    filas = [{"producto": "Aceite de Oliva Lira"}, {"producto": "Oliva Negra"}, {"producto": "Olivares"}]
+    assert filtrar_contiene(filas, "oliva") == [{"producto": "Aceite de Oliva Lira"}]
+    assert filtrar_por_palabra(filas, "oliva") == [{"producto": "Aceite de Oliva Lira"}, {"producto": "Oliva Negra"}]
+    # Dentro de una palabra también cuenta, como con LIKE '%x%'
+    assert filtrar_contiene([{"producto": "Gaseosa Cocacola"}, {"producto": "Chocolate"}], "cola") == [
+        {"producto": "Gaseosa Cocacola"}, {"producto": "Chocolate"},
+    ]
+
+
+@pytest.mark.parametrize("texto, producto", [("cola", "Gaseosa Cocacola 2L"), ("late", "Chocolate Aguila")])
+def test_contiene_dentro_de_una_palabra_vuelve_a_like(monkeypatch, sin_catalogo, texto, producto):
+    llamadas = []
+
+    async def consulta_falsa(query, params=()):
+        llamadas.append(query)
+        if query == QUERY_CONTIENE:
+            return [{"id": 1, "producto": producto, "descripcion": None, "precio_venta": 100}]
+        return []     # FULLTEXT con "+cola*" no encuentra "cocacola"
+
+    monkeypatch.setattr(crud, "ejecutar_consulta_async", consulta_falsa)
+    resultado = asyncio.run(crud.buscar_en_bd(texto, "consultas-bd"))
+    assert [f["producto"] for f in resultado] == [producto]
+    assert llamadas == [QUERY_CATEGORIA, QUERY_PREFIJO, QUERY_PALABRAS, QUERY_CONTIENE]
+
+    llamadas.clear()
+    assert [f["producto"] for f in asyncio.run(crud.buscar_varios_en_bd([texto]))[texto]] == [producto]
+    assert llamadas == [QUERY_PALABRAS, QUERY_CONTIENE]
+
+
+@pytest.fixture
+def sin_catalogo(monkeypatch):
+    """Sin el índice en memoria (puede haberlo cargado otra prueba): todo va a la base."""
+    monkeypatch.setattr(crud.catalogo, "_actual", None)
+
+
+def test_buscar_en_bd_usa_las_consultas_indexadas(monkeypatch, sin_catalogo):
+    llamadas = []
+
+    async def consulta_falsa(query, params=()):
+        llamadas.append((query, params))
+        if query == QUERY_PALABRAS:
+            return [{"id": 1, "producto": "Aceite de Oliva Lira", "descripcion": None, "precio_venta": 5400}]
+        return []
+
+    monkeypatch.setattr(crud, "ejecutar_consulta_async", consulta_falsa)
+    resultado = asyncio.run(crud.buscar_en_bd("aceite de oliva", "consultas-bd", solo_nombre=True))
+
+    assert [f["producto"] for f in resultado] == ["Aceite de Oliva Lira"]
+    assert llamadas == [
+        (QUERY_CATEGORIA, ("aceite de oliva",)),
+        (QUERY_PALABRAS, ("+aceite* +oliva*",)),
+    ]
+
+# =============================================================================
+# EXPLAIN contra un MySQL real (opcional: PRUEBAS_MYSQL=1 con las credenciales
+# del .env; crea y borra una base descartable)
+# =============================================================================
+
+requiere_mysql = pytest.mark.skipif(not os.getenv("PRUEBAS_MYSQL"), reason="sin PRUEBAS_MYSQL")
+
+
+@pytest.fixture(scope="module")
+def cursor_migrado():
+    from app.database import engine
+    from benchmarks.bench_consultas_bd import crear_base, cargar_datos, aplicar_migracion, ejecutar
+
+    base = "pp3_pruebas_explain"
+    conexion = engine.raw_connection()
+    cursor = conexion.cursor()
+    try:
+        crear_base(cursor, base)
+        cargar_datos(cursor, 5000, random.Random(1))
+        conexion.commit()
+        aplicar_migracion(cursor)
+        yield cursor
+    finally:
+        ejecutar(cursor, f"DROP DATABASE IF EXISTS `{base}`")
+        cursor.close()
+        conexion.close()
+
+
+@requiere_mysql
+@pytest.mark.parametrize("consulta, params", [
+    (QUERY_CATEGORIA, ("lácteos",)),
+    (QUERY_PRODUCTOS_CATEGORIA, (61,)),
+    (QUERY_PREFIJO, ("yerba%", "yerba%", "yerba%")),
+    (QUERY_PALABRAS, ("+aceite* +oliva*",)),
+])
+def test_explain_sin_recorridos_completos(cursor_migrado, consulta, params):
+    from benchmarks.bench_consultas_bd import explicar
+
+    plan = explicar(cursor_migrado, consulta, params)
+    # Las tablas derivadas del UNION (<derived2>, <union2,3,4>) son temporales chicas
+    tablas = [f for f in plan if f["table"] and not f["table"].startswith("<")]
+    assert tablas
+    for fila in tablas:
+        assert fila["type"] != "ALL", plan
+        assert fila["key"], plan
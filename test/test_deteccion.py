@@ -0,0 +1,78 @@
+# test_deteccion.py
+import asyncio
+import json
+
+import pytest
+
+from app import crud
+from app.deteccion import ESQUEMA_DETECCION, interpretar, interpretar_json, se_puede_guardar
+from app.recetas import BaseRecetas
+from fakes import ModeloFalso, instalar_modelos
+
+
+def _json(**campos):
+    return json.dumps(campos, ensure_ascii=False)
+
+
+def test_productos_con_y_no_se_parten():
+    deteccion = interpretar(_json(
+        intencion="AGREGAR_PRODUCTO",
+        productos=[
+            {"nombre": "Dulce de leche y crema", "cantidad": 2, "es_comida": False, "ingredientes": []},
+            {"nombre": "yerba", "cantidad": 1, "es_comida": False, "ingredientes": []},
+        ],
+        confianza=0.93,
+    ))
+    assert deteccion["intencion"] == "AGREGAR_PRODUCTO"
+    assert deteccion["productos"] == ["dulce de leche y crema", "yerba"]
+    assert deteccion["cantidades"] == {"dulce de leche y crema": 2, "yerba": 1}
+    assert deteccion["confianza"] == 0.93
+
+
+def test_campos_faltantes_o_invalidos():
+    deteccion = interpretar_json('<think>...</think> {"intencion": "consultar_info", '
+                                 '"productos": ["Pizza", {"nombre": "locro", "cantidad": 0, "es_comida": true,'
+                                 ' "ingredientes": ["Maíz", "zapallo", "maíz"]}], "confianza": 7}')
+    assert deteccion["productos"] == ["pizza", "locro"]
+    assert deteccion["cantidades"] == {"pizza": 1, "locro": 1}
+    assert deteccion["platos"] == {"locro": {"es_comida": True, "ingredientes": ["maíz", "zapallo"]}}
+    assert deteccion["confianza"] == 1.0
+
+    assert interpretar_json('{"intencion": "COMPRAR", "productos": []}') is None
+    assert interpretar_json("no es json") is None
+
+
+def test_texto_libre_como_respaldo():
+    deteccion = interpretar("Intención detectada: CONSULTAR_INFO\nProductos mencionados: coca y sprite")
+    assert deteccion["intencion"] == "CONSULTAR_INFO"
+    assert deteccion["productos"] == ["coca", "sprite"]
+    assert deteccion["confianza"] is None
+
+
+def test_solo_se_cachean_las_detecciones_seguras():
+    assert se_puede_guardar({"intencion": "CHARLAR", "confianza": 0.9})
+    assert se_puede_guardar({"intencion": "CHARLAR", "confianza": None})
+    assert not se_puede_guardar({"intencion": "CHARLAR", "confianza": 0.2})
+    assert not se_puede_guardar({"intencion": None, "confianza": 1.0})
+
+
+@pytest.fixture
+def entrada(monkeypatch, tmp_path):
+    monkeypatch.setattr(crud, "base_recetas", BaseRecetas(archivo=str(tmp_path / "recetas.json")))
+    entrada = ModeloFalso(_json(
+        intencion="CONSULTAR_INFO",
+        productos=[{"nombre": "carbonada", "cantidad": 1, "es_comida": True, "ingredientes": ["cebolla", "aceite"]}],
+        confianza=0.9,
+    ))
+    instalar_modelos(monkeypatch, crud, entrada, ModeloFalso("Mirá lo que tenemos", chat=True))
+    return entrada
+
+
+def test_una_sola_llamada_para_intencion_comida_e_ingredientes(entrada):
+    asyncio.run(crud.get_response("tenés carbonada?", "deteccion-1"))
+
+    assert entrada.llamadas == 1
+    assert entrada.argumentos[0]["format"] == ESQUEMA_DETECCION
+    assert crud.base_recetas.obtener("carbonada")["ingredientes"] == ["cebolla", "aceite"]
+    mostrados = crud.get_datos_traidos_desde_bd("deteccion-1")["productos_mostrados"]["carbonada"]
+    assert "Cebolla" in [p["producto"] for p in mostrados]
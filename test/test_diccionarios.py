@@ -0,0 +1,74 @@
+# test_diccionarios.py
+import asyncio
+
+from app import crud
+from app.diccionarios import AhoCorasick, Diccionarios
+from fakes import ModeloFalso, instalar_modelos
+from test_catalogo import PRODUCTOS, _fila, _indice
+
+CATEGORIAS = [{"id": 1, "nombre": "Lácteos"}, {"id": 11, "nombre": "Bebidas sin alcohol"}, {"id": 12, "nombre": "Bebidas"}]
+
+
+def _diccionarios(productos=PRODUCTOS):
+    indice, estado = _indice(productos, CATEGORIAS)
+    return Diccionarios(indice), indice, estado
+
+
+def test_aho_corasick_palabras_completas_y_la_mas_larga():
+    automata = AhoCorasick({"he": "he", "she": "she", "hers": "hers", "bebidas": "b", "bebidas sin alcohol": "bsa"})
+    assert [v for _, _, v in automata.buscar("she hers")] == ["she", "hers"]
+    # "he" dentro de "she" no cuenta: no es una palabra completa
+    assert [v for _, _, v in automata.buscar("ushers")] == []
+    assert [v for _, _, v in automata.buscar("bebidas sin alcohol y bebidas")] == ["bsa", "b"]
+
+
+def test_busquedas_exactas_sin_acentos():
+    dic, _, _ = _diccionarios()
+    assert dic.categoria("LACTEOS") == {"id": 1, "nombre": "Lácteos"}
+    assert dic.marca("la serenisima") == {"nombre": "La Serenísima"}
+    assert dic.categoria("lacteo") is None
+
+
+def test_menciones_en_cualquier_parte_del_mensaje():
+    dic, _, _ = _diccionarios()
+    menciones = dic.menciones("¿Qué tenés de lácteos de La Serenísima y Coca-Cola?")
+    assert [(m["tipo"], m["nombre"]) for m in menciones] == [
+        ("categoria", "Lácteos"), ("marca", "La Serenísima"), ("marca", "Coca-Cola"),
+    ]
+    assert dic.primera_categoria("mostrame las bebidas sin alcohol")["id"] == 11
+    assert dic.primera_categoria("tenés naturales?") is None
+
+
+def test_se_actualizan_con_el_refresco_del_catalogo():
+    dic, indice, estado = _diccionarios()
+    assert dic.totales() == {"categorias": 3, "marcas": 5}
+    anteriores = indice._actual.diccionarios
+
+    # Cambian precios y stock: el autómata se reusa
+    estado["productos"] = [dict(p, stock=1) for p in PRODUCTOS]
+    indice.refrescar()
+    assert indice._actual.diccionarios is anteriores
+
+    estado["categorias"] = CATEGORIAS + [{"id": 20, "nombre": "Congelados"}]
+    estado["productos"] = PRODUCTOS + [_fila(8, "Yerba Playadito", "Playadito", 1, "3000.00")]
+    indice.refrescar()
+    assert dic.categoria("congelados")["id"] == 20
+    assert dic.menciones("tenés playadito?")[0]["nombre"] == "Playadito"
+    assert dic.totales() == {"categorias": 4, "marcas": 6}
+
+
+def test_categoria_en_el_mensaje_sin_consultar_la_bd(monkeypatch):
+    entrada = ModeloFalso("Intención detectada: CONSULTAR_INFO\nProductos mencionados: ninguno")
+    salida = ModeloFalso("¡Hay varios lácteos! 🥛", chat=True)
+    instalar_modelos(monkeypatch, crud, entrada, salida)
+
+    async def sin_bd(*args, **kwargs):
+        raise AssertionError("no debería consultar la BD")
+
+    monkeypatch.setattr(crud, "ejecutar_consulta_async", sin_bd)
+    asyncio.run(crud.get_response("qué hay en lácteos para el desayuno?", "diccionarios-categoria"))
+
+    mostrados = crud.get_datos_traidos_desde_bd("diccionarios-categoria")["productos_mostrados"]
+    assert [p["producto"] for p in mostrados["lácteos"]] == [
+        "Dulce de Leche La Serenísima", "Leche Entera La Serenísima 1L",
+    ]
@@ -0,0 +1,92 @@
+# test_difuso.py
+import asyncio
+
+import pytest
+
+from app import crud
+from app.difuso import IndiceDifuso, distancia_acotada, plegar
+from fakes import ModeloFalso, instalar_modelos
+from test_catalogo import _fila, _indice, PRODUCTOS
+
+NOMBRES = [
+    "Yerba Mate Playadito 1kg", "Galletitas Oreo 118g", "Coca-Cola", "Coca Cola 2.25L",
+    "Aceite de Girasol Natura", "Cebolla", "Arvejas Secas Inalpa", "Queso Cremoso",
+]
+
+
+@pytest.mark.parametrize("a, b", [
+    ("yerva", "yerba"), ("aseite", "aceite"), ("zebolla", "cebolla"),
+    ("cocacola", "coca-cola"), ("Coca Cola", "kokakola"), ("keso", "queso"), ("Arbejas", "arvejas"),
+])
+def test_plegado_fonetico(a, b):
+    assert plegar(a).replace(" ", "") == plegar(b).replace(" ", "")
+
+
+def test_distancia_acotada():
+    assert distancia_acotada("oreos", "oreo", 1) == 1
+    assert distancia_acotada("galetitas", "galletitas", 2) == 1
+    assert distancia_acotada("aceiet", "aceite", 1) == 1    # transposición
+    assert distancia_acotada("yogur", "manteca", 2) == 3     # corta apenas se pasa
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("yerva", "yerba"),
+    ("cocacola", "coca cola"),
+    ("galletitas oreos", "galletitas oreo"),
+    ("aseite de jirasol", "aceite de girasol"),
+    ("galetitas", "galletitas"),
+])
+def test_corrige_contra_el_vocabulario(texto, esperado):
+    assert IndiceDifuso(NOMBRES).corregir(texto) == esperado
+
+
+def test_no_corrige_lo_que_esta_bien_ni_lo_que_no_se_parece():
+    indice = IndiceDifuso(NOMBRES)
+    assert indice.corregir("yerba") is None
+    assert indice.corregir("caviar") is None
+    # Las palabras cortas solo se corrigen si coinciden al plegarlas
+    assert indice.corregir("pizza") is None
+
+
+def test_catalogo_reusa_el_vocabulario_si_no_cambian_los_nombres():
+    indice, estado = _indice()
+    # El vocabulario ya viene armado con la instantánea, no en la primera búsqueda
+    vocabulario = indice._actual.difuso
+    assert vocabulario is not None
+    assert indice.corregir("aseite") == "aceite"
+
+    estado["productos"] = [dict(p, stock=1) for p in PRODUCTOS]
+    indice.refrescar()
+    assert indice._actual.difuso is vocabulario
+
+    estado["productos"] = PRODUCTOS + [_fila(8, "Yerba Playadito", "Playadito", 16, "3000.00")]
+    indice.refrescar()
+    assert indice._actual.difuso is not vocabulario
+    assert indice.corregir("yerva") == "yerba"
+
+
+def test_consulta_con_error_de_tipeo_no_pregunta_si_es_comida(monkeypatch):
+    entrada = ModeloFalso("Intención detectada: CONSULTAR_INFO\nProductos mencionados: zebolla")
+    salida = ModeloFalso("Tenemos cebolla 🧅", chat=True)
+    instalar_modelos(monkeypatch, crud, entrada, salida)
+
+    asyncio.run(crud.get_response("tenes zebolla?", "difuso-consulta"))
+
+    mostrados = crud.get_datos_traidos_desde_bd("difuso-consulta")["productos_mostrados"]
+    assert [p["producto"] for p in mostrados["zebolla"]] == ["Cebolla", "Cebolla de Verdeo"]
+    # Solo la detección de intención: sin "¿es una comida?"
+    assert entrada.llamadas == 1
+
+
+def test_lo_guardado_como_no_comida_se_sigue_corrigiendo(monkeypatch, tmp_path):
+    from app.recetas import BaseRecetas
+
+    instalar_modelos(monkeypatch, crud, ModeloFalso(""), ModeloFalso("", chat=True))
+    recetas = BaseRecetas(archivo=str(tmp_path / "recetas.json"))
+    monkeypatch.setattr(crud, "base_recetas", recetas)
+
+    recetas.registrar_no_comida("aseite")
+    assert isinstance(crud.buscar_en_catalogo("aseite", "difuso-no-comida"), list)
+    # Un plato conocido no se corrige hacia otro producto
+    recetas.registrar("aseite", ["aceite"])
+    assert isinstance(crud.buscar_en_catalogo("aseite", "difuso-no-comida"), str)
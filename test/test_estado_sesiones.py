@@ -0,0 +1,145 @@
+# test_estado_sesiones.py
+import asyncio
+import time
+from decimal import Decimal
+
+import pytest
+
+from app import crud
+from app.estado_sesiones import EstadoKV, EstadoMemoria, EstadoSQLite, deserializar, serializar
+from app.gestor_sesiones import GestorSesiones, gestor_sesiones
+from app.pedidos import Pedido
+from fakes import ModeloFalso, ServidorKVFalso, instalar_modelos
+from test_catalogo import PRODUCTOS
+
+
+@pytest.fixture
+def servidor_kv():
+    servidor = ServidorKVFalso()
+    yield servidor
+    servidor.cerrar()
+
+
+@pytest.fixture(params=["memoria", "sqlite", "kv"])
+def backend(request, tmp_path):
+    if request.param == "memoria":
+        yield EstadoMemoria()
+    elif request.param == "sqlite":
+        estado = EstadoSQLite(str(tmp_path / "estado.db"))
+        yield estado
+        estado.cerrar()
+    else:
+        servidor = ServidorKVFalso()
+        estado = EstadoKV(servidor.url)
+        yield estado
+        estado.cerrar()
+        servidor.cerrar()
+
+
+def test_serializacion_compacta_conserva_los_decimales():
+    estado = {"d": {"productos_mostrados": {"leche": PRODUCTOS[:3]}, "producto_actual": PRODUCTOS[0]}, "p": []}
+    datos = serializar(estado)
+    assert deserializar(datos) == estado
+    assert isinstance(deserializar(datos)["d"]["producto_actual"]["precio_venta"], Decimal)
+    assert datos[:1] == b"z"
+    assert serializar({"p": []}) == b'j{"p":[]}'
+
+
+def test_backends_leer_escribir_borrar(backend):
+    assert backend.leer("s1") is None
+    backend.escribir("s1", b"j{}")
+    backend.escribir("s2", b"z\x00\xff")
+    assert backend.leer("s1") == b"j{}"
+    assert backend.leer("s2") == b"z\x00\xff"
+    backend.borrar("s1")
+    assert backend.leer("s1") is None
+
+
+def test_kv_reconecta_si_se_corta_la_conexion(servidor_kv):
+    estado = EstadoKV(servidor_kv.url)
+    estado.escribir("s", b"j{}")
+    estado._socket.close()
+    assert estado.leer("s") == b"j{}"
+
+
+def test_dos_workers_comparten_el_carrito(monkeypatch, servidor_kv):
+    instalar_modelos(
+        monkeypatch, crud,
+        ModeloFalso("Intención detectada: CONSULTAR_INFO\nProductos mencionados: aceite"),
+        ModeloFalso("Listo 👌", chat=True),
+    )
+    monkeypatch.setattr(gestor_sesiones, "backend", EstadoKV(servidor_kv.url))
+
+    asyncio.run(crud.get_response("tenes aceite?", "multi-1"))
+    asyncio.run(crud.get_response("agregame 2 aceite de girasol", "multi-1"))
+    # Por mensaje: tomar el bloqueo, una lectura, una escritura y soltar el bloqueo
+    assert servidor_kv.comandos == ["SET", "GET", "SET", "EVAL"] * 2
+    # El estado no queda en el proceso: lo puede atender cualquier worker
+    assert "multi-1" not in gestor_sesiones.pedidos and "multi-1" not in crud.store
+
+    otro_worker = GestorSesiones(backend=EstadoKV(servidor_kv.url))
+    otro_worker.fabrica_historial = crud.nuevo_historial
+    otro_worker.fabrica_pedido = Pedido.desde_lista
+
+    async def _mensaje():
+        async with otro_worker.en_uso("multi-1"):
+            assert otro_worker.pedidos["multi-1"].buscar("Aceite de Girasol Natura").cantidad == 2
+            assert "aceite" in otro_worker.datos["multi-1"]["productos_mostrados"]
+
+    asyncio.run(_mensaje())
+
+
+@pytest.fixture(params=["memoria", "sqlite", "kv"])
+def dos_workers(request, tmp_path):
+    """Dos gestores con su propia conexión al mismo estado, como dos procesos de uvicorn."""
+    if request.param == "memoria":
+        compartido = EstadoMemoria()
+        backends = [compartido, compartido]
+    elif request.param == "sqlite":
+        backends = [EstadoSQLite(str(tmp_path / "estado.db")) for _ in range(2)]
+    else:
+        servidor = ServidorKVFalso()
+        backends = [EstadoKV(servidor.url) for _ in range(2)]
+    yield [GestorSesiones(backend=b) for b in backends]
+    for b in backends:
+        b.cerrar()
+    if request.param == "kv":
+        servidor.cerrar()
+
+
+def test_mensajes_simultaneos_en_dos_workers_no_pierden_lineas(dos_workers):
+    primero, segundo = dos_workers
+
+    async def _agregar(gestor, producto, adentro=None):
+        async with gestor.en_uso("mismo-numero"):
+            if adentro is not None:
+                adentro.set()
+            pedido = gestor.pedidos.setdefault("mismo-numero", [])
+            await asyncio.sleep(0.1)       # la IA tarda mientras el otro worker recibe su mensaje
+            pedido.append({"producto": producto, "cantidad": 1})
+
+    async def _intercalados():
+        adentro = asyncio.Event()
+        tarea = asyncio.create_task(_agregar(primero, "Yerba", adentro))
+        await adentro.wait()
+        await _agregar(segundo, "Leche")
+        await tarea
+
+    asyncio.run(_intercalados())
+
+    async def _leer():
+        async with primero.en_uso("mismo-numero"):
+            return [linea["producto"] for linea in primero.pedidos["mismo-numero"]]
+
+    assert asyncio.run(_leer()) == ["Yerba", "Leche"]
+
+
+def test_bloqueo_vencido_se_puede_tomar(backend):
+    assert backend.bloquear("s", "a", ms=50)
+    assert not backend.bloquear("s", "b", ms=50)
+    backend.liberar("s", "b")              # no es suyo: no lo suelta
+    assert not backend.bloquear("s", "b", ms=50)
+    time.sleep(0.1)
+    assert backend.bloquear("s", "b", ms=50)
+    backend.liberar("s", "b")
+    assert backend.bloquear("s", "c")
@@ -0,0 +1,137 @@
+# test_gestor_sesiones.py
+import asyncio
+import threading
+
+from app import crud
+from app.gestor_sesiones import GestorSesiones, gestor_sesiones
+from fakes import ModeloFalso, instalar_modelos
+
+CARRITO = [{"producto": "Yerba Playadito 1kg", "cantidad": 2, "precio_unitario": 3500.0, "subtotal": 7000.0}]
+
+
+def _usar(gestor, session_id, pedido=None):
+    async def _mensaje():
+        async with gestor.en_uso(session_id):
+            gestor.historiales.setdefault(session_id, ["hola"])
+            gestor.datos.setdefault(session_id, {"productos_mostrados": {}})
+            if pedido is not None:
+                gestor.pedidos[session_id] = list(pedido)
+
+    asyncio.run(_mensaje())
+
+
+def test_lru_desaloja_la_menos_usada_y_guarda_su_carrito(tmp_path):
+    gestor = GestorSesiones(max_sesiones=2, ttl=0, carpeta=str(tmp_path))
+    _usar(gestor, "a", CARRITO)
+    _usar(gestor, "b")
+    _usar(gestor, "c")
+
+    assert "a" not in gestor.historiales and "a" not in gestor.pedidos
+    assert set(gestor.historiales) == {"b", "c"}
+    assert gestor.carritos_en_disco() == 1
+
+    # El próximo mensaje de "a" recupera el carrito
+    async def _mensaje():
+        async with gestor.en_uso("a"):
+            assert gestor.pedidos["a"] == CARRITO
+
+    asyncio.run(_mensaje())
+    assert gestor.carritos_en_disco() == 0
+    assert gestor.metricas["desalojadas_lru"] == 2
+
+
+def test_ttl_desaloja_inactivas_pero_no_las_que_estan_en_uso(tmp_path, monkeypatch):
+    gestor = GestorSesiones(max_sesiones=0, ttl=60, carpeta=str(tmp_path))
+    _usar(gestor, "vieja")
+    reloj = {"ahora": 1000.0}
+    monkeypatch.setattr("app.gestor_sesiones.time.monotonic", lambda: reloj["ahora"])
+    gestor._accesos["vieja"] = 0.0
+
+    async def _mensaje():
+        async with gestor.en_uso("ocupada"):
+            # Al entrar un mensaje se desalojan las vencidas
+            assert "vieja" not in gestor._accesos
+            gestor._accesos["ocupada"] = 0.0
+            assert gestor.desalojar() == 0
+            assert "ocupada" in gestor._accesos
+
+    asyncio.run(_mensaje())
+    assert gestor.metricas["desalojadas_ttl"] == 1
+
+
+def test_el_disco_no_se_toca_desde_el_event_loop(tmp_path, monkeypatch):
+    gestor = GestorSesiones(max_sesiones=1, ttl=0, carpeta=str(tmp_path))
+    hilos = []
+    for nombre in ("_guardar_carrito", "_recuperar_carrito"):
+        original = getattr(gestor, nombre)
+
+        def _registrar(*args, _original=original):
+            hilos.append(threading.current_thread())
+            return _original(*args)
+
+        monkeypatch.setattr(gestor, nombre, _registrar)
+
+    _usar(gestor, "a", CARRITO)
+    _usar(gestor, "b")
+    assert gestor.carritos_en_disco() == 1
+    assert hilos and threading.main_thread() not in hilos
+
+
+def test_sesion_que_vuelve_mientras_se_escribe_su_carrito(tmp_path):
+    gestor = GestorSesiones(max_sesiones=0, ttl=0, carpeta=str(tmp_path))
+    _usar(gestor, "a", CARRITO)
+    # Desalojo a medio terminar: ya salió de memoria pero el carrito no llegó al disco
+    with gestor._lock:
+        gestor._quitar("a")
+    assert "a" not in gestor.pedidos and gestor.carritos_en_disco() == 0
+
+    async def _mensaje():
+        async with gestor.en_uso("a"):
+            assert gestor.pedidos["a"] == CARRITO
+            assert gestor.historiales["a"] == ["hola"]
+
+    asyncio.run(_mensaje())
+    # El desalojo termina de escribir y ve que la sesión volvió: no deja el archivo
+    assert gestor._escribir_saliente("a") is True
+    assert gestor.carritos_en_disco() == 0
+
+
+def test_sin_disco_la_sesion_no_se_desaloja(tmp_path):
+    carpeta = tmp_path / "no-es-carpeta"
+    carpeta.write_text("")
+    gestor = GestorSesiones(max_sesiones=1, ttl=0, carpeta=str(carpeta))
+    _usar(gestor, "a", CARRITO)
+    _usar(gestor, "b")
+
+    assert gestor.pedidos["a"] == CARRITO and gestor.historiales["a"] == ["hola"]
+    assert gestor.metricas["desalojadas_lru"] == 0
+
+
+def test_memoria_por_sesion(tmp_path):
+    gestor = GestorSesiones(carpeta=str(tmp_path))
+    _usar(gestor, "chica")
+    _usar(gestor, "grande", CARRITO * 50)
+
+    memoria = gestor.memoria()
+    assert memoria["sesiones"] == 2
+    assert [f["session_id"] for f in memoria["por_sesion"]] == ["grande", "chica"]
+    assert memoria["total_bytes"] == sum(f["total_bytes"] for f in memoria["por_sesion"])
+    assert memoria["por_sesion"][0]["pedido_bytes"] > memoria["por_sesion"][1]["pedido_bytes"]
+
+
+def test_carrito_sobrevive_al_desalojo_en_el_flujo_real(monkeypatch, tmp_path):
+    instalar_modelos(
+        monkeypatch, crud,
+        ModeloFalso("Intención detectada: CONSULTAR_INFO\nProductos mencionados: aceite"),
+        ModeloFalso("Listo 👌", chat=True),
+    )
+    monkeypatch.setattr(gestor_sesiones, "max_sesiones", 1)
+    monkeypatch.setattr(gestor_sesiones, "carpeta", str(tmp_path))
+
+    asyncio.run(crud.get_response("tenes aceite?", "desalojo-1"))
+    asyncio.run(crud.get_response("agregame 2 aceite de girasol", "desalojo-1"))
+    asyncio.run(crud.get_response("hola", "desalojo-2"))
+    assert "desalojo-1" not in crud.store
+
+    respuesta = asyncio.run(crud.get_response("ver mi pedido", "desalojo-1"))
+    assert "Aceite de Girasol Natura" in respuesta
@@ -0,0 +1,87 @@
+# test_grafo.py
+import asyncio
+import time
+
+import pytest
+
+from app.grafo import Grafo, en_paralelo
+
+
+def _demora(valor, segundos=0.1, registro=None):
+    async def _paso(*argumentos):
+        if registro is not None:
+            registro.append(("inicio", valor))
+        await asyncio.sleep(segundos)
+        if registro is not None:
+            registro.append(("fin", valor))
+        return (valor, *argumentos) if argumentos else valor
+    return _paso
+
+
+def test_pasos_independientes_corren_a_la_vez():
+    async def _correr():
+        inicio = time.perf_counter()
+        resultados = await en_paralelo({"a": _demora("a"), "b": _demora("b"), "c": _demora("c")})
+        return resultados, time.perf_counter() - inicio
+
+    resultados, segundos = asyncio.run(_correr())
+    assert resultados == {"a": "a", "b": "b", "c": "c"}
+    assert segundos < 0.25      # el más largo, no la suma (0.3 s)
+
+
+def test_respeta_el_limite_de_concurrencia():
+    activos, maximo = 0, 0
+
+    def _paso():
+        async def _uno():
+            nonlocal activos, maximo
+            activos += 1
+            maximo = max(maximo, activos)
+            await asyncio.sleep(0.02)
+            activos -= 1
+        return _uno
+
+    asyncio.run(en_paralelo({i: _paso() for i in range(6)}, limite=2))
+    assert maximo == 2
+
+
+def test_dependencias_en_orden_y_con_sus_resultados():
+    registro = []
+
+    async def _correr():
+        async with Grafo() as grafo:
+            grafo.agregar("ingredientes", _demora("ingredientes", 0.05, registro))
+            grafo.agregar("otro", _demora("otro", 0.01, registro))
+            grafo.agregar("productos", _demora("productos", 0.01, registro), "ingredientes", "otro")
+            return await grafo.resultado("productos")
+
+    assert asyncio.run(_correr()) == ("productos", "ingredientes", "otro")
+    assert registro.index(("inicio", "productos")) > registro.index(("fin", "ingredientes"))
+
+
+def test_al_salir_se_cancelan_los_pasos_que_nadie_espero():
+    registro = []
+
+    async def _correr():
+        async with Grafo() as grafo:
+            grafo.agregar("rapido", _demora("rapido", 0.01, registro))
+            grafo.agregar("lento", _demora("lento", 1, registro))
+            await grafo.resultado("rapido")
+        return grafo
+
+    inicio = time.perf_counter()
+    asyncio.run(_correr())
+    assert time.perf_counter() - inicio < 0.5
+    assert ("fin", "lento") not in registro
+
+
+def test_dependencia_inexistente_o_repetida():
+    async def _correr():
+        async with Grafo() as grafo:
+            grafo.agregar("a", _demora("a"))
+            with pytest.raises(ValueError):
+                grafo.agregar("b", _demora("b"), "z")
+            with pytest.raises(ValueError):
+                grafo.agregar("a", _demora("a"))
+
+    asyncio.run(_correr())
@@ -0,0 +1,58 @@
+# test_historial.py
+from langchain_core.chat_history import InMemoryChatMessageHistory
+
+from app import crud
+from app.historial import HistorialConVentana, crear_historial, estimar_tokens, tokens_mensaje
+
+
+def test_estimar_tokens():
+    assert estimar_tokens("") == 0
+    assert estimar_tokens("hola, tenés leche?") == 5
+    assert estimar_tokens("supermercado") == 3
+    assert estimar_tokens("son $1200 😊") == 1 + 1 + 4 + 2
+
+
+def test_ventana_no_supera_el_presupuesto_y_mantiene_el_contexto():
+    historial = crear_historial("CONTEXTO DEL SUPER", max_tokens=60)
+    for i in range(200):
+        historial.add_user_message(f"mensaje número {i} del cliente preguntando por productos")
+        historial.add_ai_message(f"respuesta {i} del asistente con algunos detalles")
+        assert historial.tokens_ventana <= 60
+
+    mensajes = historial.messages
+    assert mensajes[0].content == "CONTEXTO DEL SUPER"
+    assert mensajes[1].type == "human"
+    assert mensajes[-1].content == "respuesta 199 del asistente con algunos detalles"
+    assert historial.descartados > 0
+    assert sum(tokens_mensaje(m) for m in mensajes[1:]) == historial.tokens_ventana
+
+
+def test_mensaje_mas_grande_que_el_presupuesto_igual_se_envia():
+    historial = HistorialConVentana(max_tokens=5)
+    historial.add_user_message("un mensaje bastante largo que no entra en el presupuesto")
+    assert len(historial.messages) == 1
+
+
+def test_respuestas_al_principio_se_conservan_si_no_se_supera_el_presupuesto():
+    historial = HistorialConVentana(max_tokens=1200)
+    historial.add_ai_message("Tenemos Leche Entera La Serenísima 1L a $1200")
+    historial.add_ai_message("¿Querés que te agregue alguna?")
+    historial.add_user_message("sí, dos")
+    historial.add_ai_message("Listo, agregué 2 leches")
+
+    assert [m.type for m in historial.messages] == ["ai", "ai", "human", "ai"]
+    assert historial.descartados == 0
+
+
+def test_estrategia_completo_conserva_todo():
+    historial = crear_historial("CONTEXTO", estrategia="completo")
+    assert isinstance(historial, InMemoryChatMessageHistory)
+    for i in range(50):
+        historial.add_user_message(f"mensaje {i}")
+    assert len(historial.messages) == 51
+
+
+def test_get_session_history_usa_la_ventana():
+    historial = crud.get_session_history("ventana-1")
+    assert isinstance(historial, HistorialConVentana)
+    assert "Contexto inicial" in historial.messages[0].content
@@ -0,0 +1,83 @@
+# test_intenciones.py
+import pytest
+
+from app.intenciones import clasificar_con_reglas, evaluar_reglas, obtener_estadisticas_reglas
+
+
+@pytest.mark.parametrize("mensaje, intencion", [
+    ("ver mi pedido", "MOSTRAR_PEDIDO"),
+    ("Mostrame mi pedido!", "MOSTRAR_PEDIDO"),
+    ("¿qué tengo en el carrito?", "MOSTRAR_PEDIDO"),
+    ("vaciá el carrito", "VACIAR_PEDIDO"),
+    ("borrá todo por favor", "VACIAR_PEDIDO"),
+    ("finalizar", "FINALIZAR_PEDIDO"),
+    ("quiero finalizar el pedido", "FINALIZAR_PEDIDO"),
+    ("Hola!", "CHARLAR"),
+    ("buenas tardes 😊", "CHARLAR"),
+])
+def test_intenciones_sin_ambiguedad(mensaje, intencion):
+    resultado = evaluar_reglas(mensaje)
+    assert resultado["intencion"] == intencion
+    assert resultado["productos"] == []
+
+
+@pytest.mark.parametrize("mensaje, producto, cantidad", [
+    ("agregame 2 coca", "coca", 2),
+    ("agregame una harina pureza", "harina pureza", 1),
+    ("dale, sumame tres de yerba", "yerba", 3),
+    ("agregá 1 azúcar ledesma, por favor", "azúcar ledesma", 1),
+    ("poneme un par de alfajores", "alfajores", 2),
+])
+def test_agregar_con_cantidad(mensaje, producto, cantidad):
+    resultado = evaluar_reglas(mensaje)
+    assert resultado["intencion"] == "AGREGAR_PRODUCTO"
+    assert resultado["productos"] == [producto]
+    assert resultado["cantidades"] == {producto: cantidad}
+
+
+@pytest.mark.parametrize("mensaje", [
+    "hola, tenés coca?",
+    "agregame el más barato",
+    "agregame 2 kilos de papa",
+    "quiero agregar algo a mi pedido",
+    "tenés leche?",
+    "",
+    # Listas en las que no todos los productos traen su cantidad: las separa la IA
+    "agregame 2 coca, galletitas",
+    "agregame 2 coca y galletitas",
+    "agregame 2 coca y el más barato",
+    # Números que son parte del nombre del producto, no otra cantidad
+    "agregame 2 galletitas 9 de oro",
+    "sumame 1 pack 6 cervezas",
+    "agregame 2 alfajor tres capas",
+    "agregame 6 huevos 2 docena",
+])
+def test_casos_dudosos_van_a_la_ia(mensaje):
+    assert evaluar_reglas(mensaje) is None
+
+
+def test_contadores_de_aciertos():
+    antes = obtener_estadisticas_reglas()
+    assert clasificar_con_reglas("ver mi pedido")["regla"] == "ver_pedido"
+    assert clasificar_con_reglas("precio de la leche") is None
+    # Una regla con confianza menor al umbral también se deriva a la IA
+    assert clasificar_con_reglas("mi pedido", umbral=0.99) is None
+
+    despues = obtener_estadisticas_reglas()
+    assert despues["resueltos_por_reglas"] == antes["resueltos_por_reglas"] + 1
+    assert despues["derivados_a_ia"] == antes["derivados_a_ia"] + 2
+    assert 0 < despues["tasa_aciertos"] < 1
+
+
+@pytest.mark.parametrize("mensaje, cantidades", [
+    ("agregame 2 coca y 3 galletitas", {"coca": 2, "galletitas": 3}),
+    ("agregame 2 coca, 3 galletitas", {"coca": 2, "galletitas": 3}),
+    ("agregame 2 leche y 3 coca", {"leche": 2, "coca": 3}),
+    ("sumame un par de alfajores, una yerba playadito y 2 de leche", {"alfajores": 2, "yerba playadito": 1, "leche": 2}),
+    ("dale, agregame 2 coca, 3 galletitas, por favor", {"coca": 2, "galletitas": 3}),
+])
+def test_agregar_varios_con_cantidad(mensaje, cantidades):
+    resultado = evaluar_reglas(mensaje)
+    assert resultado["regla"] == "agregar_varios"
+    assert resultado["productos"] == list(cantidades)
+    assert resultado["cantidades"] == cantidades
@@ -0,0 +1,65 @@
+# test_listas.py
+import asyncio
+
+import pytest
+
+from app.listas import formatear_lista, renderizar_lista
+from fakes import ModeloFalso
+from test_catalogo import PRODUCTOS
+
+
+def _renderizar(modelo, modo):
+    return asyncio.run(renderizar_lista(
+        modelo, PRODUCTOS[:2],
+        encabezado="Estos son los productos:",
+        prompt_ia="PROMPT COMPLETO",
+        prompt_de_cierre="PROMPT CIERRE",
+        modo=modo,
+    ))
+
+
+def test_formato_de_lista():
+    assert formatear_lista(PRODUCTOS[:2]) == (
+        "• Leche Entera La Serenísima 1L — $1200.00\n"
+        "• Dulce de Leche La Serenísima — $2300.00"
+    )
+
+
+def test_modo_plantilla_solo_pide_el_cierre_con_tope_de_tokens():
+    modelo = ModeloFalso("¡Hay de todo! 😄\nY además...", chat=True)
+    llamadas = []
+    original = modelo.ainvoke
+
+    async def _espiar(entrada, **kwargs):
+        llamadas.append(kwargs)
+        return await original(entrada, **kwargs)
+
+    modelo.ainvoke = _espiar
+    respuesta = _renderizar(modelo, "plantilla")
+
+    assert respuesta == (
+        "Estos son los productos:\n\n" + formatear_lista(PRODUCTOS[:2]) + "\n\n¡Hay de todo! 😄"
+    )
+    assert modelo.prompts == ["PROMPT CIERRE"]
+    assert llamadas[0]["options"]["num_predict"] > 0
+
+
+def test_modo_fijo_no_llama_a_la_ia():
+    modelo = ModeloFalso("no se usa", chat=True)
+    assert _renderizar(modelo, "fijo") == "Estos son los productos:\n\n" + formatear_lista(PRODUCTOS[:2])
+    assert modelo.llamadas == 0
+
+
+def test_modo_ia_mantiene_el_comportamiento_anterior():
+    modelo = ModeloFalso("lista generada por la IA", chat=True)
+    assert _renderizar(modelo, "ia") == "lista generada por la IA"
+    assert modelo.prompts == ["PROMPT COMPLETO"]
+
+
+def test_los_errores_de_la_ia_se_propagan():
+    class _Caido:
+        async def ainvoke(self, *args, **kwargs):
+            raise ConnectionError("ollama caído")
+
+    with pytest.raises(ConnectionError):
+        _renderizar(_Caido(), "plantilla")
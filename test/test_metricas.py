@@ -0,0 +1,70 @@
+# test_metricas.py
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import crud, metricas
+from app.metricas import Histograma, ModeloMedido, Registro
+from app.pedidos import agregar_a_pedido
+from fakes import ModeloFalso, instalar_modelos
+
+
+def test_histograma_en_formato_prometheus():
+    registro = Registro()
+    histograma = registro.histograma("demora_segundos", "Demora", ("etapa",), buckets=(0.1, 1))
+    histograma.observar(0.05, etapa="bd")
+    histograma.observar(0.5, etapa="bd")
+    histograma.observar(3, etapa="bd")
+
+    lineas = registro.texto().splitlines()
+    assert "# TYPE demora_segundos histogram" in lineas
+    assert 'demora_segundos_bucket{etapa="bd",le="0.1"} 1' in lineas
+    assert 'demora_segundos_bucket{etapa="bd",le="1"} 2' in lineas
+    assert 'demora_segundos_bucket{etapa="bd",le="+Inf"} 3' in lineas
+    assert 'demora_segundos_sum{etapa="bd"} 3.55' in lineas
+    assert 'demora_segundos_count{etapa="bd"} 3' in lineas
+
+
+def test_modelo_medido_por_modelo_y_proposito(monkeypatch):
+    histograma = Histograma("llm", "", ("modelo", "proposito"))
+    monkeypatch.setattr(metricas, "llm_segundos", histograma)
+    modelo = ModeloMedido(ModeloFalso("ok"), "input")
+
+    async def sin_etiqueta():
+        return await modelo.ainvoke("hola")
+
+    async def fallar():
+        modelo._modelo.responder = lambda prompt: 1 / 0
+        await modelo.ainvoke("hola", proposito="explicito")
+
+    assert asyncio.run(sin_etiqueta()) == "ok"
+    assert histograma.cantidad(modelo="input", proposito="sin_proposito") == 1
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(fallar())
+    assert histograma.cantidad(modelo="input", proposito="explicito") == 1
+    assert metricas.llm_errores.valor(modelo="input", proposito="explicito") == 1
+    # Los argumentos que no son del medidor llegan al modelo
+    assert modelo.llamadas == 2 and modelo.argumentos[0] == {}
+
+
+def test_mensaje_por_intencion_y_rama_y_carrito(monkeypatch):
+    entrada = ModeloFalso("Intención detectada: CHARLAR\nProductos mencionados: ninguno")
+    instalar_modelos(monkeypatch, crud, entrada, ModeloFalso("¡Qué lindo día!", chat=True))
+    antes = metricas.mensajes.valor(intencion="CHARLAR", rama="charla")
+    asyncio.run(crud.get_response("qué lindo día hace en el barrio", "metricas-1"))
+    assert metricas.mensajes.valor(intencion="CHARLAR", rama="charla") == antes + 1
+
+    antes = metricas.carrito_segundos.cantidad(operacion="agregar")
+    agregar_a_pedido("metricas-1", "Yerba Mate Playadito 1kg", 1, 3500)
+    assert metricas.carrito_segundos.cantidad(operacion="agregar") == antes + 1
+
+
+def test_endpoint_metrics():
+    from app.main import app
+
+    respuesta = TestClient(app).get("/metrics")
+    assert respuesta.status_code == 200
+    assert respuesta.headers["content-type"].startswith("text/plain")
+    assert "# TYPE chatbot_llm_segundos histogram" in respuesta.text
+    assert 'chatbot_cache_deteccion_total{resultado="fallos"}' in respuesta.text
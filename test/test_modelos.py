@@ -0,0 +1,124 @@
+# test_modelos.py
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.modelos import Precalentador, crear_modelo_input, crear_modelo_output, keep_alive
+from fakes import ServidorOllamaFalso
+
+CARGA = 0.3
+
+
+@pytest.fixture
+def servidor():
+    servidor = ServidorOllamaFalso(carga=CARGA)
+    yield servidor
+    servidor.cerrar()
+
+
+def _modelos(url):
+    return {"input": crear_modelo_input(url), "output": crear_modelo_output(url)}
+
+
+async def _medir(modelo, prompt="tenés yerba?"):
+    inicio = time.perf_counter()
+    await modelo.ainvoke(prompt)
+    return time.perf_counter() - inicio
+
+
+def test_keep_alive():
+    assert keep_alive("30m") == "30m"
+    assert keep_alive("-1") == -1
+    assert keep_alive("600") == 600
+
+
+def test_precalentar_carga_los_dos_modelos_con_keep_alive(servidor):
+    precalentador = Precalentador()
+    modelos = _modelos(servidor.url)
+
+    async def _probar():
+        assert await precalentador.precalentar(modelos)
+        # El primer mensaje real ya no paga la carga
+        return await _medir(modelos["input"]), await _medir(modelos["output"])
+
+    tiempos = asyncio.run(_probar())
+
+    assert precalentador.listo()
+    assert set(precalentador.modelos) == {"input", "output"}
+    assert all(t < CARGA for t in tiempos)
+    rutas = [(ruta, cuerpo["model"]) for ruta, cuerpo, _ in servidor.pedidos[:2]]
+    assert sorted(rutas) == [("/api/chat", "gemma3_output:latest"), ("/api/generate", "gemma3_input:latest")]
+    for _, cuerpo, _ in servidor.pedidos:
+        assert cuerpo["keep_alive"] == "30m"
+    assert servidor.pedidos[0][1]["options"]["num_predict"] == 1
+
+
+def test_sin_precalentar_el_primer_mensaje_paga_la_carga(servidor):
+    modelo = crear_modelo_input(servidor.url)
+    assert asyncio.run(_medir(modelo)) >= CARGA
+
+
+def test_reutiliza_la_conexion(servidor):
+    modelo = crear_modelo_output(servidor.url)
+
+    async def _varios():
+        for _ in range(5):
+            await modelo.ainvoke("hola")
+
+    asyncio.run(_varios())
+    assert len(servidor.pedidos) == 5
+    assert servidor.conexiones == 1
+
+
+def test_error_si_ollama_no_responde():
+    precalentador = Precalentador()
+    modelos = _modelos("http://127.0.0.1:9")
+    assert asyncio.run(precalentador.precalentar(modelos, timeout=5)) is False
+    assert precalentador.estado == "error"
+    assert precalentador.modelos["input"]["estado"] == "error"
+
+
+def test_reintenta_en_segundo_plano_hasta_que_ollama_responde(servidor):
+    class Caido:
+        """Falla las primeras veces, como un Ollama que todavía no levantó."""
+
+        def __init__(self, modelo, fallos):
+            self.modelo, self.fallos, self.intentos = modelo, fallos, 0
+
+        async def ainvoke(self, *args, **kwargs):
+            self.intentos += 1
+            if self.intentos <= self.fallos:
+                raise ConnectionError("Ollama no disponible")
+            return await self.modelo.ainvoke(*args, **kwargs)
+
+    precalentador = Precalentador()
+    modelos = {"input": Caido(crear_modelo_input(servidor.url), 2), "output": crear_modelo_output(servidor.url)}
+
+    async def _esperar():
+        tarea = asyncio.create_task(precalentador.precalentar_con_reintentos(modelos, espera=0.05))
+        await asyncio.sleep(0.02)
+        assert not precalentador.listo()
+        await asyncio.wait_for(tarea, 10)
+
+    asyncio.run(_esperar())
+    assert precalentador.listo()
+    assert modelos["input"].intentos == 3
+    # El que ya estaba cargado no se vuelve a precalentar
+    assert sum(1 for _, cuerpo, _ in servidor.pedidos if cuerpo["model"] == "gemma3_output:latest") == 1
+
+
+def test_ready_responde_503_hasta_que_los_modelos_estan_listos(monkeypatch):
+    from app.endpoints import endpoints
+    from app.main import app
+
+    precalentador = Precalentador()
+    monkeypatch.setattr(endpoints, "precalentador", precalentador)
+    cliente = TestClient(app)
+
+    assert cliente.get("/ready").status_code == 503
+    precalentador.omitir()
+    respuesta = cliente.get("/ready")
+    assert respuesta.status_code == 200
+    assert respuesta.json()["estado"] == "listo"
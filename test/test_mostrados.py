@@ -0,0 +1,71 @@
+# test_mostrados.py
+import asyncio
+
+from app import crud
+from app.estado_sesiones import deserializar, serializar
+from app.mostrados import ENCABEZADO, ProductosMostrados, productos_mostrados_de
+from fakes import ModeloFalso, instalar_modelos
+
+COCA = {"id": 1, "producto": "Coca-Cola 2.25L", "precio_venta": 3200}
+COCA_ZERO = {"id": 2, "producto": "Coca-Cola Zero 1.5L", "precio_venta": 2800}
+SPRITE = {"id": 3, "producto": "Sprite 2.25L", "precio_venta": 2900}
+
+
+def test_sin_repetidos_y_el_mas_reciente_primero():
+    mostrados = ProductosMostrados()
+    mostrados["coca"] = [COCA, COCA_ZERO]
+    mostrados["gaseosas"] = [SPRITE, COCA]
+
+    assert mostrados.cantidad_productos() == 3
+    assert mostrados.texto() == ENCABEZADO + "- Coca-Cola 2.25L\n- Sprite 2.25L\n- Coca-Cola Zero 1.5L\n"
+    # Sigue funcionando como el dict de siempre
+    assert list(mostrados) == ["coca", "gaseosas"]
+    assert mostrados["coca"] == [COCA, COCA_ZERO]
+
+
+def test_busquedas_y_texto_acotados():
+    mostrados = ProductosMostrados(max_busquedas=2, max_productos=50, max_tokens=60)
+    for i in range(30):
+        mostrados[f"producto {i}"] = [{"id": i, "producto": f"Producto número {i}", "precio_venta": i}]
+
+    assert list(mostrados) == ["producto 28", "producto 29"]
+    texto = mostrados.texto()
+    assert texto.startswith(ENCABEZADO + "- Producto número 29\n")
+    assert 2 < texto.count("\n- ") < 30
+
+    # Volver a mostrar una búsqueda la pasa al final
+    mostrados["producto 28"] = mostrados["producto 28"]
+    assert list(mostrados) == ["producto 29", "producto 28"]
+
+
+def test_el_texto_solo_se_rearma_cuando_cambia():
+    mostrados = ProductosMostrados({"coca": [COCA]})
+    primero = mostrados.texto()
+    assert mostrados.texto() is primero
+    mostrados["sprite"] = [SPRITE]
+    assert mostrados.texto() != primero
+    del mostrados["sprite"]
+    assert mostrados.texto() == primero
+
+
+def test_se_recupera_despues_de_serializar():
+    datos = {"productos_mostrados": ProductosMostrados({"coca": [COCA, COCA_ZERO]})}
+    restaurados = deserializar(serializar(datos))
+    assert type(restaurados["productos_mostrados"]) is dict
+
+    mostrados = productos_mostrados_de(restaurados)
+    assert isinstance(restaurados["productos_mostrados"], ProductosMostrados)
+    assert mostrados.cantidad_productos() == 2
+
+
+def test_prompt_de_deteccion_sin_repetidos(monkeypatch):
+    entrada = ModeloFalso("Intención detectada: CHARLAR\nProductos mencionados: ninguno")
+    instalar_modelos(monkeypatch, crud, entrada, ModeloFalso("¡Buenísimo!", chat=True))
+    datos = crud.get_datos_traidos_desde_bd("mostrados-1")
+    datos["productos_mostrados"]["coca"] = [COCA, COCA_ZERO]
+    datos["productos_mostrados"]["gaseosa"] = [COCA, SPRITE]
+
+    asyncio.run(crud.get_response("y cuál me recomendás para el asado del domingo", "mostrados-1"))
+    prompt = entrada.prompts[0]
+    assert prompt.count("- Coca-Cola 2.25L") == 1
+    assert prompt.index("Sprite") < prompt.index("Coca-Cola Zero")
@@ -0,0 +1,97 @@
+# test_ollama_simulado.py
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.modelos import crear_modelo_input, crear_modelo_output
+from benchmarks.ollama_simulado import GrabadorOllama, OllamaSimulado, leer_grabaciones
+
+DETECCION = "Intención detectada: CONSULTAR_INFO\nProductos mencionados: yerba"
+
+
+@pytest.fixture
+def real():
+    """Hace de Ollama real: tarda en el primer token y responde siempre lo mismo."""
+    servidor = OllamaSimulado(respuesta=DETECCION, latencia=0.1, tokens_por_segundo=0)
+    yield servidor
+    servidor.cerrar()
+
+
+def _preguntar(url, prompt="tenés yerba?"):
+    return asyncio.run(crear_modelo_input(url).ainvoke(prompt))
+
+
+def test_graba_y_reproduce(real, tmp_path):
+    archivo = str(tmp_path / "grabaciones.jsonl")
+    grabador = GrabadorOllama(archivo, real.url)
+    try:
+        assert _preguntar(grabador.url) == DETECCION
+    finally:
+        grabador.cerrar()
+
+    grabaciones = leer_grabaciones(archivo)
+    (grabacion,) = grabaciones.values()
+    assert grabacion["modelo"] == "gemma3_input:latest"
+    assert grabacion["pedido"]["prompt"] == "tenés yerba?"
+    assert grabacion["primer_token"] >= 0.1 and grabacion["eval_count"] == 6
+    real.cerrar()
+
+    # Sin el Ollama "real": lo grabado sale igual y con su latencia; lo demás, la respuesta fija
+    simulado = OllamaSimulado(grabaciones, respuesta="no grabado")
+    try:
+        inicio = time.perf_counter()
+        assert _preguntar(simulado.url) == DETECCION
+        assert time.perf_counter() - inicio >= 0.1
+        assert _preguntar(simulado.url, "otra cosa") == "no grabado"
+        assert simulado.metricas == {"reproducidas": 1, "sin_grabacion": 1, "errores": 0}
+    finally:
+        simulado.cerrar()
+
+
+def test_velocidad_de_tokens_en_streaming():
+    simulado = OllamaSimulado(respuesta="uno dos tres cuatro cinco seis", latencia=0, tokens_por_segundo=50)
+    try:
+        inicio = time.perf_counter()
+        respuesta = asyncio.run(crear_modelo_output(simulado.url).ainvoke("hola"))
+        assert respuesta.content == "uno dos tres cuatro cinco seis"
+        assert time.perf_counter() - inicio >= 5 / 50
+        assert respuesta.response_metadata["eval_count"] == 6
+    finally:
+        simulado.cerrar()
+
+
+def test_errores_inyectados():
+    simulado = OllamaSimulado(errores=0.5, semilla=1)
+    try:
+        resultados = []
+        for _ in range(20):
+            try:
+                resultados.append(_preguntar(simulado.url))
+            except Exception as e:
+                resultados.append(e)
+        fallidos = sum(isinstance(r, Exception) for r in resultados)
+        assert 0 < fallidos < 20 and simulado.metricas["errores"] == fallidos
+        assert "error simulado" in str(next(r for r in resultados if isinstance(r, Exception)))
+    finally:
+        simulado.cerrar()
+
+
+def test_sin_streaming_y_modelos_grabados(tmp_path):
+    import urllib.request
+
+    grabacion = {"clave": "x", "ruta": "/api/generate", "modelo": "gemma3_input:latest", "texto": "hola"}
+    simulado = OllamaSimulado({"x": grabacion}, respuesta="uno dos", latencia=0, tokens_por_segundo=0)
+    try:
+        pedido = urllib.request.Request(
+            f"{simulado.url}/api/generate", method="POST",
+            data=json.dumps({"model": "m", "prompt": "hola", "stream": False}).encode(),
+        )
+        cuerpo = json.loads(urllib.request.urlopen(pedido).read())
+        assert cuerpo["response"] == "uno dos" and cuerpo["done"] is True
+
+        modelos = json.loads(urllib.request.urlopen(f"{simulado.url}/api/tags").read())["models"]
+        assert [m["name"] for m in modelos] == ["gemma3_input:latest", "m"]
+    finally:
+        simulado.cerrar()
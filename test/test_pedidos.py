@@ -0,0 +1,61 @@
+# test_pedidos.py
+import time
+from decimal import Decimal
+
+from app.pedidos import (
+    Pedido, agregar_a_pedido, mostrar_pedido, pedidos_por_cliente, quitar_de_pedido, vaciar_pedido,
+)
+
+
+def test_total_exacto_en_decimal():
+    pedido = Pedido()
+    for _ in range(10):
+        pedido.agregar("Caramelo", 1, 0.1)
+    assert pedido.total == Decimal("1.0")
+    pedido.agregar("Leche Entera", 3, Decimal("1199.99"), producto_id=1)
+    assert pedido.total == Decimal("3600.97")
+    assert pedido.quitar("leche entera", 1) == 2
+    assert pedido.total == Decimal("2400.98")
+
+
+def test_misma_linea_por_id_o_por_nombre():
+    pedido = Pedido()
+    pedido.agregar("Yerba Playadito 1kg", 1, "3500", producto_id=7)
+    pedido.agregar("yerba playadito 1KG", 2, "3500")
+    pedido.agregar("Yerba Playadito (1 kg)", 1, "3500", producto_id=7)
+    assert len(pedido) == 1
+    assert pedido.buscar("YERBA PLAYADITO 1KG").cantidad == 4
+    assert pedido.quitar("Yerba Playadito 1kg", 10) == 0
+    assert not pedido and pedido.total == 0
+    assert pedido.quitar("Yerba Playadito 1kg", 1) is None
+
+
+def test_agregar_y_quitar_varios_y_serializar():
+    pedido = Pedido()
+    pedido.agregar_varios([("Arroz", 2, "950.50", 10), ("Fideos", 3, "780"), ("Arroz", 1, "950.50", 10)])
+    assert pedido.quitar_varios([("fideos", 1), ("azucar", 1)]) == [2, None]
+    copia = Pedido.desde_lista(pedido.a_lista())
+    assert copia.a_lista() == [[10, "Arroz", 3, "950.50"], [None, "Fideos", 2, "780"]]
+    assert copia.total == pedido.total == Decimal("4411.50")
+
+
+def test_pedido_grande_es_rapido():
+    pedido = Pedido()
+    items = [(f"Producto {i}", 1, "10.25", i) for i in range(20000)]
+    inicio = time.perf_counter()
+    pedido.agregar_varios(items)
+    pedido.agregar_varios(items)
+    pedido.quitar_varios([(f"producto {i}", 1) for i in range(0, 20000, 2)])
+    assert time.perf_counter() - inicio < 2
+    assert pedido.total == Decimal("10.25") * 30000
+
+
+def test_mensajes_del_carrito_sin_cambios():
+    s = "pedidos-mensajes"
+    assert agregar_a_pedido(s, "Leche Entera", 2, Decimal("1200.00"), 1).startswith("🛒 Agregué 2 Leche Entera al pedido. (Total: $2400)")
+    assert agregar_a_pedido(s, "Leche Entera", 1, Decimal("1200.00"), 1).startswith("🛒 Se actualizaron las unidades de Leche Entera (ahora x3). Total: $3600")
+    assert mostrar_pedido(s) == "🧺 Actualmente tu pedido tiene:\n\nLeche Entera $1200 (3) : $3600\n\n🧾 Total: $3600\n"
+    assert quitar_de_pedido(s, "leche entera", 1) == "🧺 Quité 1 leche entera (quedan x2). Total: $2400"
+    assert quitar_de_pedido(s, "Leche Entera", 5) == "🧺 Eliminé el último producto, tu pedido quedó vacío."
+    assert vaciar_pedido(s) == "todavía no agregaste productos a tu pedido 😕"
+    assert isinstance(pedidos_por_cliente[s], Pedido)
@@ -0,0 +1,35 @@
+# test_pipeline_async.py
+import asyncio
+import time
+
+import pytest
+
+from app import crud
+from fakes import ModeloFalso, instalar_modelos
+
+DEMORA_IA = 0.05
+
+
+@pytest.fixture
+def modelos_falsos(monkeypatch):
+    entrada = ModeloFalso("Intención detectada: CHARLAR\nProductos mencionados: ninguno", DEMORA_IA)
+    salida = ModeloFalso("¡Hola! ¿En qué te ayudo?", DEMORA_IA, chat=True)
+    instalar_modelos(monkeypatch, crud, entrada, salida)
+    return entrada, salida
+
+
+def test_conversaciones_concurrentes_se_solapan(modelos_falsos):
+    clientes = 20
+
+    async def _todas():
+        return await asyncio.gather(*[
+            crud.get_response("hola", f"cliente-{i}") for i in range(clientes)
+        ])
+
+    inicio = time.perf_counter()
+    respuestas = asyncio.run(_todas())
+    duracion = time.perf_counter() - inicio
+
+    assert respuestas == ["¡Hola! ¿En qué te ayudo?"] * clientes
+    # En serie serían clientes * 2 llamadas * DEMORA_IA (2 segundos)
+    assert duracion < clientes * 2 * DEMORA_IA / 4
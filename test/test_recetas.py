@@ -0,0 +1,103 @@
+# test_recetas.py
+import asyncio
+
+import pytest
+
+from app import crud
+from app.recetas import BaseRecetas
+from fakes import ModeloFalso, instalar_modelos
+
+
+def test_platos_base_y_plurales(tmp_path):
+    recetas = BaseRecetas(archivo=str(tmp_path / "recetas.json"))
+    assert recetas.obtener("Pizza")["ingredientes"][0] == "harina"
+    assert recetas.obtener("empanadas")["es_comida"] is True
+    assert recetas.obtener("flanes")["ingredientes"] == ["leche", "huevos", "azúcar"]
+    assert recetas.obtener("locro") is None
+
+
+def test_lo_aprendido_se_persiste(tmp_path):
+    archivo = str(tmp_path / "recetas.json")
+    recetas = BaseRecetas(archivo=archivo)
+    recetas.registrar("Locro", ["maíz", "zapallo", "porotos"])
+    recetas.registrar_no_comida("jabón")
+    recetas.cerrar()
+
+    reiniciada = BaseRecetas(archivo=archivo)
+    assert reiniciada.obtener("locro")["ingredientes"] == ["maíz", "zapallo", "porotos"]
+    assert reiniciada.obtener("jabon") == {"es_comida": False, "ingredientes": []}
+
+
+def test_registrar_no_escribe_el_archivo_en_el_momento(tmp_path, monkeypatch):
+    import threading
+
+    recetas = BaseRecetas(archivo=str(tmp_path / "recetas.json"), demora=0.05)
+    hilos = []
+    guardar = recetas._guardar
+    monkeypatch.setattr(recetas, "_guardar", lambda: (hilos.append(threading.current_thread()), guardar()))
+
+    for plato in ("locro", "guiso de lentejas", "humita"):
+        recetas.registrar(plato, ["zapallo"])
+    assert recetas.obtener("humita")["ingredientes"] == ["zapallo"]
+    recetas.cerrar()
+
+    # Una sola escritura para las tres, desde el hilo de guardado
+    assert len(hilos) == 1 and hilos[0] is not threading.main_thread()
+    assert set(BaseRecetas(archivo=str(tmp_path / "recetas.json"))._aprendidas) == {"locro", "guiso de lentejas", "humita"}
+
+
+def _detectar(prompt):
+    if "Frase del cliente" in prompt:
+        return "Intención detectada: CONSULTAR_INFO\nProductos mencionados: locro"
+    if "ingredientes principales" in prompt:
+        return "cebolla, aceite y zapallo"
+    if "es una comida" in prompt:
+        return "sí"
+    return "Intención detectada: CONSULTAR_INFO\nProductos mencionados: locro"
+
+
+@pytest.fixture
+def entrada(monkeypatch, tmp_path):
+    monkeypatch.setattr(crud, "base_recetas", BaseRecetas(archivo=str(tmp_path / "recetas.json")))
+    entrada = ModeloFalso(_detectar)
+    instalar_modelos(monkeypatch, crud, entrada, ModeloFalso("Mirá lo que tenemos", chat=True))
+    return entrada
+
+
+def test_plato_repetido_no_vuelve_a_consultar_a_la_ia(entrada):
+    asyncio.run(crud.get_response("tenés locro?", "recetas-1"))
+    primera = [p for p in entrada.prompts if "Frase del cliente" not in p]
+    assert len(primera) == 2   # "¿es comida?" + ingredientes
+
+    antes = entrada.llamadas
+    asyncio.run(crud.get_response("tenés locro?", "recetas-2"))
+    assert entrada.llamadas == antes   # detección en caché y receta conocida
+
+    mostrados = crud.get_datos_traidos_desde_bd("recetas-2")["productos_mostrados"]["locro"]
+    assert [p["producto"] for p in mostrados] == [
+        "Cebolla", "Cebolla de Verdeo", "Aceite de Girasol Natura", "Aceite de Oliva Lira",
+    ]
+
+
+def test_respuesta_si_no_tolerante():
+    assert crud.interpretar_si_no("Sí.") is True
+    assert crud.interpretar_si_no("si, es un plato") is True
+    assert crud.interpretar_si_no("**SÍ**") is True
+    assert crud.interpretar_si_no("<think>mmm</think>\nNo.") is False
+    assert crud.interpretar_si_no("No, es un producto de limpieza") is False
+    assert crud.interpretar_si_no("Depende") is None
+    assert crud.interpretar_si_no("") is None
+
+
+@pytest.mark.parametrize("respuesta, guardado", [
+    ("Sí, es un plato típico.", None),
+    ("No.", {"es_comida": False, "ingredientes": []}),
+    ("Puede ser", None),
+])
+def test_solo_se_guarda_un_no_claro(monkeypatch, tmp_path, respuesta, guardado):
+    recetas = BaseRecetas(archivo=str(tmp_path / "recetas.json"))
+    monkeypatch.setattr(crud, "base_recetas", recetas)
+    instalar_modelos(monkeypatch, crud, ModeloFalso(respuesta), ModeloFalso("", chat=True))
+
+    assert asyncio.run(crud.preguntar_si_es_comida("locro")) is respuesta.startswith("Sí")
+    assert recetas.obtener("locro") == guardado
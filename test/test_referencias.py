@@ -0,0 +1,83 @@
+# test_referencias.py
+import asyncio
+from decimal import Decimal
+from fractions import Fraction
+
+import pytest
+
+from app import crud
+from app.referencias import parsear_presentacion, resolver_referencia
+from fakes import ModeloFalso
+
+
+def _fila(pid, nombre, precio, descripcion=None):
+    return {"id": pid, "producto": nombre, "precio_venta": Decimal(precio), "descripcion": descripcion}
+
+
+ACEITES = [
+    _fila(1, "Aceite Natura Girasol 900ml", "2500.00"),
+    _fila(2, "Aceite Natura Girasol 1.5L", "3900.00"),
+    _fila(3, "Aceite Lira Oliva 500ml", "5400.00"),
+]
+GASEOSAS = [
+    _fila(10, "Coca Cola 2.25L", "3100.00"),
+    _fila(11, "Coca Cola Lata", "1200.00", "Lata de 354 cc"),
+]
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("Aceite Natura 900ml", ("volumen", 900)),
+    ("Coca Cola 2.25L", ("volumen", 2250)),
+    ("Yerba Playadito 1 kg", ("peso", 1000)),
+    ("Agua Villavicencio x6 1,5 lts", ("volumen", 9000)),
+    ("Huevos blancos 12 un", ("unidades", 12)),
+    ("Queso 1/2 kg", ("peso", 500)),
+    ("Cebolla", None),
+])
+def test_parsear_presentacion(texto, esperado):
+    assert parsear_presentacion(texto) == (esperado and (esperado[0], Fraction(esperado[1])))
+
+
+@pytest.mark.parametrize("frase, producto", [
+    ("el primero", "Aceite Natura Girasol 900ml"),
+    ("dame el último", "Aceite Lira Oliva 500ml"),
+    ("el más barato", "Aceite Natura Girasol 900ml"),
+    ("el más caro", "Aceite Lira Oliva 500ml"),
+    ("el más grande", "Aceite Natura Girasol 1.5L"),
+    ("la botella más chica", "Aceite Lira Oliva 500ml"),
+    ("el de 900", "Aceite Natura Girasol 900ml"),
+    ("el de medio litro", "Aceite Lira Oliva 500ml"),
+    ("el de oliva", "Aceite Lira Oliva 500ml"),
+    ("el girasol más barato", "Aceite Natura Girasol 900ml"),
+    ("la coca de lata", "Coca Cola Lata"),
+    ("la coca más chica", "Coca Cola Lata"),
+    ("el 1°", "Aceite Natura Girasol 900ml"),
+    ("el 2°", "Aceite Natura Girasol 1.5L"),
+    ("dame el 3° por favor", "Aceite Lira Oliva 500ml"),
+    ("el 2º", "Aceite Natura Girasol 1.5L"),
+])
+def test_resuelve_sin_ia(frase, producto):
+    fila, estado, _ = resolver_referencia(frase, [GASEOSAS, ACEITES])
+    assert estado == "resuelto"
+    assert fila["producto"] == producto
+
+
+def test_ambiguo_y_sin_referencia():
+    fila, estado, candidatos = resolver_referencia("el de girasol", [ACEITES])
+    assert (fila, estado) == (None, "ambiguo")
+    assert [c["id"] for c in candidatos] == [1, 2]
+    assert resolver_referencia("hola qué tal", [ACEITES])[1] == "sin_referencia"
+    assert resolver_referencia("el de 750", [ACEITES])[1] == "ambiguo"
+
+
+def test_comparar_solo_consulta_a_la_ia_si_hay_ambiguedad(monkeypatch):
+    modelo = ModeloFalso("Intención detectada: AGREGAR_PRODUCTO\nProductos mencionados: Aceite Natura Girasol 1.5L")
+    monkeypatch.setattr(crud, "modelo_input", modelo)
+    datos = crud.get_datos_traidos_desde_bd("referencias-1")
+    datos["productos_mostrados"]["aceite"] = ACEITES
+
+    assert asyncio.run(crud.comparar_con_producto_mostrado("agregame el más barato", "referencias-1")) == "Aceite Natura Girasol 900ml"
+    assert modelo.llamadas == 0
+
+    assert asyncio.run(crud.comparar_con_producto_mostrado("el de girasol", "referencias-1")) == "Aceite Natura Girasol 1.5L"
+    assert modelo.llamadas == 1
@@ -0,0 +1,66 @@
+# test_registro_conversaciones.py
+import os
+import threading
+import time
+
+from app.registro_conversaciones import EscritorConversaciones
+
+
+def _leer(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_mantiene_el_formato_y_el_orden_por_archivo(tmp_path):
+    escritor = EscritorConversaciones()
+    a, b = str(tmp_path / "111.txt"), str(tmp_path / "222.txt")
+    for i in range(100):
+        escritor.registrar(a, f"2025-01-01 10:00:00 - De +111: mensaje {i}\n")
+        escritor.registrar(b, f"2025-01-01 10:00:00 - Bot: respuesta {i}\n")
+    escritor.cerrar()
+
+    assert _leer(a) == "".join(f"2025-01-01 10:00:00 - De +111: mensaje {i}\n" for i in range(100))
+    assert _leer(b).count("\n") == 100
+    assert escritor.metricas["lineas_escritas"] == 200
+    assert escritor.metricas["lotes"] <= 200
+
+
+def test_limita_los_archivos_abiertos(tmp_path):
+    escritor = EscritorConversaciones(max_abiertos=3)
+    for i in range(10):
+        escritor.registrar(str(tmp_path / f"{i}.txt"), "linea\n")
+    escritor.esperar()
+    assert escritor.estadisticas()["archivos_abiertos"] <= 3
+    escritor.cerrar()
+    assert all(_leer(str(tmp_path / f"{i}.txt")) == "linea\n" for i in range(10))
+
+
+def test_rota_por_tamanio(tmp_path):
+    escritor = EscritorConversaciones(max_bytes=100, rotaciones=2)
+    ruta = str(tmp_path / "333.txt")
+    for i in range(30):
+        escritor.registrar(ruta, f"linea {i:02d} de la conversación\n")
+        escritor.esperar()
+    escritor.cerrar()
+
+    assert os.path.getsize(ruta) <= 100
+    assert os.path.exists(ruta + ".1") and os.path.exists(ruta + ".2")
+    assert not os.path.exists(ruta + ".3")
+    assert _leer(ruta).endswith("linea 29 de la conversación\n")
+
+
+def test_disco_lento_no_bloquea_y_descarta_lo_que_no_entra(tmp_path):
+    escritor = EscritorConversaciones(max_cola=5)
+    liberar = threading.Event()
+    original = escritor._escribir_lote
+    escritor._escribir_lote = lambda lote: (liberar.wait(), original(lote))
+
+    inicio = time.perf_counter()
+    for i in range(50):
+        escritor.registrar(str(tmp_path / "lento.txt"), f"linea {i}\n")
+    assert time.perf_counter() - inicio < 0.5
+    assert escritor.metricas["descartadas"] > 0
+
+    liberar.set()
+    escritor.cerrar()
+    assert escritor.metricas["lineas_escritas"] + escritor.metricas["descartadas"] == 50
@@ -0,0 +1,96 @@
+# test_sesiones.py
+import asyncio
+import random
+import re
+
+import pytest
+
+from app import crud
+from app.pedidos import pedidos_por_cliente
+from app.sesiones import EjecutorSesiones
+from fakes import ModeloFalso, instalar_modelos
+
+MENSAJES = [
+    "tenes aceite?",
+    "agregame 1 aceite de girasol",
+    "agregame 2 aceite de oliva",
+    "vacia el pedido",
+    "agregame 3 aceite de girasol",
+]
+
+
+def _detectar(prompt):
+    agregar = re.search(r"agregame (\d+) ([a-z ]+)", prompt)
+    if agregar:
+        return f"Intención detectada: AGREGAR_PRODUCTO\nProductos mencionados: {agregar.group(2).strip()}"
+    if "vacia el pedido" in prompt:
+        return "Intención detectada: VACIAR_PEDIDO\nProductos mencionados: ninguno"
+    return "Intención detectada: CONSULTAR_INFO\nProductos mencionados: aceite"
+
+
+@pytest.fixture
+def modelos_falsos(monkeypatch):
+    azar = random.Random(1234)
+    demora = lambda: azar.uniform(0, 0.01)
+    instalar_modelos(
+        monkeypatch, crud,
+        ModeloFalso(_detectar, demora),
+        ModeloFalso("Listo 👌", demora, chat=True),
+    )
+
+
+def test_mensajes_de_una_sesion_se_procesan_en_orden():
+    ejecutor = EjecutorSesiones()
+    orden = []
+
+    async def _tarea(i):
+        orden.append(("inicio", i))
+        await asyncio.sleep(0.01 * (5 - i))
+        orden.append(("fin", i))
+        return i
+
+    async def _todas():
+        return await asyncio.gather(*[ejecutor.ejecutar("s", _tarea, i) for i in range(5)])
+
+    assert asyncio.run(_todas()) == list(range(5))
+    assert orden == [(evento, i) for i in range(5) for evento in ("inicio", "fin")]
+    assert ejecutor.sesiones_activas() == 0
+
+
+def test_sesiones_distintas_corren_en_paralelo():
+    ejecutor = EjecutorSesiones()
+    activas = {"ahora": 0, "maximo": 0}
+
+    async def _tarea():
+        activas["ahora"] += 1
+        activas["maximo"] = max(activas["maximo"], activas["ahora"])
+        await asyncio.sleep(0.01)
+        activas["ahora"] -= 1
+
+    async def _todas():
+        await asyncio.gather(*[ejecutor.ejecutar(f"s{i}", _tarea) for i in range(10)])
+
+    asyncio.run(_todas())
+    assert activas["maximo"] == 10
+
+
+def test_carritos_consistentes_bajo_carga(modelos_falsos):
+    ejecutor = EjecutorSesiones()
+    sesiones = [f"estres-{i}" for i in range(40)]
+
+    async def _todas():
+        # Todos los mensajes de todas las sesiones llegan a la vez, intercalados
+        await asyncio.gather(*[
+            ejecutor.ejecutar(s, crud.get_response, mensaje, s)
+            for mensaje in MENSAJES for s in sesiones
+        ])
+
+    asyncio.run(_todas())
+
+    for s in sesiones:
+        # Solo sobrevive lo agregado después de vaciar
+        assert pedidos_por_cliente[s].a_lista() == [[4, "Aceite de Girasol Natura", 3, "2300.00"]]
+        mostrados = crud.get_datos_traidos_desde_bd(s)["productos_mostrados"]
+        assert [p["producto"] for p in mostrados["aceite"]] == [
+            "Aceite de Girasol Natura", "Aceite de Oliva Lira",
+        ]
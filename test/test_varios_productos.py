@@ -0,0 +1,62 @@
+# test_varios_productos.py
+import asyncio
+from decimal import Decimal
+
+from app import crud
+from app.pedidos import pedidos_por_cliente
+from fakes import ModeloFalso, instalar_modelos
+
+
+def _instalar(monkeypatch, deteccion):
+    entrada = ModeloFalso(deteccion)
+    salida = ModeloFalso("¡Hay de todo! 😄", chat=True)
+    instalar_modelos(monkeypatch, crud, entrada, salida)
+    return entrada, salida
+
+
+def test_cantidades_por_producto():
+    assert crud.cantidades_por_producto(
+        "agregame 2 coca, tres galletitas y una yerba", ["coca", "galletitas", "yerba", "leche"]
+    ) == {"coca": 2, "galletitas": 3, "yerba": 1, "leche": 1}
+
+
+def test_consulta_de_varios_productos_en_una_respuesta(monkeypatch):
+    entrada, salida = _instalar(
+        monkeypatch, "Intención detectada: CONSULTAR_INFO\nProductos mencionados: leche, coca, caviar"
+    )
+    respuesta = asyncio.run(crud.get_response("tenés leche, coca y caviar?", "varios-consulta"))
+
+    assert "Leche Entera La Serenísima 1L" in respuesta
+    assert "Coca Cola 2.25L" in respuesta
+    assert "No encontré caviar" in respuesta
+    assert entrada.llamadas == 1 and salida.llamadas <= 1
+    mostrados = crud.get_datos_traidos_desde_bd("varios-consulta")["productos_mostrados"]
+    assert {"leche", "coca"} <= set(mostrados)
+
+
+def test_agregar_varios_productos_en_una_operacion(monkeypatch):
+    entrada, salida = _instalar(
+        monkeypatch, "Intención detectada: AGREGAR_PRODUCTO\nProductos mencionados: leche, coca, aceite"
+    )
+    respuesta = asyncio.run(crud.get_response("agregame 2 leche, 3 coca y un aceite", "varios-agregar"))
+
+    pedido = pedidos_por_cliente["varios-agregar"]
+    assert pedido.buscar("Leche Entera La Serenísima 1L").cantidad == 2
+    assert pedido.buscar("Coca Cola 2.25L").cantidad == 3
+    assert pedido.total == Decimal("11700.00")
+    # El aceite tiene dos opciones: se listan para que el cliente elija
+    assert "De aceite tenemos varias opciones" in respuesta
+    assert "Aceite de Oliva Lira" in respuesta
+    # Cada producto trae su cantidad: lo resuelven las reglas, sin la IA
+    assert entrada.llamadas == 0 and salida.llamadas == 0
+
+
+def test_lista_resuelta_por_reglas_agrega_todos(monkeypatch):
+    entrada, salida = _instalar(monkeypatch, "Intención detectada: CHARLAR\nProductos mencionados: ninguno")
+    respuesta = asyncio.run(crud.get_response("agregame 2 leche y 3 coca", "varios-reglas"))
+
+    pedido = pedidos_por_cliente["varios-reglas"]
+    assert pedido.buscar("Leche Entera La Serenísima 1L").cantidad == 2
+    assert pedido.buscar("Coca Cola 2.25L").cantidad == 3
+    assert "Coca Cola 2.25L" in respuesta
+    assert entrada.llamadas == 0 and salida.llamadas == 0